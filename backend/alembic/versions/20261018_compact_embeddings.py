@@ -0,0 +1,44 @@
+"""add compact half-precision embeddings for candidate generation"""
+
+from typing import TYPE_CHECKING
+
+import sqlalchemy as sa
+from alembic import op
+
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from pgvector.sqlalchemy import HALFVEC  # type: ignore
+
+    HAS_VECTOR = True
+else:  # pragma: no cover - runtime import with fallback
+    try:
+        from pgvector.sqlalchemy import HALFVEC  # type: ignore
+
+        HAS_VECTOR = True
+    except ModuleNotFoundError:
+        HAS_VECTOR = False
+
+# revision identifiers, used by Alembic.
+revision = "20261018_compact_embeddings"
+down_revision = "20261018_content_digest"
+branch_labels = None
+depends_on = None
+
+COMPACT_EMBEDDING_DIM = 256
+
+
+def upgrade() -> None:
+    column_type = HALFVEC(dim=COMPACT_EMBEDDING_DIM) if HAS_VECTOR else sa.JSON()
+    op.add_column("media_items", sa.Column("embedding_compact", column_type, nullable=True))
+    if HAS_VECTOR:
+        # halfvec operator classes need pgvector >= 0.7.
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS media_items_embedding_compact_idx "
+            "ON media_items USING ivfflat (embedding_compact halfvec_cosine_ops) "
+            "WITH (lists = 100)"
+        )
+
+
+def downgrade() -> None:
+    if HAS_VECTOR:
+        op.execute("DROP INDEX IF EXISTS media_items_embedding_compact_idx")
+    op.drop_column("media_items", "embedding_compact")
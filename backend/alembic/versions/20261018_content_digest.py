@@ -0,0 +1,24 @@
+"""add content digest column for exact-duplicate lookups"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_content_digest"
+down_revision = "20261018_pdq_hash_bit_storage"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("media_items", sa.Column("content_digest", sa.String(length=64), nullable=True))
+    op.create_index(
+        "ix_media_items_user_id_content_digest",
+        "media_items",
+        ["user_id", "content_digest"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_items_user_id_content_digest", table_name="media_items")
+    op.drop_column("media_items", "content_digest")
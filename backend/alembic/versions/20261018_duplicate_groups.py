@@ -0,0 +1,34 @@
+"""add duplicate_groups table for library-wide clustering results"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "20261018_duplicate_groups"
+down_revision = "20261018_hnsw_embedding_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "duplicate_groups",
+        sa.Column("id", sa.Integer(), primary_key=True, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("size", sa.Integer(), nullable=False),
+        sa.Column(
+            "media_item_ids",
+            sa.JSON().with_variant(postgresql.ARRAY(sa.Integer()), "postgresql"),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_duplicate_groups_user_id", "duplicate_groups", ["user_id"])
+    op.create_index("ix_duplicate_groups_user_id_size", "duplicate_groups", ["user_id", "size"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_duplicate_groups_user_id_size", table_name="duplicate_groups")
+    op.drop_index("ix_duplicate_groups_user_id", table_name="duplicate_groups")
+    op.drop_table("duplicate_groups")
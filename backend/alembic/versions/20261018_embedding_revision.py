@@ -0,0 +1,21 @@
+"""count embedding writes per media item"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_embedding_revision"
+down_revision = "20261018_duplicate_groups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "media_items",
+        sa.Column("embedding_revision", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("media_items", "embedding_revision")
@@ -0,0 +1,36 @@
+"""record which encoder version produced each embedding"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "20261018_embedding_version"
+down_revision = "20261018_compact_embeddings"
+branch_labels = None
+depends_on = None
+
+# ``embedding_version`` of the default encoder: the checkpoint it loads.
+# Existing rows are assumed to come from it; the re-embed job fixes any that
+# did not.
+CURRENT_EMBEDDING_VERSION = "google/siglip-base-patch16-224"
+
+
+def upgrade() -> None:
+    op.add_column(
+        "media_items", sa.Column("embedding_version", sa.String(length=255), nullable=True)
+    )
+    op.execute(
+        sa.text(
+            "UPDATE media_items SET embedding_version = :version WHERE embedding IS NOT NULL"
+        ).bindparams(version=CURRENT_EMBEDDING_VERSION)
+    )
+    op.create_index(
+        "ix_media_items_user_id_embedding_version",
+        "media_items",
+        ["user_id", "embedding_version"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_media_items_user_id_embedding_version", table_name="media_items")
+    op.drop_column("media_items", "embedding_version")
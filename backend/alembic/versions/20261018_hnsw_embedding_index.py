@@ -0,0 +1,51 @@
+"""replace the ivfflat embedding indexes with HNSW"""
+
+from alembic import op
+
+from backend.config.settings import settings
+
+# revision identifiers, used by Alembic.
+revision = "20261018_hnsw_embedding_index"
+down_revision = "20261018_embedding_version"
+branch_labels = None
+depends_on = None
+
+# (index, column, operator class) of every ANN index on media_items.
+_INDEXES = (
+    ("media_items_embedding_idx", "embedding", "vector_cosine_ops"),
+    ("media_items_embedding_compact_idx", "embedding_compact", "halfvec_cosine_ops"),
+)
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _swap_indexes(method: str, options: str) -> None:
+    # Build each replacement next to the old index so searches stay indexed,
+    # without blocking writes, then drop the old one and take over its name.
+    with op.get_context().autocommit_block():
+        for name, column, opclass in _INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}_new")
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY {name}_new ON media_items "
+                f"USING {method} ({column} {opclass}) WITH ({options})"
+            )
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+
+def upgrade() -> None:
+    if not _is_postgresql():
+        return
+    _swap_indexes(
+        "hnsw",
+        f"m = {int(settings.VECTOR_HNSW_M)}, "
+        f"ef_construction = {int(settings.VECTOR_HNSW_EF_CONSTRUCTION)}",
+    )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        return
+    _swap_indexes("ivfflat", "lists = 100")
@@ -0,0 +1,96 @@
+"""store pdq_hash as bit varying with GIN-indexed segment keys"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+from backend.services.dedupe.pdq_index import pdq_segment_keys
+
+# revision identifiers, used by Alembic.
+revision = "20261018_pdq_hash_bit_storage"
+down_revision = "20250217_create_media_items_table"
+branch_labels = None
+depends_on = None
+
+_BACKFILL_BATCH = 5000
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == "postgresql"
+
+
+def _backfill_segments() -> None:
+    bind = op.get_bind()
+    media_items = sa.table(
+        "media_items",
+        sa.column("id", sa.Integer()),
+        sa.column("pdq_hash", sa.String()),
+        sa.column("pdq_segments", postgresql.ARRAY(sa.Integer())),
+    )
+
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(media_items.c.id, media_items.c.pdq_hash)
+            .where(media_items.c.id > last_id)
+            .where(media_items.c.pdq_hash.isnot(None))
+            .order_by(media_items.c.id)
+            .limit(_BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            return
+
+        bind.execute(
+            sa.update(media_items)
+            .where(media_items.c.id == sa.bindparam("row_id"))
+            .values(pdq_segments=sa.bindparam("segments")),
+            [{"row_id": row.id, "segments": pdq_segment_keys(row.pdq_hash)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    if not _is_postgresql():
+        op.add_column("media_items", sa.Column("pdq_segments", sa.JSON(), nullable=True))
+        return
+
+    op.add_column(
+        "media_items",
+        sa.Column("pdq_segments", postgresql.ARRAY(sa.Integer()), nullable=True),
+    )
+    # Segment keys are derived from the hex representation, so backfill them
+    # before the column switches to its binary form.
+    _backfill_segments()
+
+    op.drop_index("ix_media_items_pdq_hash", table_name="media_items")
+    op.execute(
+        "ALTER TABLE media_items ALTER COLUMN pdq_hash TYPE bit varying(256) "
+        "USING ('x' || pdq_hash)::bit varying(256)"
+    )
+    op.create_index(
+        "ix_media_items_pdq_segments",
+        "media_items",
+        ["pdq_segments"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    if not _is_postgresql():
+        op.drop_column("media_items", "pdq_segments")
+        return
+
+    op.drop_index("ix_media_items_pdq_segments", table_name="media_items")
+    # ``USING`` expressions cannot contain sub-queries, so convert through a
+    # temporary column.
+    op.add_column("media_items", sa.Column("pdq_hash_hex", sa.String(), nullable=True))
+    op.execute(
+        "UPDATE media_items SET pdq_hash_hex = ("
+        "SELECT string_agg(to_hex(substring(pdq_hash FROM i FOR 4)::bit(4)::integer), '' "
+        "ORDER BY i) FROM generate_series(1, length(pdq_hash), 4) AS i"
+        ") WHERE pdq_hash IS NOT NULL"
+    )
+    op.drop_column("media_items", "pdq_hash")
+    op.alter_column("media_items", "pdq_hash_hex", new_column_name="pdq_hash")
+    op.create_index("ix_media_items_pdq_hash", "media_items", ["pdq_hash"])
+    op.drop_column("media_items", "pdq_segments")
@@ -1,10 +1,11 @@
 import logging
+from dataclasses import asdict
 from functools import lru_cache
 from importlib.util import find_spec
 from typing import Annotated, Any
 
 import httpx
-from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
 from sqlmodel import Session, select
 from starlette.responses import RedirectResponse
 
@@ -15,10 +16,24 @@ from backend.models.enums import IngestionMode
 from backend.models.media_item import MediaItem
 from backend.models.schemas.user import UserRead
 from backend.models.user import User
-from backend.services.dedupe import DedupePipeline, PDQFilter
-from backend.services.embeddings import SigLIP2Encoder
+from backend.services.dedupe import (
+    DedupePipeline,
+    HashingExecutor,
+    PDQIndexRegistry,
+    StageConfig,
+)
+from backend.services.embeddings import (
+    EmbeddingBatcher,
+    EmbeddingCache,
+    EncoderWarmup,
+    ImageEncoder,
+    ONNXImageEncoder,
+    SigLIP2Encoder,
+    TorchInferenceProfile,
+)
+from backend.services.imaging import DecodedImage
 from backend.services.ingestion.google_photos import fetch_images_by_year
-from backend.services.vector import VectorStore
+from backend.services.vector import EmbeddingMatrixRegistry, PCAProjection, VectorStore
 from core.google_oauth import exchange_code_for_token, get_google_auth_url
 
 HAS_MULTIPART = find_spec("multipart") is not None
@@ -35,6 +50,31 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@api_router.get("/ready", response_model=dict[str, Any])
+def ready(response: Response) -> dict[str, Any]:
+    """Readiness: 503 until the encoder warm-up started by the lifespan finishes."""
+
+    warmup = get_encoder_warmup()
+    if not warmup.ready:
+        response.status_code = 503
+    return warmup.status()
+
+
+@api_router.get("/metrics/embeddings", response_model=dict[str, Any])
+def embedding_metrics() -> dict[str, Any]:
+    """Micro-batching latency/batch-size stats and embedding cache counters."""
+
+    metrics: dict[str, Any] = {"batching": None, "cache": None}
+    if get_image_encoder.cache_info().currsize:
+        encoder = get_image_encoder()
+        if isinstance(encoder, EmbeddingBatcher):
+            metrics["batching"] = encoder.stats()
+    cache = get_embedding_cache()
+    if cache is not None:
+        metrics["cache"] = cache.stats()
+    return metrics
+
+
 # --- User Routes ---
 
 
@@ -169,14 +209,145 @@ async def ingest_photos_for_dev(
     }
 
 
+@lru_cache
+def get_embedding_cache() -> EmbeddingCache | None:
+    if settings.EMBEDDING_CACHE_MEMORY_MB <= 0 and not settings.EMBEDDING_CACHE_DIR:
+        return None
+    return EmbeddingCache(
+        memory_budget_bytes=settings.EMBEDDING_CACHE_MEMORY_MB * 1024 * 1024,
+        directory=settings.EMBEDDING_CACHE_DIR,
+        disk_budget_bytes=settings.EMBEDDING_CACHE_DISK_MB * 1024 * 1024,
+    )
+
+
 @lru_cache
 def get_siglip2_encoder() -> SigLIP2Encoder:
-    return SigLIP2Encoder()
+    return SigLIP2Encoder(
+        model_name=settings.EMBEDDING_MODEL_NAME,
+        cache=get_embedding_cache(),
+        fast_preprocess=settings.EMBEDDING_FAST_PREPROCESS,
+        profile=TorchInferenceProfile(
+            inference_mode=settings.EMBEDDING_TORCH_INFERENCE_MODE,
+            intra_op_threads=settings.EMBEDDING_TORCH_THREADS,
+            inter_op_threads=settings.EMBEDDING_TORCH_INTEROP_THREADS,
+            bf16_autocast=settings.EMBEDDING_TORCH_BF16,
+            channels_last=settings.EMBEDDING_TORCH_CHANNELS_LAST,
+            compile=settings.EMBEDDING_TORCH_COMPILE,
+            compile_mode=settings.EMBEDDING_TORCH_COMPILE_MODE,
+        ),
+    )
+
+
+def get_embedding_version() -> str:
+    """The version stored with new embeddings, read from settings without loading a model."""
+    return settings.EMBEDDING_VERSION or settings.EMBEDDING_MODEL_NAME
+
+
+@lru_cache
+def get_embedding_model() -> ImageEncoder:
+    backend = settings.EMBEDDING_BACKEND.lower()
+    encoder: SigLIP2Encoder | ONNXImageEncoder
+    if backend == "torch":
+        encoder = get_siglip2_encoder()
+    elif backend == "onnx":
+        model_path = settings.require_env("EMBEDDING_ONNX_PATH")
+        encoder = ONNXImageEncoder.from_path(
+            model_path,
+            quantize=settings.EMBEDDING_ONNX_QUANTIZE,
+            intra_op_threads=settings.EMBEDDING_ONNX_THREADS,
+            cache=get_embedding_cache(),
+        )
+    else:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND}")
+    encoder.version_label = get_embedding_version()
+    return encoder
+
+
+@lru_cache
+def get_image_encoder() -> ImageEncoder:
+    encoder = get_embedding_model()
+    if settings.EMBEDDING_BATCH_MAX_SIZE <= 1:
+        return encoder
+    return EmbeddingBatcher(
+        encoder,
+        max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+    )
+
+
+@lru_cache
+def get_encoder_warmup() -> EncoderWarmup:
+    return EncoderWarmup(get_image_encoder)
 
 
 @lru_cache
 def get_vector_store() -> VectorStore:
-    return VectorStore(session_factory=SessionLocal)
+    return VectorStore(
+        session_factory=SessionLocal,
+        pdq_index=PDQIndexRegistry(
+            memory_budget_bytes=settings.PDQ_INDEX_MEMORY_BUDGET_MB * 1024 * 1024,
+        ),
+        pdq_search_backend=settings.PDQ_SEARCH_BACKEND,
+        projection=(
+            PCAProjection.load(settings.EMBEDDING_PROJECTION_PATH)
+            if settings.EMBEDDING_PROJECTION_PATH
+            else None
+        ),
+        rerank_factor=settings.VECTOR_RERANK_FACTOR,
+        upsert_batch_size=settings.VECTOR_UPSERT_BATCH_SIZE,
+        ef_search=settings.VECTOR_HNSW_EF_SEARCH,
+        probes=settings.VECTOR_IVFFLAT_PROBES,
+        exact_search_max_rows=settings.VECTOR_EXACT_SEARCH_MAX_ROWS,
+        iterative_scan=settings.VECTOR_ITERATIVE_SCAN,
+        vector_search_backend=settings.VECTOR_SEARCH_BACKEND,
+        matrix_index=EmbeddingMatrixRegistry(
+            memory_budget_bytes=settings.VECTOR_MATRIX_MEMORY_BUDGET_MB * 1024 * 1024,
+            directory=settings.VECTOR_INDEX_DIR,
+            ivf_min_rows=settings.VECTOR_IVF_MIN_ROWS,
+            nprobe=settings.VECTOR_IVF_NPROBE,
+            refresh_interval=settings.VECTOR_MATRIX_REFRESH_SECONDS,
+        ),
+    )
+
+
+@lru_cache
+def get_hash_executor() -> HashingExecutor:
+    return HashingExecutor(max_workers=settings.HASH_WORKERS, method="auto")
+
+
+def get_dedupe_stages() -> list[StageConfig]:
+    stages: list[StageConfig] = []
+    for name in settings.DEDUPE_STAGES.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        prefix = f"DEDUPE_{name.upper()}_"
+        stages.append(
+            StageConfig(
+                name=name,
+                threshold=getattr(settings, f"{prefix}THRESHOLD", None),
+                budget=getattr(settings, f"{prefix}BUDGET", None),
+                early_exit=getattr(settings, f"{prefix}EARLY_EXIT", True),
+                ef_search=getattr(settings, f"{prefix}EF_SEARCH", None),
+            )
+        )
+    return stages
+
+
+@api_router.get("/dedupe/groups/{user_id}", response_model=dict[str, Any])
+def dedupe_groups(
+    user_id: int,
+    session: Annotated[Session, Depends(get_session)],
+    limit: Annotated[int, Query(ge=1, le=500)] = 50,
+    offset: Annotated[int, Query(ge=0)] = 0,
+) -> dict[str, Any]:
+    """Page through the groups stored by the last ``cluster_duplicates`` run."""
+
+    if session.get(User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    total, groups = get_vector_store().duplicate_groups(user_id, limit=limit, offset=offset)
+    return {"total": total, "limit": limit, "offset": offset, "groups": groups}
 
 
 if HAS_MULTIPART:
@@ -196,17 +367,51 @@ if HAS_MULTIPART:
         if not payload:
             raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
-        pdq_filter = PDQFilter(method="auto")
-        pdq_hash, quality, method = pdq_filter.compute_hash(payload)
+        image = DecodedImage(payload)
+        vector_store = get_vector_store()
 
-        encoder = get_siglip2_encoder()
-        embedding = encoder.embed_bytes(payload)
+        # A byte-identical upload already processed for this user donates its
+        # hash and embedding, skipping decoding and inference entirely.
+        duplicate = next(
+            (
+                hit
+                for hit in vector_store.find_by_digest(
+                    user_id=media_item.user_id,
+                    content_digest=image.digest,
+                    include_embedding=True,
+                )
+                if hit["id"] != media_item_id and hit["embedding"] is not None
+            ),
+            None,
+        )
+        if duplicate is not None:
+            vector_store.upsert_embedding(
+                media_item_id=media_item_id,
+                embedding=duplicate["embedding"],
+                pdq_hash=duplicate["pdq_hash"],
+                content_digest=image.digest,
+                embedding_version=duplicate["embedding_version"],
+            )
+            return {
+                "status": "ok",
+                "pdq_hash": duplicate["pdq_hash"],
+                "pdq_quality": None,
+                "pdq_method": None,
+                "embedding_dim": len(duplicate["embedding"]),
+                "exact_duplicate_of": duplicate["id"],
+            }
+
+        pdq_hash, quality, method = get_hash_executor().compute_hash(image)
+
+        encoder = get_image_encoder()
+        embedding = encoder.embed_image(image)
 
-        vector_store = get_vector_store()
         vector_store.upsert_embedding(
             media_item_id=media_item_id,
             embedding=embedding,
             pdq_hash=pdq_hash,
+            content_digest=image.digest,
+            embedding_version=encoder.embedding_version,
         )
 
         return {
@@ -215,6 +420,7 @@ if HAS_MULTIPART:
             "pdq_quality": quality,
             "pdq_method": method,
             "embedding_dim": len(embedding),
+            "exact_duplicate_of": None,
         }
 
     @api_router.post("/dedupe/search/{user_id}", response_model=dict[str, Any])
@@ -234,10 +440,16 @@ if HAS_MULTIPART:
 
         pipeline = DedupePipeline(
             vector_store=get_vector_store(),
-            encoder=get_siglip2_encoder(),
+            encoder=get_image_encoder(),
+            dihedral=settings.PDQ_DIHEDRAL,
+            stages=get_dedupe_stages(),
+            hasher=get_hash_executor(),
         )
-        matches = pipeline.find_candidates(payload, user_id=user_id)
-        return {"results": matches}
+        result = pipeline.run(DecodedImage(payload), user_id=user_id)
+        return {
+            "results": result.matches,
+            "stages": [asdict(report) for report in result.stages],
+        }
 
 else:  # pragma: no cover - optional dependency guard
     logger.warning(
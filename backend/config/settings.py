@@ -36,6 +36,142 @@ class Settings(BaseSettings):
     INGESTION_PAGE_SIZE: int = Field(100, validation_alias="INGESTION_PAGE_SIZE")
     LOG_LEVEL: int = logging.DEBUG
 
+    # ───────────────────────── Image embeddings ────────────────────────────────
+    # "torch" runs the transformers checkpoint; "onnx" runs EMBEDDING_ONNX_PATH
+    # on ONNX Runtime, optionally through its int8-quantized copy.
+    EMBEDDING_BACKEND: str = Field("torch", validation_alias="EMBEDDING_BACKEND")
+    # Checkpoint the torch backend loads; with "onnx", the one the model at
+    # EMBEDDING_ONNX_PATH was exported from.
+    EMBEDDING_MODEL_NAME: str = Field(
+        "google/siglip-base-patch16-224", validation_alias="EMBEDDING_MODEL_NAME"
+    )
+    # Vectorised NumPy preprocessing instead of the per-image HF processor call.
+    EMBEDDING_FAST_PREPROCESS: bool = Field(True, validation_alias="EMBEDDING_FAST_PREPROCESS")
+    # Load the encoder (plus one dummy forward pass) in the background at
+    # startup; /api/ready reports 503 until it finishes.
+    EMBEDDING_WARMUP: bool = Field(True, validation_alias="EMBEDDING_WARMUP")
+    # Label stored with each embedding; unset uses the checkpoint name, shared
+    # by the torch, bf16 and ONNX backends. Rows with another version are
+    # re-embedded by the `reembed_stale_embeddings` task and ignored by
+    # searches until then. Set a new label after a preprocessing change.
+    EMBEDDING_VERSION: str | None = Field(None, validation_alias="EMBEDDING_VERSION")
+    # Comma-separated user ids re-embedded before everyone else.
+    REEMBED_PRIORITY_USERS: str = Field("", validation_alias="REEMBED_PRIORITY_USERS")
+    REEMBED_BATCH_SIZE: int = Field(64, validation_alias="REEMBED_BATCH_SIZE")
+    REEMBED_ITEMS_PER_RUN: int = Field(5000, validation_alias="REEMBED_ITEMS_PER_RUN")
+    REEMBED_MAX_ITEMS_PER_SECOND: float | None = Field(
+        None, validation_alias="REEMBED_MAX_ITEMS_PER_SECOND"
+    )
+    # Opt-in torch profile; `make bench-encoder` measures each option on this host.
+    # Unset thread counts keep torch's defaults.
+    EMBEDDING_TORCH_INFERENCE_MODE: bool = Field(
+        False, validation_alias="EMBEDDING_TORCH_INFERENCE_MODE"
+    )
+    EMBEDDING_TORCH_THREADS: int | None = Field(None, validation_alias="EMBEDDING_TORCH_THREADS")
+    EMBEDDING_TORCH_INTEROP_THREADS: int | None = Field(
+        None, validation_alias="EMBEDDING_TORCH_INTEROP_THREADS"
+    )
+    EMBEDDING_TORCH_BF16: bool = Field(False, validation_alias="EMBEDDING_TORCH_BF16")
+    EMBEDDING_TORCH_CHANNELS_LAST: bool = Field(
+        False, validation_alias="EMBEDDING_TORCH_CHANNELS_LAST"
+    )
+    EMBEDDING_TORCH_COMPILE: bool = Field(False, validation_alias="EMBEDDING_TORCH_COMPILE")
+    EMBEDDING_TORCH_COMPILE_MODE: str | None = Field(
+        None, validation_alias="EMBEDDING_TORCH_COMPILE_MODE"
+    )
+    EMBEDDING_ONNX_PATH: str | None = Field(None, validation_alias="EMBEDDING_ONNX_PATH")
+    EMBEDDING_ONNX_QUANTIZE: bool = Field(False, validation_alias="EMBEDDING_ONNX_QUANTIZE")
+    EMBEDDING_ONNX_THREADS: int | None = Field(None, validation_alias="EMBEDDING_ONNX_THREADS")
+    # Concurrent requests are coalesced into one forward pass of up to
+    # EMBEDDING_BATCH_MAX_SIZE images; 1 disables micro-batching.
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(16, validation_alias="EMBEDDING_BATCH_MAX_SIZE")
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = Field(5.0, validation_alias="EMBEDDING_BATCH_MAX_WAIT_MS")
+
+    # Embeddings cached by (content digest, model, preprocessing version): an
+    # in-process LRU plus, when EMBEDDING_CACHE_DIR is set, memory-mapped files.
+    EMBEDDING_CACHE_MEMORY_MB: int = Field(64, validation_alias="EMBEDDING_CACHE_MEMORY_MB")
+    EMBEDDING_CACHE_DIR: str | None = Field(None, validation_alias="EMBEDDING_CACHE_DIR")
+    EMBEDDING_CACHE_DISK_MB: int = Field(1024, validation_alias="EMBEDDING_CACHE_DISK_MB")
+
+    # Compact candidate vectors: with a projection fitted by `make fit-projection`,
+    # similarity search ranks top_k * VECTOR_RERANK_FACTOR candidates on the
+    # 256-d halfvec column and reranks them with the full embedding.
+    EMBEDDING_PROJECTION_PATH: str | None = Field(
+        None, validation_alias="EMBEDDING_PROJECTION_PATH"
+    )
+    VECTOR_RERANK_FACTOR: int = Field(4, validation_alias="VECTOR_RERANK_FACTOR")
+    # HNSW build parameters, read by the `20261018_hnsw_embedding_index` migration.
+    VECTOR_HNSW_M: int = Field(16, validation_alias="VECTOR_HNSW_M")
+    VECTOR_HNSW_EF_CONSTRUCTION: int = Field(64, validation_alias="VECTOR_HNSW_EF_CONSTRUCTION")
+    # Default search breadth (`SET LOCAL hnsw.ef_search` / `ivfflat.probes`);
+    # unset keeps pgvector's defaults. Higher values trade latency for recall.
+    VECTOR_HNSW_EF_SEARCH: int | None = Field(None, validation_alias="VECTOR_HNSW_EF_SEARCH")
+    VECTOR_IVFFLAT_PROBES: int | None = Field(None, validation_alias="VECTOR_IVFFLAT_PROBES")
+    # Users with at most this many embeddings are searched exactly instead of
+    # through the global ANN index (whose user_id filter runs after the scan).
+    VECTOR_EXACT_SEARCH_MAX_ROWS: int = Field(
+        10_000, validation_alias="VECTOR_EXACT_SEARCH_MAX_ROWS"
+    )
+    # `hnsw.iterative_scan` for larger users; "off" skips it. Needs pgvector
+    # >= 0.8: older versions are detected at the first search and skip it.
+    VECTOR_ITERATIVE_SCAN: str = Field("strict_order", validation_alias="VECTOR_ITERATIVE_SCAN")
+    # Rows per statement (and transaction) in `VectorStore.upsert_embeddings`.
+    VECTOR_UPSERT_BATCH_SIZE: int = Field(500, validation_alias="VECTOR_UPSERT_BATCH_SIZE")
+    # Budget for the per-user embedding matrices searched on databases without
+    # pgvector, or everywhere with VECTOR_SEARCH_BACKEND=memory.
+    VECTOR_MATRIX_MEMORY_BUDGET_MB: int = Field(
+        256, validation_alias="VECTOR_MATRIX_MEMORY_BUDGET_MB"
+    )
+    VECTOR_SEARCH_BACKEND: str = Field("auto", validation_alias="VECTOR_SEARCH_BACKEND")
+    # Matrices are saved here and memory-mapped on restart; unset rebuilds from the database.
+    VECTOR_INDEX_DIR: str | None = Field(None, validation_alias="VECTOR_INDEX_DIR")
+    # Seconds between checks of a loaded matrix against the database; a
+    # matrix changed by another process is rebuilt.
+    VECTOR_MATRIX_REFRESH_SECONDS: float = Field(
+        30.0, validation_alias="VECTOR_MATRIX_REFRESH_SECONDS"
+    )
+    # Matrices with at least this many rows are split into k-means lists, of
+    # which each query scores the VECTOR_IVF_NPROBE closest. This makes search
+    # approximate; unset (the default) scans every row exactly.
+    VECTOR_IVF_MIN_ROWS: int | None = Field(None, validation_alias="VECTOR_IVF_MIN_ROWS")
+    VECTOR_IVF_NPROBE: int = Field(16, validation_alias="VECTOR_IVF_NPROBE")
+
+    # ───────────────────────── Duplicate detection ─────────────────────────────
+    PDQ_INDEX_MEMORY_BUDGET_MB: int = Field(256, validation_alias="PDQ_INDEX_MEMORY_BUDGET_MB")
+    PDQ_SEARCH_BACKEND: str = Field("auto", validation_alias="PDQ_SEARCH_BACKEND")
+    PDQ_DIHEDRAL: bool = Field(True, validation_alias="PDQ_DIHEDRAL")
+    # Opt-in hashing process pool for batches (e.g. the compute_image_hashes
+    # task). 0 hashes inline on the already-decoded image, which is cheaper for
+    # single uploads since a worker would decode the bytes again.
+    HASH_WORKERS: int | None = Field(0, validation_alias="HASH_WORKERS")
+
+    # Cascade stages run in this order; each reads DEDUPE_<STAGE>_THRESHOLD,
+    # DEDUPE_<STAGE>_BUDGET and DEDUPE_<STAGE>_EARLY_EXIT when defined.
+    DEDUPE_STAGES: str = Field("digest,pdq,embedding", validation_alias="DEDUPE_STAGES")
+    DEDUPE_DIGEST_EARLY_EXIT: bool = Field(True, validation_alias="DEDUPE_DIGEST_EARLY_EXIT")
+    DEDUPE_PDQ_THRESHOLD: int = Field(8, validation_alias="DEDUPE_PDQ_THRESHOLD")
+    DEDUPE_PDQ_BUDGET: int = Field(200, validation_alias="DEDUPE_PDQ_BUDGET")
+    DEDUPE_PDQ_EARLY_EXIT: bool = Field(True, validation_alias="DEDUPE_PDQ_EARLY_EXIT")
+    DEDUPE_EMBEDDING_THRESHOLD: float | None = Field(
+        None, validation_alias="DEDUPE_EMBEDDING_THRESHOLD"
+    )
+    DEDUPE_EMBEDDING_BUDGET: int = Field(50, validation_alias="DEDUPE_EMBEDDING_BUDGET")
+    DEDUPE_EMBEDDING_EF_SEARCH: int | None = Field(
+        None, validation_alias="DEDUPE_EMBEDDING_EF_SEARCH"
+    )
+
+    # Library-wide duplicate groups (`cluster_duplicates` task): items within
+    # CLUSTER_PDQ_THRESHOLD bits, or among each other's CLUSTER_NEIGHBOURS
+    # nearest embeddings at CLUSTER_EMBEDDING_THRESHOLD similarity, are grouped.
+    # Unset thresholds skip that signal.
+    CLUSTER_PDQ_THRESHOLD: int | None = Field(8, validation_alias="CLUSTER_PDQ_THRESHOLD")
+    CLUSTER_EMBEDDING_THRESHOLD: float | None = Field(
+        0.95, validation_alias="CLUSTER_EMBEDDING_THRESHOLD"
+    )
+    CLUSTER_NEIGHBOURS: int = Field(10, validation_alias="CLUSTER_NEIGHBOURS")
+    # Embeddings read and searched per batch.
+    CLUSTER_CHUNK_SIZE: int = Field(256, validation_alias="CLUSTER_CHUNK_SIZE")
+
     # Pydantic v2 config
     model_config = {
         "env_file": ".env",
@@ -1,12 +1,33 @@
+import logging
 from collections.abc import Generator
+from typing import Any
 
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, create_engine
 
 from backend.config.settings import settings
 
+logger = logging.getLogger(__name__)
+
 engine = create_engine(settings.DATABASE_URL, echo=True)
 
+
+if engine.dialect.driver == "psycopg":
+
+    @event.listens_for(engine, "connect")
+    def _register_vector_types(dbapi_connection: Any, _connection_record: Any) -> None:
+        """Let psycopg 3 send and receive embeddings in pgvector's binary format."""
+
+        import psycopg
+        from pgvector.psycopg import register_vector
+
+        try:
+            register_vector(dbapi_connection)
+        except psycopg.ProgrammingError:  # pragma: no cover - before the first migration
+            logger.warning("pgvector extension missing; run the migrations before embedding")
+
+
 # Provide a session factory for services that prefer explicit sessionmaker usage.
 SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
 
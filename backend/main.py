@@ -1,4 +1,5 @@
 # backend/main.py
+import asyncio
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 from typing import Any
@@ -7,16 +8,44 @@ import httpx
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.api.routes import api_router
+from backend.api.routes import (
+    api_router,
+    get_embedding_cache,
+    get_encoder_warmup,
+    get_hash_executor,
+    get_image_encoder,
+    get_vector_store,
+)
 from backend.config.settings import settings
+from backend.services.embeddings import EmbeddingBatcher
 from core.logging_config import configure_logging
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    warmup = get_encoder_warmup()
+    if settings.EMBEDDING_WARMUP:
+        # Load the model in a worker thread so startup (and /health) is not
+        # blocked; /api/ready stays 503 until this finishes.
+        app.state.encoder_warmup = asyncio.create_task(asyncio.to_thread(warmup.run))
+    else:
+        warmup.skip()
+
     async with httpx.AsyncClient(timeout=10.0) as client:
         app.state.http = client  # type: ignore[attr-defined]
         yield
+    if get_hash_executor.cache_info().currsize:
+        get_hash_executor().shutdown()
+    if get_image_encoder.cache_info().currsize:
+        encoder = get_image_encoder()
+        if isinstance(encoder, EmbeddingBatcher):
+            encoder.close()
+    if get_embedding_cache.cache_info().currsize:
+        cache = get_embedding_cache()
+        if cache is not None:
+            cache.flush()
+    if get_vector_store.cache_info().currsize:
+        get_vector_store().matrix_index.flush()
 
 
 def create_app() -> FastAPI:
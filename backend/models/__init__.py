@@ -1,7 +1,8 @@
+from .duplicate_group import DuplicateGroup
 from .embedding import ImageEmbedding
 from .enums import IngestionMode
 from .image import Image
 from .media_item import MediaItem
 from .user import User
 
-__all__ = ["User", "Image", "ImageEmbedding", "MediaItem", "IngestionMode"]
+__all__ = ["User", "Image", "ImageEmbedding", "MediaItem", "DuplicateGroup", "IngestionMode"]
@@ -0,0 +1,33 @@
+"""Persisted output of the library-wide duplicate clustering job."""
+
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from sqlalchemy import JSON, DateTime, Index, Integer
+from sqlalchemy.dialects import postgresql
+from sqlmodel import Column, Field, SQLModel
+
+
+class DuplicateGroup(SQLModel, table=True):  # type: ignore[misc]
+    """One group of a user's media items linked by PDQ or embedding similarity.
+
+    A clustering run replaces all of the user's groups in one transaction.
+    """
+
+    __tablename__ = "duplicate_groups"
+    __table_args__ = (Index("ix_duplicate_groups_user_id_size", "user_id", "size"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(index=True)
+    size: int
+    # Sorted ``media_items.id`` values of the group's members.
+    media_item_ids: list[int] = Field(
+        sa_column=Column(
+            JSON().with_variant(postgresql.ARRAY(Integer), "postgresql"), nullable=False
+        ),
+    )
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(UTC),
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+    )
@@ -3,39 +3,147 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import TYPE_CHECKING, Any
+from typing import Annotated, Any
 
+import numpy as np
+import numpy.typing as npt
+from pydantic import BeforeValidator
+from sqlalchemy import JSON, Index, Integer, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator, UserDefinedType
 from sqlmodel import Column, Field, SQLModel
 
-if TYPE_CHECKING:  # pragma: no cover - typing import
-    from pgvector.sqlalchemy import Vector  # type: ignore
-else:  # pragma: no cover - runtime import with fallback
-    try:
-        from pgvector.sqlalchemy import Vector  # type: ignore
-    except ModuleNotFoundError:
-        from sqlalchemy.types import JSON, TypeDecorator
 
-        class Vector(TypeDecorator):  # type: ignore[type-arg]
-            impl = JSON
-            cache_ok = True
+def as_embedding(value: Any) -> npt.NDArray[np.float32]:
+    """Coerce a vector to a contiguous float32 array (no copy if it already is one)."""
 
-            def __init__(self, dim: int):
-                super().__init__()
-                self.dim = dim
+    return np.ascontiguousarray(value, dtype=np.float32)
 
-            def process_bind_param(self, value: Any, dialect: Any) -> Any:
-                return value
 
-            def process_result_value(self, value: Any, dialect: Any) -> Any:
-                return value
+EmbeddingArray = Annotated[np.ndarray, BeforeValidator(as_embedding)]
+
+
+class _PGVector(UserDefinedType):  # type: ignore[type-arg]
+    """pgvector ``vector``/``halfvec`` column that exchanges float32 NumPy arrays.
+
+    Under psycopg 3 (with ``pgvector.psycopg.register_vector`` run on connect,
+    see ``backend.db.session``) values travel in pgvector's binary format.
+    psycopg2 only speaks text; results are parsed with ``np.fromstring``.
+    """
+
+    cache_ok = True
+
+    def __init__(self, dim: int, half: bool = False) -> None:
+        self.dim = dim
+        self.half = half
+
+    def get_col_spec(self, **kw: Any) -> str:
+        return f"{'HALFVEC' if self.half else 'VECTOR'}({self.dim})"
+
+    def bind_processor(self, dialect: Any) -> Any:
+        if dialect.driver == "psycopg":
+            from pgvector import HalfVector, Vector
+
+            wrap = HalfVector if self.half else Vector
+
+            def process_binary(value: Any) -> Any:
+                return None if value is None else wrap(as_embedding(value))
+
+            return process_binary
+
+        def process_text(value: Any) -> str | None:
+            if value is None:
+                return None
+            return "[" + ",".join(map(str, as_embedding(value).tolist())) + "]"
+
+        return process_text
+
+    def result_processor(self, dialect: Any, coltype: Any) -> Any:
+        def process(value: Any) -> np.ndarray | None:
+            if value is None:
+                return None
+            if isinstance(value, str):
+                return np.fromstring(value[1:-1], dtype=np.float32, sep=",")
+            # pgvector.psycopg loaders return Vector/HalfVector objects.
+            return as_embedding(value.to_numpy())
+
+        return process
+
+
+class EmbeddingVector(TypeDecorator):  # type: ignore[type-arg]
+    """Embedding column: pgvector on PostgreSQL, a JSON list elsewhere.
+
+    Python code always sees float32 ``np.ndarray`` values.
+    """
+
+    # ``none_as_null`` stores missing embeddings as SQL NULL rather than JSON
+    # ``null`` so ``IS NULL`` filters agree with PostgreSQL.
+    impl = JSON(none_as_null=True)
+    cache_ok = True
+
+    def __init__(self, dim: int, half: bool = False) -> None:
+        super().__init__()
+        self.dim = dim
+        self.half = half
+
+    def load_dialect_impl(self, dialect: Any) -> Any:
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(_PGVector(self.dim, half=self.half))
+        return dialect.type_descriptor(JSON(none_as_null=True))
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if value is None or dialect.name == "postgresql":
+            return value
+        return np.asarray(value, dtype=np.float32).tolist()
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        if value is None or dialect.name == "postgresql":
+            return value
+        return as_embedding(value)
+
+
+# Width of the ``embedding_compact`` column. Projections to fewer dimensions are
+# zero-padded, which leaves cosine similarities unchanged.
+COMPACT_EMBEDDING_DIM = 256
+
+
+class PDQHash(TypeDecorator):  # type: ignore[type-arg]
+    """Hexadecimal perceptual hash stored as ``bit varying(256)`` on PostgreSQL.
+
+    Python code always sees the hex string; other dialects store it verbatim.
+    """
+
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect: Any) -> Any:
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.BIT(256, varying=True))
+        return dialect.type_descriptor(String())
+
+    def process_bind_param(self, value: Any, dialect: Any) -> Any:
+        if value is None or dialect.name != "postgresql":
+            return value
+        return bin(int(value, 16))[2:].zfill(len(value) * 4)
+
+    def process_result_value(self, value: Any, dialect: Any) -> Any:
+        if value is None or dialect.name != "postgresql":
+            return value
+        return f"{int(value, 2):0{len(value) // 4}x}"
 
 
 class MediaItem(SQLModel, table=True):  # type: ignore[misc]
     __tablename__ = "media_items"
+    __table_args__ = (
+        Index("ix_media_items_pdq_segments", "pdq_segments", postgresql_using="gin"),
+        Index("ix_media_items_user_id_content_digest", "user_id", "content_digest"),
+        Index("ix_media_items_user_id_embedding_version", "user_id", "embedding_version"),
+    )
 
     model_config = {
         "validate_assignment": True,
         "validate_default": True,
+        "arbitrary_types_allowed": True,
     }
 
     id: int | None = Field(default=None, primary_key=True)
@@ -45,9 +153,29 @@ class MediaItem(SQLModel, table=True):  # type: ignore[misc]
     base_url: str | None = Field(default=None)
     mime_type: str | None = Field(default=None)
     creation_time: datetime | None = Field(default=None, index=True)
+    # BLAKE2b-256 of the uploaded bytes, used to short-circuit exact duplicates.
+    content_digest: str | None = Field(default=None, max_length=64)
 
-    embedding: list[float] | None = Field(
+    embedding: EmbeddingArray | None = Field(
+        default=None,
+        sa_column=Column(EmbeddingVector(dim=768)),
+    )
+    # ``ImageEncoder.embedding_version`` of the encoder that produced
+    # ``embedding``; searches only compare vectors of the same version.
+    embedding_version: str | None = Field(default=None, max_length=255)
+    # Incremented by every embedding write; cached embedding matrices compare
+    # its per-version sum to notice in-place re-embeds.
+    embedding_revision: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    # PCA-projected, half-precision copy of ``embedding`` used for ANN candidate
+    # generation; see ``PCAProjection``.
+    embedding_compact: EmbeddingArray | None = Field(
+        default=None,
+        sa_column=Column(EmbeddingVector(dim=COMPACT_EMBEDDING_DIM, half=True)),
+    )
+    pdq_hash: str | None = Field(default=None, sa_column=Column(PDQHash()))
+    # Substring keys of ``pdq_hash`` (see ``pdq_segment_keys``) backing the
+    # GIN-indexed pre-filter for in-database Hamming search.
+    pdq_segments: list[int] | None = Field(
         default=None,
-        sa_column=Column(Vector(dim=768)),
+        sa_column=Column(JSON().with_variant(postgresql.ARRAY(Integer), "postgresql")),
     )
-    pdq_hash: str | None = Field(default=None, index=True)
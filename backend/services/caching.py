@@ -0,0 +1,111 @@
+"""Small in-process caching primitives shared by the dedupe and vector services."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class ByteBudgetLRU:
+    """Least-recently-used mapping bounded by an approximate byte budget.
+
+    Entries report their own size through ``sizeof``; the most recently used
+    entry is never evicted, so a single oversized value is still served.
+    """
+
+    def __init__(self, budget_bytes: int, sizeof: Callable[[Any], int]) -> None:
+        self.budget_bytes = budget_bytes
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._sizes: dict[Hashable, int] = {}
+        self._total = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    @property
+    def nbytes(self) -> int:
+        return self._total
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Any | None:
+        """Return ``key`` without touching recency or the hit counters."""
+
+        return self._entries.get(key)
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._measure(key)
+            self.trim()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self.get(key)
+            if value is None:
+                value = factory()
+                self.put(key, value)
+            return value
+
+    def refresh(self, key: Hashable) -> None:
+        """Re-measure an entry that was mutated in place, then enforce the budget."""
+
+        with self._lock:
+            if key in self._entries:
+                self._measure(key)
+                self.trim()
+
+    def pop(self, key: Hashable) -> Any | None:
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+            return self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total = 0
+
+    def trim(self) -> None:
+        """Evict least-recently-used entries until the budget is respected."""
+
+        with self._lock:
+            while self._total > self.budget_bytes and len(self._entries) > 1:
+                key, _ = self._entries.popitem(last=False)
+                self._total -= self._sizes.pop(key, 0)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _measure(self, key: Hashable) -> None:
+        size = self._sizeof(self._entries[key])
+        self._total += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
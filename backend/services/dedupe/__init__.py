@@ -1,6 +1,21 @@
 """Duplicate filtering service exports."""
 
+from backend.services.dedupe.cascade import DedupeCascade, StageConfig, StageReport
+from backend.services.dedupe.clustering import ClusteringReport, DuplicateClusterer
+from backend.services.dedupe.hash_executor import HashingExecutor
 from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.dedupe.pdq_index import PDQIndex, PDQIndexRegistry
 from backend.services.dedupe.pipeline import DedupePipeline
 
-__all__ = ["DedupePipeline", "PDQFilter"]
+__all__ = [
+    "ClusteringReport",
+    "DedupeCascade",
+    "DedupePipeline",
+    "DuplicateClusterer",
+    "HashingExecutor",
+    "PDQFilter",
+    "PDQIndex",
+    "PDQIndexRegistry",
+    "StageConfig",
+    "StageReport",
+]
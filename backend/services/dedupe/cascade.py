@@ -0,0 +1,246 @@
+"""Configurable multi-stage duplicate detection cascade."""
+
+from __future__ import annotations
+
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, ClassVar
+
+from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.imaging import DecodedImage
+
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from backend.services.dedupe.hash_executor import HashingExecutor
+    from backend.services.embeddings.base import ImageEncoder
+    from backend.services.vector.pgvector_store import VectorStore
+
+
+@dataclass(frozen=True)
+class StageConfig:
+    """Tuning knobs for one cascade stage.
+
+    ``threshold`` is stage specific (maximum Hamming distance for ``pdq``,
+    minimum cosine similarity for ``embedding``), ``budget`` caps how many
+    candidates the stage keeps, and ``early_exit`` returns the stage's matches
+    immediately instead of handing them to the next stage as candidates.
+    ``ef_search`` widens the ``embedding`` stage's HNSW search for more recall
+    at the cost of latency.
+    """
+
+    name: str
+    threshold: float | None = None
+    budget: int | None = None
+    early_exit: bool = True
+    ef_search: int | None = None
+
+
+@dataclass
+class StageReport:
+    name: str
+    # ``None`` while no earlier stage has narrowed the search (the whole
+    # library, which is not counted).
+    candidates_in: int | None
+    candidates_out: int
+    pruned: int | None
+    elapsed_ms: float
+    exited: bool = False
+
+
+@dataclass
+class CascadeResult:
+    matches: list[dict[str, Any]]
+    stages: list[StageReport] = field(default_factory=list)
+
+
+@dataclass
+class CascadeContext:
+    """Per-request state shared by the stages of one cascade run."""
+
+    image: DecodedImage
+    user_id: int
+    vector_store: VectorStore
+    encoder: ImageEncoder
+    pdq: PDQFilter | HashingExecutor
+    dihedral: bool = False
+
+
+class CascadeStage(ABC):
+    """Base class for cascade stages.
+
+    ``run`` receives the candidates that survived earlier stages, or ``None``
+    when no stage has narrowed the search yet (the whole library).
+    """
+
+    name: ClassVar[str]
+
+    def __init__(self, config: StageConfig) -> None:
+        self.config = config
+
+    @abstractmethod
+    def run(
+        self,
+        ctx: CascadeContext,
+        candidates: list[dict[str, Any]] | None,
+    ) -> list[dict[str, Any]]: ...
+
+    def _restrict(
+        self,
+        matches: list[dict[str, Any]],
+        candidates: list[dict[str, Any]] | None,
+    ) -> list[dict[str, Any]]:
+        if candidates is not None:
+            allowed = {candidate["id"] for candidate in candidates}
+            matches = [match for match in matches if match["id"] in allowed]
+        if self.config.budget is not None:
+            matches = matches[: self.config.budget]
+        return matches
+
+
+class DigestStage(CascadeStage):
+    """Exact byte-level duplicates via the indexed content digest."""
+
+    name = "digest"
+
+    def run(
+        self,
+        ctx: CascadeContext,
+        candidates: list[dict[str, Any]] | None,
+    ) -> list[dict[str, Any]]:
+        hits = ctx.vector_store.find_by_digest(
+            user_id=ctx.user_id,
+            content_digest=ctx.image.digest,
+        )
+        matches = [
+            {**hit, "pdq_distance": 0, "similarity": 1.0, "match_type": "exact"} for hit in hits
+        ]
+        return self._restrict(matches, candidates)
+
+
+class PDQStage(CascadeStage):
+    """Perceptual-hash radius search (optionally over all dihedral variants)."""
+
+    name = "pdq"
+    default_threshold = 8
+
+    def run(
+        self,
+        ctx: CascadeContext,
+        candidates: list[dict[str, Any]] | None,
+    ) -> list[dict[str, Any]]:
+        target_hashes: str | list[str]
+        if ctx.dihedral:
+            target_hashes, _, method = ctx.pdq.compute_dihedral_hashes(ctx.image)
+        else:
+            target_hashes, _, method = ctx.pdq.compute_hash(ctx.image)
+
+        threshold = self.config.threshold
+        hits = ctx.vector_store.search_pdq(
+            pdq_hash=target_hashes,
+            user_id=ctx.user_id,
+            max_distance=int(threshold if threshold is not None else self.default_threshold),
+        )
+        for hit in hits:
+            hit["pdq_method"] = method
+            hit["match_type"] = "pdq"
+        return self._restrict(hits, candidates)
+
+
+class EmbeddingStage(CascadeStage):
+    """SigLIP similarity: ANN top-k search, or a rerank of earlier candidates."""
+
+    name = "embedding"
+    default_budget = 50
+
+    def run(
+        self,
+        ctx: CascadeContext,
+        candidates: list[dict[str, Any]] | None,
+    ) -> list[dict[str, Any]]:
+        embedding = ctx.encoder.embed_image(ctx.image)
+        budget = self.config.budget or self.default_budget
+        item_ids = [candidate["id"] for candidate in candidates] if candidates else None
+        neighbors = ctx.vector_store.search(
+            embedding=embedding,
+            user_id=ctx.user_id,
+            top_k=budget,
+            item_ids=item_ids,
+            embedding_version=ctx.encoder.embedding_version,
+            ef_search=self.config.ef_search,
+        )
+
+        threshold = self.config.threshold
+        if threshold is not None:
+            neighbors = [
+                neighbor
+                for neighbor in neighbors
+                if neighbor["similarity"] is not None and neighbor["similarity"] >= threshold
+            ]
+        for neighbor in neighbors:
+            neighbor["match_type"] = "embedding"
+        return neighbors
+
+
+# Compact-vector candidate generation is not a stage of its own: with a
+# projection configured, ``VectorStore.search`` runs it inside the embedding stage.
+STAGE_TYPES: dict[str, type[CascadeStage]] = {
+    stage.name: stage for stage in (DigestStage, PDQStage, EmbeddingStage)
+}
+
+# Mirrors the original hardcoded behaviour: exact digest, PDQ radius 8, then
+# SigLIP top-50.
+DEFAULT_STAGES: tuple[StageConfig, ...] = (
+    StageConfig(name="digest"),
+    StageConfig(name="pdq", threshold=8, budget=200),
+    StageConfig(name="embedding", budget=50),
+)
+
+
+def build_stages(configs: Sequence[StageConfig]) -> list[CascadeStage]:
+    stages: list[CascadeStage] = []
+    for config in configs:
+        stage_type = STAGE_TYPES.get(config.name)
+        if stage_type is None:
+            raise ValueError(f"Unknown dedupe stage: {config.name}")
+        stages.append(stage_type(config))
+    return stages
+
+
+class DedupeCascade:
+    """Run stages in order, narrowing candidates and exiting early on matches.
+
+    A stage with matches and ``early_exit`` ends the run. Matches from a stage
+    without ``early_exit`` become the candidate set of the next stage; a stage
+    without matches leaves the candidate set untouched.
+    """
+
+    def __init__(self, stages: Sequence[StageConfig] = DEFAULT_STAGES) -> None:
+        self.stages = build_stages(stages)
+
+    def run(self, ctx: CascadeContext) -> CascadeResult:
+        result = CascadeResult(matches=[])
+        candidates: list[dict[str, Any]] | None = None
+
+        for stage in self.stages:
+            candidates_in = len(candidates) if candidates is not None else None
+            started = time.perf_counter()
+            matches = stage.run(ctx, candidates)
+            report = StageReport(
+                name=stage.name,
+                candidates_in=candidates_in,
+                candidates_out=len(matches),
+                pruned=None if candidates_in is None else max(candidates_in - len(matches), 0),
+                elapsed_ms=(time.perf_counter() - started) * 1000,
+            )
+            result.stages.append(report)
+
+            if not matches:
+                continue
+            result.matches = matches
+            if stage.config.early_exit:
+                report.exited = True
+                break
+            candidates = matches
+
+        return result
@@ -0,0 +1,174 @@
+"""Library-wide duplicate grouping: neighbour queries merged with union-find."""
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from backend.services.dedupe.pdq_index import PDQIndex
+
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from backend.services.vector.pgvector_store import VectorStore
+
+
+class UnionFind:
+    """Disjoint sets over media item ids, created lazily on first link.
+
+    Only items that take part in a link get an entry, so memory follows the
+    number of duplicates rather than the size of the library.
+    """
+
+    def __init__(self) -> None:
+        self._parent: dict[int, int] = {}
+        self._size: dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self._parent.setdefault(item, item)
+        while parent != item:
+            # Path halving: point every visited node at its grandparent.
+            grandparent = self._parent[parent]
+            self._parent[item] = grandparent
+            item, parent = parent, grandparent
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of ``a`` and ``b``; False if they were already one."""
+
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        size_a, size_b = self._size.get(root_a, 1), self._size.get(root_b, 1)
+        if size_a < size_b:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] = size_a + size_b
+        self._size.pop(root_b, None)
+        return True
+
+    def groups(self) -> list[list[int]]:
+        """Every set with at least two members, largest first."""
+
+        members: dict[int, list[int]] = defaultdict(list)
+        for item in self._parent:
+            members[self.find(item)].append(item)
+        return sorted(
+            (sorted(group) for group in members.values() if len(group) > 1),
+            key=lambda group: (-len(group), group[0]),
+        )
+
+
+@dataclass
+class ClusteringReport:
+    user_id: int
+    # Items with a PDQ hash / an embedding of the clustering version.
+    hashed: int = 0
+    embedded: int = 0
+    # Links that merged two previously separate groups.
+    pdq_links: int = 0
+    embedding_links: int = 0
+    groups: int = 0
+    grouped_items: int = 0
+    seconds: float = 0.0
+
+
+class DuplicateClusterer:
+    """Group a user's whole library into near-duplicate sets and persist them.
+
+    Two items are linked when their PDQ hashes lie within ``pdq_threshold``
+    bits, or when one is among the other's ``neighbours`` nearest embeddings
+    with cosine similarity of at least ``embedding_threshold``. Linked items
+    are merged with union-find, so groups are the connected components.
+
+    Every neighbour query is index-backed: PDQ radius queries go through a
+    multi-index hash table (:class:`PDQIndex`) built from this run's hashes,
+    and embeddings are read ``chunk_size`` at a time and sent to
+    :meth:`VectorStore.search_many` (HNSW on PostgreSQL, the cached matrix
+    elsewhere). The cost is thus about ``n log n`` rather than ``n²``. The
+    PDQ hashes (32 bytes per item) are held whole, as are the union-find
+    entries of linked items. On PostgreSQL only the current chunk of
+    embeddings is in memory; elsewhere ``search_many`` loads the user's whole
+    cached embedding matrix.
+
+    ``embedding_threshold=None`` skips the embedding pass. Only embeddings of
+    ``embedding_version`` are compared, when given.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        *,
+        pdq_threshold: int | None = 8,
+        embedding_threshold: float | None = 0.95,
+        neighbours: int = 10,
+        chunk_size: int = 256,
+        embedding_version: str | None = None,
+        ef_search: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if neighbours < 1:
+            raise ValueError("neighbours must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.vector_store = vector_store
+        self.pdq_threshold = pdq_threshold
+        self.embedding_threshold = embedding_threshold
+        self.neighbours = neighbours
+        self.chunk_size = chunk_size
+        self.embedding_version = embedding_version
+        self.ef_search = ef_search
+        self._clock = clock
+
+    def run(self, user_id: int) -> ClusteringReport:
+        """Recompute and store the user's duplicate groups."""
+
+        report = ClusteringReport(user_id=user_id)
+        started = self._clock()
+        links = UnionFind()
+        if self.pdq_threshold is not None:
+            self._link_pdq(user_id, links, report)
+        if self.embedding_threshold is not None:
+            self._link_embeddings(user_id, links, report)
+
+        groups = links.groups()
+        report.groups = self.vector_store.replace_duplicate_groups(user_id, groups)
+        report.grouped_items = sum(len(group) for group in groups)
+        report.seconds = self._clock() - started
+        return report
+
+    def _link_pdq(self, user_id: int, links: UnionFind, report: ClusteringReport) -> None:
+        assert self.pdq_threshold is not None
+        hashes = self.vector_store.fetch_pdq_hashes(user_id)
+        report.hashed = len(hashes)
+        # Built from the hashes just read rather than the shared registry,
+        # whose cached index may predate writes made by other processes.
+        index = PDQIndex.build(hashes)
+        for item_id, pdq_hash in hashes:
+            for other_id, _ in index.query(pdq_hash, self.pdq_threshold):
+                if other_id != item_id and links.union(item_id, other_id):
+                    report.pdq_links += 1
+
+    def _link_embeddings(self, user_id: int, links: UnionFind, report: ClusteringReport) -> None:
+        assert self.embedding_threshold is not None
+        chunks = self.vector_store.iter_embeddings(
+            user_id, self.embedding_version, chunk_size=self.chunk_size
+        )
+        for ids, vectors in chunks:
+            report.embedded += len(ids)
+            # One extra neighbour: each item normally finds itself first.
+            hits = self.vector_store.search_many(
+                vectors,
+                user_id=user_id,
+                top_k=self.neighbours + 1,
+                embedding_version=self.embedding_version,
+                ef_search=self.ef_search,
+            )
+            for item_id, neighbours in zip(ids, hits, strict=True):
+                for hit in neighbours:
+                    similarity = hit["similarity"]
+                    if similarity is None or similarity < self.embedding_threshold:
+                        continue
+                    if hit["id"] != item_id and links.union(item_id, hit["id"]):
+                        report.embedding_links += 1
@@ -0,0 +1,59 @@
+"""Vectorised Hamming distance helpers over packed ``uint64`` hash words."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+
+import numpy as np
+
+HEX_CHARS_PER_WORD = 16
+
+
+def hash_words(hash_hex: str) -> int:
+    """Return how many 64-bit words are needed to hold ``hash_hex``."""
+
+    return max(1, -(-len(hash_hex) // HEX_CHARS_PER_WORD))
+
+
+def pack_hashes(hashes: Sequence[str], words: int | None = None) -> np.ndarray:
+    """Pack hexadecimal hashes into an ``(N, words)`` ``uint64`` matrix.
+
+    PDQ-256 hashes occupy four words and pHash-64 hashes a single word. Shorter
+    hashes are left-padded with zeros so every row has the same width.
+    """
+
+    if words is None:
+        words = max((hash_words(value) for value in hashes), default=1)
+
+    width = words * HEX_CHARS_PER_WORD
+    if not hashes:
+        return np.zeros((0, words), dtype=np.uint64)
+
+    payload = bytes.fromhex("".join(value.rjust(width, "0") for value in hashes))
+    packed = np.frombuffer(payload, dtype=">u8").reshape(len(hashes), words)
+    return packed.astype(np.uint64)
+
+
+def pack_hash(hash_hex: str, words: int | None = None) -> np.ndarray:
+    """Pack a single hexadecimal hash into a ``(words,)`` ``uint64`` vector."""
+
+    return pack_hashes([hash_hex], words=words)[0]
+
+
+def hamming_distances(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Return the Hamming distance between ``query`` and every row of ``matrix``."""
+
+    if matrix.shape[0] == 0:
+        return np.zeros(0, dtype=np.uint16)
+    return np.bitwise_count(np.bitwise_xor(matrix, query)).sum(axis=1, dtype=np.uint16)
+
+
+def hamming_within(
+    query: np.ndarray,
+    matrix: np.ndarray,
+    max_distance: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(distances, mask)`` where ``mask`` marks rows within ``max_distance``."""
+
+    distances = hamming_distances(query, matrix)
+    return distances, distances <= max_distance
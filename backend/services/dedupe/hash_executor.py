@@ -0,0 +1,147 @@
+"""Process-pool execution of CPU-bound perceptual hashing."""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any
+
+from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.imaging import DecodedImage
+
+logger = logging.getLogger(__name__)
+
+HashResult = tuple[str, int | None, str]
+DihedralResult = tuple[list[str], int | None, str]
+
+_worker_filters: dict[str, PDQFilter] = {}
+
+
+def _worker_filter(method: str) -> PDQFilter:
+    if method not in _worker_filters:
+        _worker_filters[method] = PDQFilter(method=method)
+    return _worker_filters[method]
+
+
+def _hash_span(
+    segment_name: str,
+    spans: list[tuple[int, int]],
+    method: str,
+    dihedral: bool,
+) -> list[Any]:
+    """Hash the payloads at ``spans`` of a shared-memory block (runs in a worker)."""
+
+    # Workers share the parent's resource tracker, which unlinks the block
+    # once the parent is done with it.
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        buffer = segment.buf
+        assert buffer is not None
+        pdq = _worker_filter(method)
+        results: list[Any] = []
+        for offset, length in spans:
+            image = DecodedImage(bytes(buffer[offset : offset + length]))
+            if dihedral:
+                results.append(pdq.compute_dihedral_hashes(image))
+            else:
+                results.append(pdq.compute_hash(image))
+        return results
+    finally:
+        segment.close()
+
+
+class HashingExecutor:
+    """Compute PDQ/pHash hashes on a process pool so hashing scales with cores.
+
+    Batches are copied once into a shared-memory block and workers read their
+    slice from it, so image bytes are not pickled per task. Workers receive
+    encoded bytes and decode them again, so the pool only pays off for batches:
+    it is opt-in (``max_workers=None`` uses every core), and a single
+    already-decoded image is always hashed inline. With ``max_workers=0`` (the
+    default), or inside a daemonic process such as a Celery prefork child,
+    every hash runs inline and reuses already-decoded images. The single-image
+    methods mirror :class:`PDQFilter`, so this class can be used in its place.
+    """
+
+    def __init__(self, max_workers: int | None = 0, method: str = "auto") -> None:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        if max_workers and multiprocessing.current_process().daemon:
+            logger.info("Daemonic process cannot spawn hashing workers; hashing inline.")
+            max_workers = 0
+
+        self.max_workers = max_workers
+        self.method = method
+        self._inline = PDQFilter(method=method)
+        self._pool: Executor | None = None
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            # ``forkserver`` avoids forking a threaded API/worker process.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return self._pool
+
+    def _run(self, images: Sequence[bytes | DecodedImage], dihedral: bool) -> list[Any]:
+        if not images:
+            return []
+        if not self.max_workers or (len(images) == 1 and isinstance(images[0], DecodedImage)):
+            compute = (
+                self._inline.compute_dihedral_hashes if dihedral else self._inline.compute_hash
+            )
+            return [compute(image) for image in images]
+
+        payloads = [image.payload if isinstance(image, DecodedImage) else image for image in images]
+        spans: list[tuple[int, int]] = []
+        offset = 0
+        for payload in payloads:
+            spans.append((offset, len(payload)))
+            offset += len(payload)
+
+        segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        try:
+            buffer = segment.buf
+            assert buffer is not None
+            for (start, length), payload in zip(spans, payloads, strict=True):
+                buffer[start : start + length] = payload
+
+            chunk = math.ceil(len(spans) / self.max_workers)
+            futures = [
+                self._executor().submit(
+                    _hash_span, segment.name, spans[i : i + chunk], self.method, dihedral
+                )
+                for i in range(0, len(spans), chunk)
+            ]
+            return [result for future in futures for result in future.result()]
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def compute_hashes(self, images: Sequence[bytes | DecodedImage]) -> list[HashResult]:
+        """Return ``(hash_hex, quality_or_none, backend_used)`` for every image."""
+
+        return self._run(images, dihedral=False)
+
+    def compute_dihedral_hashes_batch(
+        self,
+        images: Sequence[bytes | DecodedImage],
+    ) -> list[DihedralResult]:
+        return self._run(images, dihedral=True)
+
+    def compute_hash(self, image: bytes | DecodedImage) -> HashResult:
+        return self.compute_hashes([image])[0]
+
+    def compute_dihedral_hashes(self, image: bytes | DecodedImage) -> DihedralResult:
+        return self.compute_dihedral_hashes_batch([image])[0]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
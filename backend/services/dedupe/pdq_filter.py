@@ -4,9 +4,14 @@ from __future__ import annotations
 
 import io
 import logging
+from collections.abc import Callable
+from typing import Any
 
+import numpy as np
 from PIL import Image
 
+from backend.services.imaging import DecodedImage
+
 try:  # pragma: no cover - optional dependency
     import pdqhash  # type: ignore
 
@@ -16,12 +21,41 @@ except Exception:  # pragma: no cover - optional dependency
     HAS_PDQ = False
 
 import imagehash
+import scipy.fftpack
 
 _warned_pdq_missing = False
+# ``None`` until a probe call tells us whether the binding takes pixel arrays.
+_pdq_accepts_pixels: bool | None = None
+_PROBE_SIDE = 64
 
 logger = logging.getLogger(__name__)
 
 
+# Orientations covered by ``compute_dihedral_hashes``, in the order returned.
+DIHEDRAL_TRANSFORMS: tuple[Image.Transpose | None, ...] = (
+    None,
+    Image.Transpose.ROTATE_90,
+    Image.Transpose.ROTATE_180,
+    Image.Transpose.ROTATE_270,
+    Image.Transpose.FLIP_LEFT_RIGHT,
+    Image.Transpose.FLIP_TOP_BOTTOM,
+    Image.Transpose.TRANSPOSE,
+    Image.Transpose.TRANSVERSE,
+)
+PHASH_SIZE = 8
+
+
+def _hash_to_hex(value: Any) -> str:
+    """Normalise binding output (hex string, raw bytes or a bit vector) to hex."""
+
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bytes | bytearray):
+        return bytes(value).hex()
+    bits = np.asarray(value).astype(bool).ravel()
+    return np.packbits(bits).tobytes().hex()
+
+
 class PDQFilter:
     """Compute perceptual hashes with an optional PDQ backend."""
 
@@ -34,46 +68,93 @@ class PDQFilter:
         if not HAS_PDQ or pdqhash is None:  # pragma: no cover - guarded by caller
             raise RuntimeError("PDQ library not available")
 
-        # Try a few common Python bindings. Saving to bytes keeps APIs uniform.
-        buffer = io.BytesIO()
-        pil_img.save(buffer, format="JPEG")
-        payload = buffer.getvalue()
-
         # facebookresearch/pdqhash python bindings expose ``compute``
         if hasattr(pdqhash, "compute"):
-            result = pdqhash.compute(payload)  # type: ignore[call-arg]
+            result = self._call_binding(pdqhash.compute, pil_img)  # type: ignore[attr-defined]
             if isinstance(result, tuple) and len(result) >= 2:
                 hexhash, quality = result[0], result[1]
             else:  # pragma: no cover - depends on binding implementation
-                hexhash, quality = str(result), 100
-            return str(hexhash), int(quality)
+                hexhash, quality = result, 100
+            return _hash_to_hex(hexhash), int(quality)
 
         # Some forks expose ``pdqhash`` returning (quality, hash)
         if hasattr(pdqhash, "pdqhash"):
-            quality, hexhash = pdqhash.pdqhash(payload)  # type: ignore[attr-defined]
-            return str(hexhash), int(quality)
+            binding = pdqhash.pdqhash  # type: ignore[attr-defined]
+            quality, hexhash = self._call_binding(binding, pil_img)
+            return _hash_to_hex(hexhash), int(quality)
 
         raise RuntimeError("Unsupported PDQ binding")
 
+    @staticmethod
+    def _call_binding(func: Callable[[Any], Any], pil_img: Image.Image) -> Any:
+        """Hand decoded RGB pixels to ``func``, re-encoding only if it needs bytes."""
+
+        global _pdq_accepts_pixels
+        if _pdq_accepts_pixels is None:
+            # Probe with a blank image, so errors caused by real image data
+            # never switch the whole process to the slower bytes path.
+            try:
+                func(np.zeros((_PROBE_SIDE, _PROBE_SIDE, 3), dtype=np.uint8))
+            except (TypeError, ValueError):
+                _pdq_accepts_pixels = False
+            else:
+                _pdq_accepts_pixels = True
+        if _pdq_accepts_pixels:
+            return func(np.ascontiguousarray(np.asarray(pil_img, dtype=np.uint8)))
+
+        # Legacy bindings decode an encoded image themselves.
+        buffer = io.BytesIO()
+        pil_img.save(buffer, format="JPEG")
+        return func(buffer.getvalue())
+
     def _phash(self, pil_img: Image.Image) -> str:
         return str(imagehash.phash(pil_img))
 
-    def compute_hash(self, image_bytes: bytes) -> tuple[str, int | None, str]:
-        """Return ``(hash_hex, quality_or_none, backend_used)``."""
+    def _pdq_dihedral(self, pil_img: Image.Image) -> tuple[list[str], int]:
+        """Return the eight dihedral PDQ hashes and the quality of the original."""
 
-        with Image.open(io.BytesIO(image_bytes)) as pil_image:
-            img: Image.Image = pil_image.convert("RGB")
+        if hasattr(pdqhash, "compute_dihedral"):
+            # The reference implementation derives all eight from one DCT and
+            # returns them with the single quality of the original.
+            binding = pdqhash.compute_dihedral  # type: ignore[union-attr]
+            hashes, quality = self._call_binding(binding, pil_img)
+            return [_hash_to_hex(value) for value in hashes], int(quality)
 
-        wants_pdq = self.method == "pdq" or (self.method == "auto" and HAS_PDQ)
-        if wants_pdq:
-            try:
-                hash_hex, quality = self._pdq_hash(img)
-                return hash_hex, quality, "pdq"
-            except Exception as exc:  # pragma: no cover - depends on optional dep
-                logger.warning(
-                    "PDQ hashing failed (%s); falling back to pHash for duplicate filtering.",
-                    exc,
-                )
+        results = [
+            self._pdq_hash(pil_img if transform is None else pil_img.transpose(transform))
+            for transform in DIHEDRAL_TRANSFORMS
+        ]
+        return [hash_hex for hash_hex, _ in results], results[0][1]
+
+    @staticmethod
+    def _phash_dihedral(gray_img: Image.Image) -> list[str]:
+        """Return the eight dihedral pHashes from a single 2-D DCT.
+
+        Mirroring an axis only flips the sign of odd DCT frequencies along it and
+        transposing the image transposes the coefficients, so every orientation
+        is a cheap rearrangement of the same low-frequency block.
+        """
+
+        pixels = np.asarray(gray_img, dtype=np.float64)
+        dct = scipy.fftpack.dct(scipy.fftpack.dct(pixels, axis=0), axis=1)
+        low = dct[:PHASH_SIZE, :PHASH_SIZE]
+        signs = np.where(np.arange(PHASH_SIZE) % 2, -1.0, 1.0)
+        rows, cols = signs[:, None], signs[None, :]
+
+        blocks = (
+            low,  # original
+            low.T * rows,  # ROTATE_90
+            low * rows * cols,  # ROTATE_180
+            low.T * cols,  # ROTATE_270
+            low * cols,  # FLIP_LEFT_RIGHT
+            low * rows,  # FLIP_TOP_BOTTOM
+            low.T,  # TRANSPOSE
+            low.T * rows * cols,  # TRANSVERSE
+        )
+        return [_hash_to_hex(block > np.median(block)) for block in blocks]
+
+    def _resolve_backend(self) -> bool:
+        """Return whether PDQ should be attempted, warning once when it is missing."""
 
         global _warned_pdq_missing
         if (self.method in {"auto", "pdq"}) and not HAS_PDQ and not _warned_pdq_missing:
@@ -88,9 +169,52 @@ class PDQFilter:
                 "PDQ hashing requested but pdqhash bindings are unavailable; using pHash fallback.",
             )
 
-        hash_hex = self._phash(img)
+        return self.method == "pdq" or (self.method == "auto" and HAS_PDQ)
+
+    def compute_hash(self, image: bytes | DecodedImage) -> tuple[str, int | None, str]:
+        """Return ``(hash_hex, quality_or_none, backend_used)``."""
+
+        decoded = image if isinstance(image, DecodedImage) else DecodedImage(image)
+
+        if self._resolve_backend() and HAS_PDQ:
+            try:
+                hash_hex, quality = self._pdq_hash(decoded.pdq_input())
+                return hash_hex, quality, "pdq"
+            except Exception as exc:  # pragma: no cover - depends on optional dep
+                logger.warning(
+                    "PDQ hashing failed (%s); falling back to pHash for duplicate filtering.",
+                    exc,
+                )
+
+        hash_hex = self._phash(decoded.phash_input())
         return hash_hex, None, "phash"
 
+    def compute_dihedral_hashes(
+        self,
+        image: bytes | DecodedImage,
+    ) -> tuple[list[str], int | None, str]:
+        """Return ``(hashes, quality_or_none, backend_used)`` for all 8 orientations.
+
+        ``hashes[0]`` is the hash of the image as given (identical to
+        :meth:`compute_hash`); the rest cover rotations by 90/180/270 degrees,
+        both mirrors and both diagonal transposes, in ``DIHEDRAL_TRANSFORMS``
+        order.
+        """
+
+        decoded = image if isinstance(image, DecodedImage) else DecodedImage(image)
+
+        if self._resolve_backend() and HAS_PDQ:
+            try:
+                hashes, quality = self._pdq_dihedral(decoded.pdq_input())
+                return hashes, quality, "pdq"
+            except Exception as exc:  # pragma: no cover - depends on optional dep
+                logger.warning(
+                    "PDQ hashing failed (%s); falling back to pHash for duplicate filtering.",
+                    exc,
+                )
+
+        return self._phash_dihedral(decoded.phash_input()), None, "phash"
+
     @staticmethod
     def hamming_distance(h1: str, h2: str) -> int:
         """Return the Hamming distance between two hexadecimal hashes."""
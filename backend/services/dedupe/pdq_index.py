@@ -0,0 +1,279 @@
+"""In-process multi-index hashing for PDQ radius queries."""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from functools import lru_cache
+
+import numpy as np
+
+from backend.services.caching import ByteBudgetLRU
+from backend.services.dedupe.hamming import hamming_within, hash_words, pack_hash, pack_hashes
+
+# Every hash is split into this many equal-width substrings. By the pigeonhole
+# principle two hashes within distance ``r`` agree on at least one substring up
+# to ``r // SEGMENTS`` bits, so a radius-8 PDQ query only needs exact lookups.
+SEGMENTS = 16
+
+DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+_MIN_REBUILD_ROWS = 4096
+# Discarded rows are dropped once they pass this count and a quarter of the table.
+_MIN_COMPACT_ROWS = 1024
+
+
+@lru_cache(maxsize=32)
+def _flip_masks(segment_bits: int, radius: int) -> np.ndarray:
+    values = np.arange(1 << segment_bits, dtype=np.uint64)
+    return values[np.bitwise_count(values) <= radius]
+
+
+def _segment_values(matrix: np.ndarray, segment_bits: int) -> np.ndarray:
+    """Split packed ``(N, words)`` hashes into ``(N, SEGMENTS)`` substrings."""
+
+    per_word = 64 // segment_bits
+    shifts = np.arange(per_word, dtype=np.uint64) * np.uint64(segment_bits)
+    mask = np.uint64((1 << segment_bits) - 1)
+    segments = (matrix[:, :, None] >> shifts) & mask
+    return segments.reshape(matrix.shape[0], -1)
+
+
+def pdq_segment_keys(hash_hex: str, max_distance: int = 0) -> list[int]:
+    """Return the substring lookup keys a radius query over ``hash_hex`` must probe.
+
+    Each key packs ``(words, segment, value)`` into one integer so hashes of
+    different widths never collide; stored rows use ``max_distance=0``.
+    """
+
+    words = hash_words(hash_hex)
+    segment_bits = words * 64 // SEGMENTS
+    if not segment_bits or 64 % segment_bits:
+        return []
+
+    flips = _flip_masks(segment_bits, max_distance // SEGMENTS)
+    segments = _segment_values(pack_hash(hash_hex, words=words)[None, :], segment_bits)[0]
+    return [
+        (words << 20) | (segment << 16) | int(value ^ flip)
+        for segment, value in enumerate(segments)
+        for flip in flips
+    ]
+
+
+class _HashTable:
+    """Packed hashes of a single bit width plus their substring lookup tables."""
+
+    def __init__(self, words: int) -> None:
+        self.words = words
+        segment_bits = words * 64 // SEGMENTS
+        self.segment_bits = segment_bits if segment_bits and 64 % segment_bits == 0 else 0
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, words), dtype=np.uint64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.dead = 0
+        self._indexed = 0
+        self._sorted = np.zeros((SEGMENTS, 0), dtype=np.uint64)
+        self._order = np.zeros((SEGMENTS, 0), dtype=np.int64)
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.ids.nbytes
+            + self.matrix.nbytes
+            + self.alive.nbytes
+            + self._sorted.nbytes
+            + self._order.nbytes
+        )
+
+    def extend(self, ids: np.ndarray, matrix: np.ndarray) -> None:
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 64)
+            self.ids = np.resize(self.ids, capacity)
+            self.matrix = np.resize(self.matrix, (capacity, self.words))
+            self.alive = np.resize(self.alive, capacity)
+        self.ids[self.size : needed] = ids
+        self.matrix[self.size : needed] = matrix
+        self.alive[self.size : needed] = True
+        self.size = needed
+
+        unindexed = self.size - self._indexed
+        if unindexed > max(_MIN_REBUILD_ROWS, self._indexed // 4):
+            self._rebuild()
+
+    def discard(self, item_id: int) -> None:
+        rows = np.flatnonzero(self.ids[: self.size] == item_id)
+        self.dead += int(self.alive[rows].sum())
+        self.alive[rows] = False
+        if self.dead > max(_MIN_COMPACT_ROWS, self.size // 4):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop discarded rows and rebuild the lookup tables over the rest."""
+
+        keep = np.flatnonzero(self.alive[: self.size])
+        self.ids = self.ids[keep]
+        self.matrix = self.matrix[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.size = len(keep)
+        self.dead = 0
+        self._indexed = 0
+        self._sorted = np.zeros((SEGMENTS, 0), dtype=np.uint64)
+        self._order = np.zeros((SEGMENTS, 0), dtype=np.int64)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        if not self.segment_bits:
+            return
+        segments = _segment_values(self.matrix[: self.size], self.segment_bits).T
+        self._order = np.argsort(segments, axis=1, kind="stable")
+        self._sorted = np.take_along_axis(segments, self._order, axis=1)
+        self._indexed = self.size
+
+    def _probe(self, query: np.ndarray, max_distance: int) -> np.ndarray:
+        """Return indexed rows sharing a near-identical substring with ``query``."""
+
+        flips = _flip_masks(self.segment_bits, max_distance // SEGMENTS)
+        query_segments = _segment_values(query[None, :], self.segment_bits)[0]
+        found: list[np.ndarray] = []
+        for segment in range(SEGMENTS):
+            keys = np.sort(query_segments[segment] ^ flips)
+            column = self._sorted[segment]
+            starts = np.searchsorted(column, keys, side="left")
+            stops = np.searchsorted(column, keys, side="right")
+            for start, stop in zip(starts, stops, strict=True):
+                if stop > start:
+                    found.append(self._order[segment, start:stop])
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, query: np.ndarray, max_distance: int) -> tuple[np.ndarray, np.ndarray]:
+        probes = 0
+        if self.segment_bits:
+            probes = len(_flip_masks(self.segment_bits, max_distance // SEGMENTS)) * SEGMENTS
+
+        if self.segment_bits and self._indexed and probes < self._indexed:
+            rows = np.concatenate(
+                [
+                    self._probe(query, max_distance),
+                    np.arange(self._indexed, self.size, dtype=np.int64),
+                ]
+            )
+        else:
+            rows = np.arange(self.size, dtype=np.int64)
+
+        rows = rows[self.alive[rows]]
+        distances, mask = hamming_within(query, self.matrix[rows], max_distance)
+        return self.ids[rows[mask]], distances[mask]
+
+
+class PDQIndex:
+    """Radius-searchable set of ``(media_item_id, hash)`` pairs for one user.
+
+    Hashes are grouped by bit width so PDQ-256 and pHash-64 values never get
+    compared with each other.
+    """
+
+    def __init__(self) -> None:
+        self._tables: dict[int, _HashTable] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, entries: Iterable[tuple[int, str]]) -> PDQIndex:
+        grouped: dict[int, tuple[list[int], list[str]]] = defaultdict(lambda: ([], []))
+        for item_id, hash_hex in entries:
+            ids, hashes = grouped[hash_words(hash_hex)]
+            ids.append(item_id)
+            hashes.append(hash_hex)
+
+        index = cls()
+        for words, (ids, hashes) in grouped.items():
+            table = _HashTable(words)
+            table.extend(np.asarray(ids, dtype=np.int64), pack_hashes(hashes, words=words))
+            table._rebuild()
+            index._tables[words] = table
+        return index
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(int(table.alive[: table.size].sum()) for table in self._tables.values())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.nbytes for table in self._tables.values())
+
+    def upsert(self, item_id: int, hash_hex: str) -> None:
+        words = hash_words(hash_hex)
+        with self._lock:
+            self.remove(item_id)
+            table = self._tables.get(words)
+            if table is None:
+                table = self._tables[words] = _HashTable(words)
+            table.extend(
+                np.asarray([item_id], dtype=np.int64),
+                pack_hash(hash_hex, words=words)[None, :],
+            )
+
+    def remove(self, item_id: int) -> None:
+        with self._lock:
+            for table in self._tables.values():
+                table.discard(item_id)
+
+    def query(self, hash_hex: str, max_distance: int) -> list[tuple[int, int]]:
+        """Return ``(media_item_id, distance)`` pairs sorted by distance."""
+
+        words = hash_words(hash_hex)
+        with self._lock:
+            table = self._tables.get(words)
+            if table is None or table.size == 0:
+                return []
+            ids, distances = table.query(pack_hash(hash_hex, words=words), max_distance)
+
+        order = np.argsort(distances, kind="stable")
+        return [(int(ids[i]), int(distances[i])) for i in order]
+
+
+class PDQIndexRegistry:
+    """Lazily built per-user :class:`PDQIndex` instances evicted by LRU.
+
+    Loads and writes are serialised per user, so a cold load only delays
+    other requests for the same user.
+    """
+
+    def __init__(self, memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES) -> None:
+        self._indexes = ByteBudgetLRU(memory_budget_bytes, sizeof=lambda index: index.nbytes)
+        self._lock = threading.Lock()
+        self._user_locks: dict[int, threading.Lock] = {}
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def get(self, user_id: int, loader: Callable[[], Iterable[tuple[int, str]]]) -> PDQIndex:
+        """Return the index for ``user_id``, building it from ``loader`` on a miss."""
+
+        with self._user_lock(user_id):
+            index: PDQIndex | None = self._indexes.get(user_id)
+            if index is None:
+                index = PDQIndex.build(loader())
+                self._indexes.put(user_id, index)
+            return index
+
+    def upsert(self, user_id: int, item_id: int, hash_hex: str) -> None:
+        """Apply a write to an already-loaded index; unloaded users rebuild lazily."""
+
+        with self._user_lock(user_id):
+            index = self._indexes.peek(user_id)
+            if index is None:
+                return
+            index.upsert(item_id, hash_hex)
+            self._indexes.refresh(user_id)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._user_lock(user_id):
+            self._indexes.pop(user_id)
+
+    def stats(self) -> dict[str, int]:
+        return self._indexes.stats()
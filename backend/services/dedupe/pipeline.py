@@ -2,48 +2,62 @@
 
 from __future__ import annotations
 
-from typing import Any
-
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any
+
+from backend.services.dedupe.cascade import (
+    DEFAULT_STAGES,
+    CascadeContext,
+    CascadeResult,
+    DedupeCascade,
+    StageConfig,
+)
+from backend.services.dedupe.hash_executor import HashingExecutor
 from backend.services.dedupe.pdq_filter import PDQFilter
-from backend.services.embeddings.siglip2_encoder import SigLIP2Encoder
-from backend.services.vector.pgvector_store import VectorStore
+from backend.services.embeddings.base import ImageEncoder
+from backend.services.imaging import DecodedImage
 
-PDQ_MAX_HAMMING = 8
-TOPK = 50
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from backend.services.vector.pgvector_store import VectorStore
 
 
 class DedupePipeline:
-    """Run PDQ filtering before vector similarity search."""
-
-    def __init__(self, vector_store: VectorStore, encoder: SigLIP2Encoder):
-        self.pdq = PDQFilter(method="auto")
+    """Run the configured dedupe cascade (digest, PDQ, embeddings by default)."""
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        encoder: ImageEncoder,
+        *,
+        dihedral: bool = False,
+        stages: Sequence[StageConfig] = DEFAULT_STAGES,
+        hasher: PDQFilter | HashingExecutor | None = None,
+    ):
+        self.pdq = hasher if hasher is not None else PDQFilter(method="auto")
         self.vs = vector_store
         self.encoder = encoder
-
-    def find_candidates(self, image_bytes: bytes, user_id: int) -> list[dict[str, Any]]:
-        target_hash, _, method = self.pdq.compute_hash(image_bytes)
-
-        query_matches = self.vs.fetch_pdq_candidates(user_id=user_id, limit=200)
-
-        pdq_hits: list[dict[str, Any]] = []
-        for record in query_matches:
-            stored_hash = record.get("pdq_hash")
-            if not stored_hash:
-                continue
-
-            distance = PDQFilter.hamming_distance(target_hash, stored_hash)
-            if distance <= PDQ_MAX_HAMMING:
-                enriched = dict(record)
-                enriched["pdq_distance"] = distance
-                enriched["pdq_method"] = method
-                pdq_hits.append(enriched)
-
-        if pdq_hits:
-            return sorted(
-                pdq_hits,
-                key=lambda item: item.get("pdq_distance", 0),
-            )
-
-        embedding = self.encoder.embed_bytes(image_bytes)
-        neighbors = self.vs.search(embedding=embedding, user_id=user_id, top_k=TOPK)
-        return neighbors
+        # Query with all eight rotations/mirrors so re-oriented copies are
+        # caught by the hash stage instead of falling through to the encoder.
+        self.dihedral = dihedral
+        self.cascade = DedupeCascade(stages)
+
+    def run(self, image: bytes | DecodedImage, user_id: int) -> CascadeResult:
+        """Return matches together with a per-stage pruning report."""
+
+        decoded = image if isinstance(image, DecodedImage) else DecodedImage(image)
+        ctx = CascadeContext(
+            image=decoded,
+            user_id=user_id,
+            vector_store=self.vs,
+            encoder=self.encoder,
+            pdq=self.pdq,
+            dihedral=self.dihedral,
+        )
+        return self.cascade.run(ctx)
+
+    def find_candidates(
+        self,
+        image: bytes | DecodedImage,
+        user_id: int,
+    ) -> list[dict[str, Any]]:
+        return self.run(image, user_id=user_id).matches
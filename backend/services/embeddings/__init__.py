@@ -1,5 +1,19 @@
 """Embedding service exports."""
 
+from backend.services.embeddings.base import ImageEncoder
+from backend.services.embeddings.batcher import EmbeddingBatcher
+from backend.services.embeddings.cache import EmbeddingCache
+from backend.services.embeddings.onnx_encoder import ONNXImageEncoder
 from backend.services.embeddings.siglip2_encoder import SigLIP2Encoder
+from backend.services.embeddings.torch_profile import TorchInferenceProfile
+from backend.services.embeddings.warmup import EncoderWarmup
 
-__all__ = ["SigLIP2Encoder"]
+__all__ = [
+    "EmbeddingBatcher",
+    "EmbeddingCache",
+    "EncoderWarmup",
+    "ImageEncoder",
+    "ONNXImageEncoder",
+    "SigLIP2Encoder",
+    "TorchInferenceProfile",
+]
@@ -0,0 +1,94 @@
+"""Interface shared by the image encoder backends."""
+
+from __future__ import annotations
+
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Protocol
+
+import numpy as np
+import numpy.typing as npt
+from PIL import Image
+
+from backend.services.imaging import DecodedImage
+from backend.services.imaging.decoded_image import DECODE_VERSION
+
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from backend.services.embeddings.cache import EmbeddingCache
+
+# Embeddings stay contiguous float32 arrays from the model output through the
+# cache and the vector store: ``(dim,)`` per image, ``(n, dim)`` per batch.
+Embedding = npt.NDArray[np.float32]
+
+
+class ImageEncoder(Protocol):
+    """What the dedupe pipeline and routes need from an image encoder."""
+
+    @property
+    def input_size(self) -> int: ...
+
+    @property
+    def output_dim(self) -> int: ...
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> Embedding: ...
+
+    def embed_pil(self, img: Image.Image) -> Embedding: ...
+
+    def embed_image(self, image: DecodedImage) -> Embedding: ...
+
+    def embed_bytes(self, image_bytes: bytes) -> Embedding: ...
+
+    @property
+    def cache_namespace(self) -> str: ...
+
+    @property
+    def embedding_version(self) -> str: ...
+
+
+class EncoderBase:
+    """Shared ``embed_*`` plumbing on top of a backend's ``embed_batch``.
+
+    ``embed_image`` (and therefore ``embed_bytes``) consults ``cache`` by the
+    upload's content digest before running inference.
+    """
+
+    input_size: int
+    model_id: str
+    # Checkpoint whose vector space the outputs live in. Precision, runtime
+    # and preprocessing changes that keep vectors comparable share it, so
+    # they only change ``cache_namespace``, not ``embedding_version``.
+    weights_id: str
+    # Bump in a backend whenever its pixel preprocessing changes.
+    preprocess_version = "1"
+    cache: EmbeddingCache | None = None
+    # Overrides the stored ``embedding_version``, e.g. to keep one label across
+    # backends whose outputs were checked to agree.
+    version_label: str | None = None
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"{self.model_id}|d{DECODE_VERSION}|p{self.preprocess_version}|{self.input_size}"
+
+    @property
+    def embedding_version(self) -> str:
+        """Stored with every vector; only vectors of the same version are compared."""
+
+        return self.version_label or self.weights_id
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> Embedding:
+        raise NotImplementedError
+
+    def embed_pil(self, img: Image.Image) -> Embedding:
+        return self.embed_batch([img])[0]
+
+    def embed_image(self, image: DecodedImage) -> Embedding:
+        """Embed a shared :class:`DecodedImage` using its cached encoder-sized view."""
+
+        def compute() -> Embedding:
+            return self.embed_pil(image.encoder_input(self.input_size))
+
+        if self.cache is None:
+            return compute()
+        return self.cache.get_or_compute(image.digest, self.cache_namespace, compute)
+
+    def embed_bytes(self, image_bytes: bytes) -> Embedding:
+        return self.embed_image(DecodedImage(image_bytes))
@@ -0,0 +1,189 @@
+"""Dynamic micro-batching in front of an image encoder."""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Sequence
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+from backend.services.embeddings.base import Embedding, EncoderBase, ImageEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 5.0
+_LATENCY_WINDOW = 2048
+
+
+@dataclass
+class _Pending:
+    image: Image.Image
+    submitted: float = field(default_factory=time.perf_counter)
+    future: Future[Embedding] = field(default_factory=Future)
+
+
+class EmbeddingBatcher(EncoderBase):
+    """Coalesce concurrent embedding requests into batched forward passes.
+
+    Callers block on :meth:`embed_pil` / :meth:`embed_image` as with the
+    wrapped encoder. A single worker thread waits at most ``max_wait_ms``
+    after the first queued image for up to ``max_batch_size`` images, runs one
+    ``embed_batch`` call and resolves each caller's future with its row.
+    """
+
+    def __init__(
+        self,
+        encoder: ImageEncoder,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.encoder = encoder
+        self.input_size = encoder.input_size
+        # Cache lookups happen here, before queueing, with the wrapped model's key.
+        self.cache = getattr(encoder, "cache", None)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(max_wait_ms, 0.0) / 1000
+        self._queue: queue.Queue[_Pending | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._batch_sizes: Counter[int] = Counter()
+        self._latencies_ms: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self._forward_ms: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    @property
+    def output_dim(self) -> int:
+        return self.encoder.output_dim
+
+    @property
+    def cache_namespace(self) -> str:
+        return self.encoder.cache_namespace
+
+    @property
+    def embedding_version(self) -> str:
+        return self.encoder.embedding_version
+
+    def submit(self, img: Image.Image) -> Future[Embedding]:
+        pending = _Pending(image=img)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._loop, name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+            self._queue.put(pending)
+        return pending.future
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> Embedding:
+        futures = [self.submit(img) for img in images]
+        if not futures:
+            return np.empty((0, self.encoder.output_dim), dtype=np.float32)
+        return np.stack([future.result() for future in futures])
+
+    def embed_pil(self, img: Image.Image) -> Embedding:
+        return self.submit(img).result()
+
+    def close(self) -> None:
+        """Stop the worker thread once already queued requests are served."""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            latencies = np.asarray(self._latencies_ms, dtype=np.float64)
+            forward = np.asarray(self._forward_ms, dtype=np.float64)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            requests, batches, errors = self._requests, self._batches, self._errors
+
+        def percentile(values: np.ndarray, q: float) -> float | None:
+            return float(np.percentile(values, q)) if values.size else None
+
+        return {
+            "requests": requests,
+            "batches": batches,
+            "errors": errors,
+            "mean_batch_size": requests / batches if batches else None,
+            "batch_sizes": batch_sizes,
+            "latency_ms_p50": percentile(latencies, 50),
+            "latency_ms_p95": percentile(latencies, 95),
+            "latency_ms_p99": percentile(latencies, 99),
+            "forward_ms_p50": percentile(forward, 50),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+    def _collect(self, first: _Pending) -> tuple[list[_Pending], bool]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            try:
+                self._run(batch)
+            except Exception as exc:
+                # Never let one batch kill the worker: later callers would hang.
+                self._fail(batch, exc)
+
+    def _fail(self, batch: list[_Pending], exc: BaseException) -> None:
+        logger.error("Batched embedding of %d images failed", len(batch), exc_info=exc)
+        failed = [pending for pending in batch if not pending.future.done()]
+        with self._lock:
+            self._errors += len(failed)
+        for pending in failed:
+            pending.future.set_exception(exc)
+
+    def _run(self, batch: list[_Pending]) -> None:
+        started = time.perf_counter()
+        try:
+            vectors = self.encoder.embed_batch([pending.image for pending in batch])
+            if len(vectors) != len(batch):
+                raise ValueError(
+                    f"Encoder returned {len(vectors)} embeddings for {len(batch)} images"
+                )
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+
+        finished = time.perf_counter()
+        for pending, vector in zip(batch, vectors, strict=True):
+            if not pending.future.done():
+                pending.future.set_result(vector)
+        with self._lock:
+            self._requests += len(batch)
+            self._batches += 1
+            self._batch_sizes[len(batch)] += 1
+            self._forward_ms.append((finished - started) * 1000)
+            self._latencies_ms.extend((finished - pending.submitted) * 1000 for pending in batch)
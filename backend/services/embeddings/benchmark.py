@@ -0,0 +1,173 @@
+"""Measure each :class:`TorchInferenceProfile` option on the current machine.
+
+Run ``python -m backend.services.embeddings.benchmark`` (or ``make
+bench-encoder``) on a fleet host and copy the fastest profile's settings into
+its environment.
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import statistics
+import sys
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from PIL import Image
+
+from backend.services.embeddings.onnx_encoder import _sample_images, check_parity
+from backend.services.embeddings.siglip2_encoder import (
+    SigLIP2Encoder,
+    _load_torch,
+    _load_transformers,
+)
+from backend.services.embeddings.torch_profile import TorchInferenceProfile, cpu_supports_bf16
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    profile: TorchInferenceProfile
+    median_ms: float
+    images_per_second: float
+    speedup: float
+    # Agreement with the baseline's embeddings on the same images.
+    min_cosine: float
+
+
+def default_profiles(
+    torch: Any, *, threads: int | None = None, compile: bool = True
+) -> list[TorchInferenceProfile]:
+    """Baseline, each option on its own, then the options combined (without channels_last)."""
+
+    profiles = [TorchInferenceProfile(), TorchInferenceProfile(inference_mode=True)]
+    if threads:
+        profiles.append(TorchInferenceProfile(intra_op_threads=threads))
+    profiles.append(TorchInferenceProfile(channels_last=True))
+    bf16 = cpu_supports_bf16(torch)
+    if bf16:
+        profiles.append(TorchInferenceProfile(bf16_autocast=True))
+    if compile:
+        profiles.append(TorchInferenceProfile(compile=True))
+    profiles.append(
+        TorchInferenceProfile(
+            inference_mode=True, intra_op_threads=threads, bf16_autocast=bf16, compile=compile
+        )
+    )
+    return profiles
+
+
+def benchmark_profiles(
+    processor: Any,
+    model: Any,
+    profiles: Sequence[TorchInferenceProfile],
+    images: Sequence[Image.Image],
+    *,
+    batch_size: int = 16,
+    repeats: int = 5,
+) -> list[BenchmarkResult]:
+    """Time ``embed_batch`` for each profile; the first profile is the baseline.
+
+    Every profile gets its own copy of ``model`` so memory-format changes and
+    compilation do not leak into the next run, and the intra-op thread count
+    is restored in between. Compilation happens in the encoder constructor
+    and is not timed.
+    """
+
+    torch = _load_torch()
+    assert torch is not None
+    default_threads = torch.get_num_threads()
+    batch = [images[i % len(images)] for i in range(batch_size)]
+
+    results: list[BenchmarkResult] = []
+    reference: SigLIP2Encoder | None = None
+    for profile in profiles:
+        torch.set_num_threads(default_threads)
+        encoder = SigLIP2Encoder(
+            processor=processor, model=copy.deepcopy(model), device="cpu", profile=profile
+        )
+        encoder.embed_batch(batch)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            encoder.embed_batch(batch)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        median_ms = statistics.median(timings)
+        if reference is None:
+            reference = encoder
+        parity = check_parity(reference, encoder, images)
+        results.append(
+            BenchmarkResult(
+                profile=profile,
+                median_ms=median_ms,
+                images_per_second=batch_size * 1000 / median_ms,
+                speedup=results[0].median_ms / median_ms if results else 1.0,
+                min_cosine=parity.min_cosine,
+            )
+        )
+    torch.set_num_threads(default_threads)
+    return results
+
+
+def profile_env(profile: TorchInferenceProfile) -> str:
+    """The settings that select ``profile`` in the API process."""
+
+    env = {
+        "EMBEDDING_TORCH_INFERENCE_MODE": str(profile.inference_mode).lower(),
+        "EMBEDDING_TORCH_BF16": str(profile.bf16_autocast).lower(),
+        "EMBEDDING_TORCH_CHANNELS_LAST": str(profile.channels_last).lower(),
+        "EMBEDDING_TORCH_COMPILE": str(profile.compile).lower(),
+    }
+    if profile.intra_op_threads:
+        env["EMBEDDING_TORCH_THREADS"] = str(profile.intra_op_threads)
+    return " ".join(f"{key}={value}" for key, value in env.items())
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Benchmark the torch inference options of the SigLIP encoder."""
+
+    from backend.services.embeddings.siglip2_encoder import _DEFAULT_MODEL_NAME
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--model-name", default=_DEFAULT_MODEL_NAME)
+    parser.add_argument("--images", help="directory of sample images")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--threads", type=int, help="also try this intra-op thread count")
+    parser.add_argument("--no-compile", action="store_true", help="skip torch.compile")
+    args = parser.parse_args(argv)
+
+    torch = _load_torch()
+    auto_model, auto_processor = _load_transformers()
+    if torch is None or auto_model is None or auto_processor is None:
+        print("torch and transformers are required for the benchmark", file=sys.stderr)
+        return 1
+
+    processor = auto_processor.from_pretrained(args.model_name)
+    model = auto_model.from_pretrained(args.model_name)
+    profiles = default_profiles(torch, threads=args.threads, compile=not args.no_compile)
+    results = benchmark_profiles(
+        processor,
+        model,
+        profiles,
+        _sample_images(args.images),
+        batch_size=args.batch_size,
+        repeats=args.repeats,
+    )
+
+    print(f"{'profile':<48} {'ms/batch':>9} {'img/s':>8} {'speedup':>8} {'cosine':>7}")
+    for result in results:
+        print(
+            f"{result.profile.describe():<48} {result.median_ms:>9.1f} "
+            f"{result.images_per_second:>8.1f} {result.speedup:>7.2f}x {result.min_cosine:>7.4f}"
+        )
+    best = max(results, key=lambda result: result.speedup)
+    print(f"\nfastest: {profile_env(best.profile)}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark entry point
+    sys.exit(main())
@@ -0,0 +1,254 @@
+"""Content-addressed embedding cache with memory and memory-mapped disk tiers."""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from backend.services.caching import ByteBudgetLRU
+
+if TYPE_CHECKING:  # pragma: no cover - typing import
+    from backend.services.embeddings.base import Embedding
+
+DEFAULT_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+KEY_BYTES = 32
+# Per-entry bookkeeping on top of the vector itself (key row plus clock).
+_SLOT_OVERHEAD_BYTES = KEY_BYTES + 8
+_ENTRY_OVERHEAD_BYTES = 160
+# Slots per bucket of the set-associative disk tier.
+_WAYS = 8
+
+
+def cache_key(content_digest: str, namespace: str) -> bytes:
+    """Fixed-width key for ``content_digest`` under an encoder's cache namespace."""
+
+    return hashlib.blake2b(f"{namespace}|{content_digest}".encode(), digest_size=KEY_BYTES).digest()
+
+
+class _MmapShard:
+    """Fixed-capacity slots of ``dim``-wide float32 vectors backed by memory-mapped files.
+
+    Slots hold a key row, the vector and a last-used clock. The cache is
+    set-associative: a key can only live in the ``ways`` slots of the bucket
+    its hash selects, so lookups scan that bucket in the shared files rather
+    than an in-process index. This way an entry written by another process is
+    visible at once. A put reuses the key's slot or overwrites the bucket's
+    least recently used one.
+
+    Several processes can share a directory: reads hold a shared ``flock`` and
+    writes an exclusive one, on a lock file kept open for the shard's lifetime.
+    Last-used clocks are bumped under the shared lock; they only steer eviction.
+    """
+
+    def __init__(self, directory: Path, dim: int, capacity: int) -> None:
+        self.dim = dim
+        self.ways = min(_WAYS, capacity)
+        self.buckets = capacity // self.ways
+        self.capacity = self.buckets * self.ways
+        lock_path = directory / f"embeddings-{dim}.lock"
+        lock_path.touch(exist_ok=True)
+        self._lock_file = open(lock_path, "rb")  # noqa: SIM115 - held for the shard's lifetime
+        with self._locked(fcntl.LOCK_EX):
+            self.vectors = self._open(
+                directory / f"vectors-{dim}.f32", np.float32, (self.capacity, dim)
+            )
+            self.keys = self._open(
+                directory / f"keys-{dim}.bin", np.uint8, (self.capacity, KEY_BYTES)
+            )
+            self.clock = self._open(directory / f"clock-{dim}.u64", np.uint64, (self.capacity,))
+
+    @staticmethod
+    def _open(path: Path, dtype: Any, shape: tuple[int, ...]) -> np.memmap:
+        expected = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if path.exists() and path.stat().st_size != expected:
+            # Capacity changed since the file was written; start over.
+            path.unlink()
+        if path.exists():
+            return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+        return np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+
+    @contextmanager
+    def _locked(self, operation: int) -> Iterator[None]:
+        fcntl.flock(self._lock_file, operation)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.clock))
+
+    @property
+    def nbytes(self) -> int:
+        return self.capacity * (self.dim * 4 + _SLOT_OVERHEAD_BYTES)
+
+    def _bucket(self, key: bytes) -> tuple[int, int]:
+        start = int.from_bytes(key[:8], "little") % self.buckets * self.ways
+        return start, start + self.ways
+
+    def _find(self, key: bytes, start: int, stop: int) -> int | None:
+        wanted = np.frombuffer(key, dtype=np.uint8)
+        found = (self.keys[start:stop] == wanted).all(axis=1) & (self.clock[start:stop] != 0)
+        hits = np.flatnonzero(found)
+        return start + int(hits[0]) if len(hits) else None
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        start, stop = self._bucket(key)
+        with self._locked(fcntl.LOCK_SH):
+            slot = self._find(key, start, stop)
+            if slot is None:
+                return None
+            vector = np.array(self.vectors[slot])
+            self.clock[slot] = time.time_ns()
+        return vector
+
+    def put(self, key: bytes, vector: np.ndarray) -> bool:
+        """Store ``vector``; return ``True`` if another entry had to be evicted."""
+
+        start, stop = self._bucket(key)
+        with self._locked(fcntl.LOCK_EX):
+            slot = self._find(key, start, stop)
+            evicted = False
+            if slot is None:
+                slot = start + int(np.argmin(self.clock[start:stop]))
+                evicted = bool(self.clock[slot])
+            self.vectors[slot] = vector
+            self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+            self.clock[slot] = time.time_ns()
+        return evicted
+
+    def flush(self) -> None:
+        for array in (self.vectors, self.keys, self.clock):
+            array.flush()
+
+
+class EmbeddingCache:
+    """Embeddings keyed by ``(content digest, model, preprocessing version)``.
+
+    Lookups go to an in-process LRU first and then, when ``directory`` is
+    set, to memory-mapped files bounded by ``disk_budget_bytes`` per
+    embedding width. Disk hits are promoted to the memory tier.
+
+    Cached arrays are read-only and shared between callers.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+        directory: str | Path | None = None,
+        disk_budget_bytes: int = 0,
+    ) -> None:
+        self._memory = ByteBudgetLRU(
+            memory_budget_bytes, sizeof=lambda vector: vector.nbytes + _ENTRY_OVERHEAD_BYTES
+        )
+        self.directory = Path(directory) if directory else None
+        self.disk_budget_bytes = disk_budget_bytes
+        self._shards: dict[int, _MmapShard] = {}
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+
+        if self.directory is not None and disk_budget_bytes > 0:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._attach_shards()
+        else:
+            self.directory = None
+
+    def _attach_shards(self) -> list[_MmapShard]:
+        """Open shards that earlier or concurrent processes created; returns the new ones."""
+
+        assert self.directory is not None
+        attached: list[_MmapShard] = []
+        for path in self.directory.glob("clock-*.u64"):
+            dim = int(path.name[len("clock-") : -len(".u64")])
+            if dim not in self._shards:
+                shard = self._shard(dim)
+                if shard is not None:
+                    attached.append(shard)
+        return attached
+
+    def _shard(self, dim: int) -> _MmapShard | None:
+        if self.directory is None or self.disk_budget_bytes <= 0:
+            return None
+        shard = self._shards.get(dim)
+        if shard is None:
+            capacity = max(1, self.disk_budget_bytes // (dim * 4 + _SLOT_OVERHEAD_BYTES))
+            shard = self._shards[dim] = _MmapShard(self.directory, dim, capacity)
+        return shard
+
+    def _disk_get(self, key: bytes) -> np.ndarray | None:
+        if self.directory is None:
+            return None
+        for shard in self._shards.values():
+            vector = shard.get(key)
+            if vector is not None:
+                return vector
+        # Another process may have started a shard for a new width since.
+        for shard in self._attach_shards():
+            vector = shard.get(key)
+            if vector is not None:
+                return vector
+        return None
+
+    def get(self, content_digest: str, namespace: str) -> Embedding | None:
+        key = cache_key(content_digest, namespace)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is None and self.directory is not None:
+                vector = self._disk_get(key)
+                if vector is None:
+                    self.disk_misses += 1
+                else:
+                    self.disk_hits += 1
+                    vector.setflags(write=False)
+                    self._memory.put(key, vector)
+        return vector
+
+    def put(self, content_digest: str, namespace: str, embedding: Embedding) -> None:
+        key = cache_key(content_digest, namespace)
+        vector = np.array(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        with self._lock:
+            self._memory.put(key, vector)
+            shard = self._shard(len(vector))
+            if shard is not None and shard.put(key, vector):
+                self.disk_evictions += 1
+
+    def get_or_compute(
+        self,
+        content_digest: str,
+        namespace: str,
+        compute: Callable[[], Embedding],
+    ) -> Embedding:
+        embedding = self.get(content_digest, namespace)
+        if embedding is None:
+            embedding = compute()
+            self.put(content_digest, namespace, embedding)
+        return embedding
+
+    def flush(self) -> None:
+        with self._lock:
+            for shard in self._shards.values():
+                shard.flush()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            disk = {
+                "enabled": self.directory is not None and self.disk_budget_bytes > 0,
+                "entries": sum(len(shard) for shard in self._shards.values()),
+                "bytes": sum(shard.nbytes for shard in self._shards.values()),
+                "budget_bytes": self.disk_budget_bytes,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "evictions": self.disk_evictions,
+            }
+            return {"memory": self._memory.stats(), "disk": disk}
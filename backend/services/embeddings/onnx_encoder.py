@@ -0,0 +1,308 @@
+"""ONNX Runtime image encoder with optional dynamic int8 quantization."""
+
+from __future__ import annotations
+
+import argparse
+import inspect
+import logging
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, cast
+
+import numpy as np
+from PIL import Image
+
+from backend.services.embeddings.base import Embedding, EncoderBase, ImageEncoder
+from backend.services.embeddings.cache import EmbeddingCache
+from backend.services.embeddings.preprocess import BatchPreprocessor, PreprocessConfig
+
+logger = logging.getLogger(__name__)
+
+# SigLIP checkpoints rescale to [0, 1] and normalise with mean = std = 0.5.
+SIGLIP_IMAGE_MEAN = (0.5, 0.5, 0.5)
+SIGLIP_IMAGE_STD = (0.5, 0.5, 0.5)
+DEFAULT_INPUT_SIZE = 224
+PARITY_MIN_COSINE = 0.99
+_INPUT_NAME = "pixel_values"
+_OUTPUT_NAME = "image_embeds"
+# Model metadata key naming the checkpoint an exported graph came from.
+_WEIGHTS_METADATA_KEY = "weights_id"
+
+
+@lru_cache(maxsize=1)
+def _load_onnxruntime() -> Any | None:
+    """Best-effort import of onnxruntime, deferred until a model is loaded."""
+
+    try:  # pragma: no cover - optional dependency
+        import onnxruntime  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover - optional dependency
+        return None
+    return cast(Any, onnxruntime)
+
+
+def quantized_path(model_path: str | Path) -> Path:
+    path = Path(model_path)
+    return path.with_name(f"{path.stem}.int8{path.suffix}")
+
+
+def quantize_onnx(model_path: str | Path, output_path: str | Path | None = None) -> Path:
+    """Write a dynamically int8-quantized copy of ``model_path`` and return its path."""
+
+    if _load_onnxruntime() is None:
+        raise RuntimeError("onnxruntime is required to quantize models. Install onnxruntime.")
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+    target = Path(output_path) if output_path is not None else quantized_path(model_path)
+    quantize_dynamic(str(model_path), str(target), weight_type=QuantType.QInt8)
+    weights_id = _read_weights_id(model_path)
+    if weights_id is not None:
+        _write_weights_id(target, weights_id)
+    return target
+
+
+def _read_weights_id(model_path: str | Path) -> str | None:
+    import onnx
+
+    model = onnx.load(str(model_path), load_external_data=False)
+    for prop in model.metadata_props:
+        if prop.key == _WEIGHTS_METADATA_KEY:
+            return str(prop.value)
+    return None
+
+
+def _write_weights_id(model_path: str | Path, weights_id: str) -> None:
+    import onnx
+
+    model = onnx.load(str(model_path))
+    onnx.helper.set_model_props(model, {_WEIGHTS_METADATA_KEY: weights_id})
+    onnx.save(model, str(model_path))
+
+
+def export_onnx(
+    model: Any,
+    output_path: str | Path,
+    *,
+    input_size: int = DEFAULT_INPUT_SIZE,
+    opset: int = 17,
+    weights_id: str | None = None,
+) -> Path:
+    """Export the image tower of a ``transformers`` SigLIP model to ONNX.
+
+    The graph takes ``pixel_values`` of shape ``(batch, 3, side, side)`` and
+    returns unnormalised ``image_embeds``; the batch axis is dynamic.
+    ``weights_id`` names the source checkpoint in the model metadata, so the
+    ONNX encoder stores the same ``embedding_version`` as the torch one.
+    """
+
+    import torch
+
+    class _ImageTower(torch.nn.Module):
+        def __init__(self, wrapped: Any) -> None:
+            super().__init__()
+            self.wrapped = wrapped
+
+        def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+            return cast(torch.Tensor, self.wrapped.get_image_features(pixel_values=pixel_values))
+
+    target = Path(output_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    kwargs: dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+
+    tower = _ImageTower(model).eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            tower,
+            (torch.zeros((1, 3, input_size, input_size), dtype=torch.float32),),
+            str(target),
+            input_names=[_INPUT_NAME],
+            output_names=[_OUTPUT_NAME],
+            dynamic_axes={_INPUT_NAME: {0: "batch"}, _OUTPUT_NAME: {0: "batch"}},
+            opset_version=opset,
+            **kwargs,
+        )
+    if weights_id is not None:
+        _write_weights_id(target, weights_id)
+    return target
+
+
+def _session_weights_id(session: Any) -> str | None:
+    try:
+        metadata = session.get_modelmeta().custom_metadata_map
+    except AttributeError:
+        return None
+    value = metadata.get(_WEIGHTS_METADATA_KEY)
+    return str(value) if value else None
+
+
+class ONNXImageEncoder(EncoderBase):
+    """Run an exported SigLIP image tower on ONNX Runtime (CPU by default).
+
+    Drop-in for :class:`SigLIP2Encoder`: the same ``embed_*`` methods return
+    L2-normalised vectors, but preprocessing is plain NumPy and neither
+    ``torch`` nor ``transformers`` is needed at inference time.
+
+    ``weights_id`` defaults to the checkpoint recorded by :func:`export_onnx`,
+    falling back to the file name for graphs exported without one.
+    """
+
+    def __init__(
+        self,
+        model_path: str | Path | None = None,
+        *,
+        session: Any | None = None,
+        intra_op_threads: int | None = None,
+        image_mean: Sequence[float] = SIGLIP_IMAGE_MEAN,
+        image_std: Sequence[float] = SIGLIP_IMAGE_STD,
+        providers: Sequence[str] = ("CPUExecutionProvider",),
+        cache: EmbeddingCache | None = None,
+        weights_id: str | None = None,
+    ) -> None:
+        if session is None:
+            ort = _load_onnxruntime()
+            if ort is None:
+                raise RuntimeError("onnxruntime is required for the ONNX encoder backend.")
+            if model_path is None:
+                raise ValueError("model_path is required when no session is injected")
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if intra_op_threads:
+                options.intra_op_num_threads = intra_op_threads
+            session = ort.InferenceSession(str(model_path), options, providers=list(providers))
+
+        self.session = session
+        self.model_path = str(model_path) if model_path is not None else None
+        self.model_id = f"onnx:{Path(model_path).name if model_path is not None else 'session'}"
+        self.weights_id = weights_id or _session_weights_id(session) or self.model_id
+        self.cache = cache
+        model_input = session.get_inputs()[0]
+        self._input_name = model_input.name
+        side = model_input.shape[-1] if model_input.shape else None
+        self.input_size = side if isinstance(side, int) else DEFAULT_INPUT_SIZE
+        dim = session.get_outputs()[0].shape[-1]
+        self.output_dim = dim if isinstance(dim, int) else 0
+        self._preprocessor = BatchPreprocessor(
+            PreprocessConfig(
+                size=self.input_size,
+                image_mean=(image_mean[0], image_mean[1], image_mean[2]),
+                image_std=(image_std[0], image_std[1], image_std[2]),
+            )
+        )
+
+    @classmethod
+    def from_path(
+        cls,
+        model_path: str | Path,
+        *,
+        quantize: bool = False,
+        intra_op_threads: int | None = None,
+        cache: EmbeddingCache | None = None,
+        weights_id: str | None = None,
+    ) -> ONNXImageEncoder:
+        """Load ``model_path``, or its int8 sibling (created on first use) if ``quantize``."""
+
+        path = Path(model_path)
+        if quantize:
+            target = quantized_path(path)
+            if not target.exists():
+                logger.info("Quantizing %s to %s", path, target)
+                quantize_onnx(path, target)
+            path = target
+        return cls(path, intra_op_threads=intra_op_threads, cache=cache, weights_id=weights_id)
+
+    def preprocess(self, images: Sequence[Image.Image]) -> np.ndarray:
+        return self._preprocessor(images)
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> Embedding:
+        if not images:
+            return np.empty((0, self.output_dim), dtype=np.float32)
+        (vectors,) = self.session.run([_OUTPUT_NAME], {self._input_name: self.preprocess(images)})
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        if not self.output_dim:
+            self.output_dim = vectors.shape[1]
+        return vectors
+
+
+@dataclass
+class ParityReport:
+    cosines: list[float]
+    min_cosine: float
+    mean_cosine: float
+    threshold: float
+
+    @property
+    def passed(self) -> bool:
+        return self.min_cosine >= self.threshold
+
+
+def check_parity(
+    reference: ImageEncoder,
+    candidate: ImageEncoder,
+    images: Sequence[Image.Image],
+    *,
+    min_cosine: float = PARITY_MIN_COSINE,
+) -> ParityReport:
+    """Compare two encoders image by image; both return normalised vectors."""
+
+    if not images:
+        raise ValueError("Parity check needs at least one image")
+    expected = np.asarray(reference.embed_batch(images), dtype=np.float32)
+    actual = np.asarray(candidate.embed_batch(images), dtype=np.float32)
+    cosines = np.sum(expected * actual, axis=1).tolist()
+    return ParityReport(
+        cosines=cosines,
+        min_cosine=float(min(cosines)),
+        mean_cosine=float(np.mean(cosines)),
+        threshold=min_cosine,
+    )
+
+
+def _sample_images(directory: str | None, limit: int = 32) -> list[Image.Image]:
+    if directory:
+        paths = sorted(p for p in Path(directory).iterdir() if p.is_file())[:limit]
+        return [Image.open(path).convert("RGB") for path in paths]
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8)) for _ in range(8)]
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Export a SigLIP checkpoint to ONNX and verify it against the torch encoder."""
+
+    from backend.services.embeddings.siglip2_encoder import (
+        _DEFAULT_MODEL_NAME,
+        SigLIP2Encoder,
+    )
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("output", help="path of the .onnx file to write")
+    parser.add_argument("--model-name", default=_DEFAULT_MODEL_NAME)
+    parser.add_argument("--quantize", action="store_true", help="also write an int8 model")
+    parser.add_argument("--images", help="directory of sample images for the parity check")
+    parser.add_argument("--min-cosine", type=float, default=PARITY_MIN_COSINE)
+    args = parser.parse_args(argv)
+
+    reference = SigLIP2Encoder(model_name=args.model_name, device="cpu")
+    output = export_onnx(
+        reference.model,
+        args.output,
+        input_size=reference.input_size,
+        weights_id=reference.weights_id,
+    )
+    images = [img.resize((reference.input_size,) * 2) for img in _sample_images(args.images)]
+
+    ok = True
+    for path in [output, *([quantize_onnx(output)] if args.quantize else [])]:
+        report = check_parity(reference, ONNXImageEncoder(path), images, min_cosine=args.min_cosine)
+        print(f"{path}: min cosine {report.min_cosine:.4f}, mean {report.mean_cosine:.4f}")
+        ok = ok and report.passed
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":  # pragma: no cover - manual export entry point
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Batched pixel preprocessing that replaces the per-image HF processor call."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_RESCALE_FACTOR = 1 / 255
+
+
+def processor_side(size: Any) -> int | None:
+    """Return the square side from a processor ``size`` (dict or ``SizeDict``)."""
+
+    if isinstance(size, dict):
+        side = size.get("height") or size.get("shortest_edge")
+    else:
+        side = getattr(size, "height", None) or getattr(size, "shortest_edge", None)
+    return side if isinstance(side, int) else None
+
+
+@dataclass(frozen=True)
+class PreprocessConfig:
+    """Resize/rescale/normalise parameters of a square-input image processor."""
+
+    size: int
+    image_mean: tuple[float, float, float]
+    image_std: tuple[float, float, float]
+    rescale_factor: float = DEFAULT_RESCALE_FACTOR
+    resample: Image.Resampling = Image.Resampling.BICUBIC
+
+    @classmethod
+    def from_processor(cls, processor: Any) -> PreprocessConfig | None:
+        """Read the settings of a ``transformers`` image processor.
+
+        Returns ``None`` when the processor does not look like a plain
+        resize + rescale + normalise pipeline, so callers keep using it.
+        """
+
+        image_processor = getattr(processor, "image_processor", processor)
+        side = processor_side(getattr(image_processor, "size", None))
+        mean = getattr(image_processor, "image_mean", None)
+        std = getattr(image_processor, "image_std", None)
+        if side is None or mean is None or std is None:
+            return None
+        if getattr(image_processor, "do_center_crop", False):
+            return None
+
+        if not getattr(image_processor, "do_normalize", True):
+            mean, std = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+        rescale = getattr(image_processor, "rescale_factor", DEFAULT_RESCALE_FACTOR)
+        if not getattr(image_processor, "do_rescale", True):
+            rescale = 1.0
+        resample = getattr(image_processor, "resample", Image.Resampling.BICUBIC)
+        return cls(
+            size=side,
+            image_mean=(float(mean[0]), float(mean[1]), float(mean[2])),
+            image_std=(float(std[0]), float(std[1]), float(std[2])),
+            rescale_factor=float(rescale),
+            resample=Image.Resampling(int(resample)),
+        )
+
+
+class BatchPreprocessor:
+    """Turn RGB images into a normalised ``(N, 3, side, side)`` float32 batch.
+
+    Images are copied into a uint8 staging buffer and rescaled/normalised in
+    one fused multiply-add over the whole batch. Staging and output buffers
+    are kept per thread and only grow, so steady-state calls do not allocate;
+    the returned array is a view that stays valid until the same thread's
+    next call.
+    """
+
+    def __init__(self, config: PreprocessConfig) -> None:
+        self.config = config
+        std = np.asarray(config.image_std, dtype=np.float64)
+        mean = np.asarray(config.image_mean, dtype=np.float64)
+        # ((x * rescale) - mean) / std == x * (rescale / std) - mean / std
+        self._scale = (config.rescale_factor / std).astype(np.float32).reshape(1, 3, 1, 1)
+        self._offset = (-mean / std).astype(np.float32).reshape(1, 3, 1, 1)
+        self._local = threading.local()
+
+    def _buffers(self, count: int) -> tuple[np.ndarray, np.ndarray]:
+        staging: np.ndarray | None = getattr(self._local, "staging", None)
+        if staging is None or len(staging) < count:
+            side = self.config.size
+            capacity = max(count, 2 * len(staging) if staging is not None else count)
+            self._local.staging = np.empty((capacity, side, side, 3), dtype=np.uint8)
+            self._local.output = np.empty((capacity, 3, side, side), dtype=np.float32)
+        return self._local.staging, self._local.output
+
+    def __call__(self, images: Sequence[Image.Image]) -> np.ndarray:
+        side = self.config.size
+        staging, output = self._buffers(len(images))
+        for row, img in enumerate(images):
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            if img.size != (side, side):
+                img = img.resize((side, side), self.config.resample)
+            staging[row] = np.asarray(img)
+
+        batch = output[: len(images)]
+        np.multiply(staging[: len(images)].transpose(0, 3, 1, 2), self._scale, out=batch)
+        batch += self._offset
+        return batch
@@ -0,0 +1,140 @@
+"""Incremental re-embedding of rows produced by another encoder version."""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from PIL import Image
+
+from backend.services.embeddings.base import ImageEncoder
+from backend.services.imaging import DecodedImage
+from backend.services.vector import EmbeddingRecord, VectorStore
+
+logger = logging.getLogger(__name__)
+
+# ``(user_id, rows) -> {media_item_id: image bytes}``; rows it cannot load are left out.
+ImageLoader = Callable[[int, list[dict[str, Any]]], dict[int, bytes]]
+
+
+@dataclass
+class ReembedReport:
+    embedding_version: str
+    users: int = 0
+    batches: int = 0
+    embedded: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+    # True once every stale row was visited (failed rows stay stale for the next run).
+    complete: bool = False
+
+
+class ReembedJob:
+    """Re-embed rows whose ``embedding_version`` differs from ``encoder``'s.
+
+    Users are visited in priority order: ``priority_user_ids`` first, then the
+    most recently active. Each user's rows are fetched ``batch_size`` at a time
+    in id order. Progress is the version column itself, so an interrupted or
+    ``max_items``-bounded run resumes where it stopped. Rows whose image
+    cannot be loaded or decoded are skipped and retried on the next run.
+    ``max_items_per_second`` caps the throughput so the job can share the
+    encoder and database with live traffic.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        encoder: ImageEncoder,
+        load_images: ImageLoader,
+        *,
+        batch_size: int = 64,
+        max_items_per_second: float | None = None,
+        priority_user_ids: Sequence[int] = (),
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.vector_store = vector_store
+        self.encoder = encoder
+        self.load_images = load_images
+        self.batch_size = batch_size
+        self.max_items_per_second = max_items_per_second
+        self.priority_user_ids = list(priority_user_ids)
+        self._clock = clock
+        self._sleep = sleep
+
+    def _ordered_users(self, version: str) -> list[int]:
+        stale = self.vector_store.stale_embedding_users(version)
+        pending = set(stale)
+        first = [user_id for user_id in dict.fromkeys(self.priority_user_ids) if user_id in pending]
+        return first + [user_id for user_id in stale if user_id not in set(first)]
+
+    def run(self, max_items: int | None = None) -> ReembedReport:
+        """Re-embed up to ``max_items`` stale rows (all of them when ``None``)."""
+
+        version = self.encoder.embedding_version
+        report = ReembedReport(embedding_version=version)
+        started = self._clock()
+        visited = 0
+
+        for user_id in self._ordered_users(version):
+            report.users += 1
+            after_id = 0
+            while True:
+                limit = self.batch_size
+                if max_items is not None:
+                    limit = min(limit, max_items - visited)
+                    if limit <= 0:
+                        report.seconds = self._clock() - started
+                        return report
+                rows = self.vector_store.fetch_stale_embeddings(
+                    user_id, version, after_id=after_id, limit=limit
+                )
+                if not rows:
+                    break
+                after_id = rows[-1]["id"]
+                self._embed_rows(user_id, rows, version, report)
+                visited += len(rows)
+                report.batches += 1
+                self._throttle(started, visited)
+
+        report.seconds = self._clock() - started
+        report.complete = True
+        return report
+
+    def _embed_rows(
+        self, user_id: int, rows: list[dict[str, Any]], version: str, report: ReembedReport
+    ) -> None:
+        payloads = self.load_images(user_id, rows)
+        ids: list[int] = []
+        images: list[Image.Image] = []
+        for row in rows:
+            payload = payloads.get(row["id"])
+            if payload is None:
+                continue
+            try:
+                images.append(DecodedImage(payload).encoder_input(self.encoder.input_size))
+            except (OSError, ValueError):
+                logger.warning("Could not decode media item %s for re-embedding", row["id"])
+                continue
+            ids.append(row["id"])
+
+        report.failed += len(rows) - len(ids)
+        if not images:
+            return
+        vectors = self.encoder.embed_batch(images)
+        report.embedded += self.vector_store.upsert_embeddings(
+            EmbeddingRecord(media_item_id, vector, embedding_version=version)
+            for media_item_id, vector in zip(ids, vectors, strict=True)
+        )
+
+    def _throttle(self, started: float, visited: int) -> None:
+        if not self.max_items_per_second:
+            return
+        wait = started + visited / self.max_items_per_second - self._clock()
+        if wait > 0:
+            self._sleep(wait)
@@ -2,11 +2,29 @@
 
 from __future__ import annotations
 
-import io
+import threading
+from collections.abc import Sequence
+from functools import lru_cache
 from typing import Any, cast
 
+import numpy as np
 from PIL import Image
 
+from backend.services.embeddings.base import Embedding, EncoderBase
+from backend.services.embeddings.cache import EmbeddingCache
+from backend.services.embeddings.preprocess import (
+    BatchPreprocessor,
+    PreprocessConfig,
+    processor_side,
+)
+from backend.services.embeddings.torch_profile import TorchInferenceProfile
+
+_DEFAULT_MODEL_NAME = "google/siglip-base-patch16-224"
+
+
+# ``torch`` and ``transformers`` take seconds to import, so they are only
+# imported once an encoder is actually constructed.
+@lru_cache(maxsize=1)
 def _load_transformers() -> tuple[Any | None, Any | None]:
     """Best-effort import of transformers AutoModel/AutoProcessor."""
 
@@ -17,19 +35,18 @@ def _load_transformers() -> tuple[Any | None, Any | None]:
     return cast(Any, AutoModel), cast(Any, AutoProcessor)
 
 
-TRANSFORMERS_AUTO_MODEL, TRANSFORMERS_AUTO_PROCESSOR = _load_transformers()
+@lru_cache(maxsize=1)
+def _load_torch() -> Any | None:
+    """Best-effort import of torch."""
 
-_DEFAULT_MODEL_NAME = "google/siglip-base-patch16-224"
-
-try:  # pragma: no cover - optional dependency
-    import torch as _torch  # type: ignore
-except ModuleNotFoundError:  # pragma: no cover - optional dependency
-    _torch = None  # type: ignore[assignment]
-
-torch = cast(Any, _torch)
+    try:  # pragma: no cover - optional dependency
+        import torch  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover - optional dependency
+        return None
+    return cast(Any, torch)
 
 
-class SigLIP2Encoder:
+class SigLIP2Encoder(EncoderBase):
     """Wrap a SigLIP (or SigLIP 2) vision encoder."""
 
     def __init__(
@@ -39,31 +56,42 @@ class SigLIP2Encoder:
         *,
         processor: Any | None = None,
         model: Any | None = None,
+        cache: EmbeddingCache | None = None,
+        fast_preprocess: bool = True,
+        profile: TorchInferenceProfile | None = None,
     ) -> None:
+        torch = _load_torch()
+        auto_model, auto_processor = (None, None)
+        if model is None or processor is None:
+            auto_model, auto_processor = _load_transformers()
+
         if torch is None and model is None:
             raise RuntimeError("PyTorch is required to load SigLIP models. Install torch>=2.3.0.")
-        if TRANSFORMERS_AUTO_MODEL is None and model is None:
+        if auto_model is None and model is None:
             raise RuntimeError(
                 "transformers is required to load SigLIP checkpoints. Install transformers>=4.44.0."
             )
-        if TRANSFORMERS_AUTO_PROCESSOR is None and processor is None:
+        if auto_processor is None and processor is None:
             raise RuntimeError(
                 "transformers is required to load SigLIP checkpoints. Install transformers>=4.44.0."
             )
 
         self.model_name = model_name
+        self.model_id = model_name
+        self.weights_id = model_name
+        self.cache = cache
         if torch is not None and device is None:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         self.device = device or "cpu"
         if processor is None:
-            assert TRANSFORMERS_AUTO_PROCESSOR is not None
-            resolved_processor = TRANSFORMERS_AUTO_PROCESSOR.from_pretrained(model_name)
+            assert auto_processor is not None
+            resolved_processor = auto_processor.from_pretrained(model_name)
         else:
             resolved_processor = processor
 
         if model is None:
-            assert TRANSFORMERS_AUTO_MODEL is not None
-            resolved_model = TRANSFORMERS_AUTO_MODEL.from_pretrained(model_name)
+            assert auto_model is not None
+            resolved_model = auto_model.from_pretrained(model_name)
         else:
             resolved_model = model
 
@@ -75,18 +103,76 @@ class SigLIP2Encoder:
         if hasattr(self.model, "eval"):
             self.model.eval()
 
+        self.profile = profile or TorchInferenceProfile()
+        if torch is not None:
+            self.profile.apply_threads(torch)
+            self.model = self.profile.prepare_model(torch, self.model)
+            if self.profile.use_bf16(torch, self.device):
+                # bf16 vectors differ slightly; keep them apart from fp32 ones in the cache.
+                self.model_id = f"{model_name}+bf16"
+
         config = getattr(self.model, "config", None)
-        self.output_dim = getattr(config, "projection_dim", None) or getattr(
-            config, "hidden_size", 768
+        self.output_dim = cast(
+            int, getattr(config, "projection_dim", None) or getattr(config, "hidden_size", 768)
         )
-
-    def embed_pil(self, img: Image.Image) -> list[float]:
+        self.input_size = self._resolve_input_size(self.processor)
+
+        # Replace the per-image processor call with one vectorised pass when the
+        # processor is a plain resize + rescale + normalise pipeline.
+        preprocess_config = PreprocessConfig.from_processor(self.processor)
+        self._preprocessor = (
+            BatchPreprocessor(preprocess_config)
+            if fast_preprocess and preprocess_config is not None
+            else None
+        )
+        self._pinned = threading.local()
+
+        if self.profile.compile:
+            # Compile now rather than on the first requests: the second batch size
+            # makes dynamo recompile with a dynamic batch dimension.
+            blank = Image.new("RGB", (self.input_size, self.input_size))
+            for count in (1, 2):
+                self.embed_batch([blank] * count)
+
+    @staticmethod
+    def _resolve_input_size(processor: Any) -> int:
+        """Return the square side the processor resizes images to (224 by default)."""
+
+        image_processor = getattr(processor, "image_processor", processor)
+        return processor_side(getattr(image_processor, "size", None)) or 224
+
+    def _pixel_values(self, images: Sequence[Image.Image]) -> Any:
+        """Preprocess ``images`` with :class:`BatchPreprocessor` into a device tensor."""
+
+        torch = _load_torch()
+        assert torch is not None and self._preprocessor is not None
+        batch = torch.from_numpy(self._preprocessor(images))
+        if self.device == "cpu":
+            return batch
+
+        # Stage through a reused pinned buffer so the host-to-device copy is async.
+        pinned = getattr(self._pinned, "buffer", None)
+        if pinned is None or pinned.shape[0] < batch.shape[0]:
+            pinned = self._pinned.buffer = torch.empty(batch.shape, pin_memory=True)
+        staged = pinned[: batch.shape[0]]
+        staged.copy_(batch)
+        return staged.to(self.device, non_blocking=True)
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> Embedding:
+        """Embed ``images`` in a single forward pass, one normalized vector each."""
+
+        torch = _load_torch()
         if torch is None:
             raise RuntimeError("PyTorch is required to compute embeddings.")
+        if not images:
+            return np.empty((0, self.output_dim), dtype=np.float32)
 
-        def _forward() -> list[float]:
-            batch = self.processor(images=img, return_tensors="pt")
-            batch = self._move_to_device(batch)
+        def _forward() -> Embedding:
+            if self._preprocessor is not None:
+                batch: Any = {"pixel_values": self._pixel_values(images)}
+            else:
+                batch = self.processor(images=list(images), return_tensors="pt")
+                batch = self._move_to_device(batch)
 
             if isinstance(batch, dict):
                 inputs: Any = batch
@@ -94,6 +180,8 @@ class SigLIP2Encoder:
                 inputs = dict(batch.data)
             else:
                 inputs = batch
+            if isinstance(inputs, dict) and "pixel_values" in inputs:
+                inputs["pixel_values"] = self.profile.prepare_inputs(torch, inputs["pixel_values"])
 
             outputs = self.model(**inputs) if isinstance(inputs, dict) else self.model(inputs)
 
@@ -107,21 +195,17 @@ class SigLIP2Encoder:
                     raise RuntimeError("Cannot extract image embeddings from SigLIP model output")
                 vector = last_hidden.mean(dim=1)
 
-            vector = torch.nn.functional.normalize(vector, p=2, dim=-1)
-            return vector[0].detach().cpu().tolist()
+            vector = torch.nn.functional.normalize(vector.float(), p=2, dim=-1)
+            return cast(Embedding, vector.detach().cpu().numpy())
 
-        with torch.no_grad():
+        with self.profile.forward_context(torch, self.device):
             return _forward()
 
     def _move_to_device(self, inputs: Any) -> Any:
-        if torch is not None and hasattr(inputs, "to"):
+        if _load_torch() is not None and hasattr(inputs, "to"):
             return inputs.to(self.device)
 
         if isinstance(inputs, dict):
             return {key: self._move_to_device(value) for key, value in inputs.items()}
 
         return inputs
-
-    def embed_bytes(self, image_bytes: bytes) -> list[float]:
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        return self.embed_pil(img)
@@ -0,0 +1,101 @@
+"""Opt-in torch inference settings for the SigLIP encoder."""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def cpu_supports_bf16(torch: Any) -> bool:
+    """Return whether oneDNN reports native bf16 kernels (AVX512-BF16 / AMX) on this CPU."""
+
+    checker = getattr(getattr(torch.ops, "mkldnn", None), "_is_mkldnn_bf16_supported", None)
+    try:
+        return bool(checker()) if checker is not None else False
+    except RuntimeError:  # pragma: no cover - builds without oneDNN
+        return False
+
+
+@dataclass(frozen=True)
+class TorchInferenceProfile:
+    """How :class:`SigLIP2Encoder` runs its forward pass.
+
+    The default reproduces plain eager fp32 under ``torch.no_grad()``; every
+    option is opt-in. ``bf16_autocast`` is ignored on CPUs without native
+    bf16 support, where it is slower than fp32.
+    """
+
+    inference_mode: bool = False
+    intra_op_threads: int | None = None
+    inter_op_threads: int | None = None
+    bf16_autocast: bool = False
+    channels_last: bool = False
+    compile: bool = False
+    compile_mode: str | None = None
+
+    def describe(self) -> str:
+        parts = [
+            name
+            for name, enabled in (
+                ("inference_mode", self.inference_mode),
+                ("bf16", self.bf16_autocast),
+                ("channels_last", self.channels_last),
+                ("compile", self.compile),
+            )
+            if enabled
+        ]
+        if self.intra_op_threads:
+            parts.append(f"threads={self.intra_op_threads}")
+        if self.inter_op_threads:
+            parts.append(f"interop={self.inter_op_threads}")
+        return "+".join(parts) or "baseline"
+
+    def apply_threads(self, torch: Any) -> None:
+        """Set process-wide thread pools; inter-op can only be set before first use."""
+
+        if self.intra_op_threads:
+            torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads and torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                logger.warning(
+                    "Inter-op thread count is fixed once torch has started parallel work; "
+                    "keeping %d.",
+                    torch.get_num_interop_threads(),
+                )
+
+    def use_bf16(self, torch: Any, device: str) -> bool:
+        if not self.bf16_autocast:
+            return False
+        if device.startswith("cuda"):
+            return bool(torch.cuda.is_bf16_supported())
+        return cpu_supports_bf16(torch)
+
+    def prepare_model(self, torch: Any, model: Any) -> Any:
+        """Apply the memory format and compilation options to an eval-mode ``model``."""
+
+        if self.channels_last and hasattr(model, "to"):
+            model = model.to(memory_format=torch.channels_last)
+        if self.compile:
+            model = torch.compile(model, mode=self.compile_mode)
+        return model
+
+    def prepare_inputs(self, torch: Any, pixel_values: Any) -> Any:
+        if self.channels_last and getattr(pixel_values, "dim", lambda: 0)() == 4:
+            return pixel_values.contiguous(memory_format=torch.channels_last)
+        return pixel_values
+
+    @contextlib.contextmanager
+    def forward_context(self, torch: Any, device: str) -> Iterator[None]:
+        grad = torch.inference_mode() if self.inference_mode else torch.no_grad()
+        autocast: Any = contextlib.nullcontext()
+        if self.use_bf16(torch, device):
+            autocast = torch.autocast(device_type=device.split(":")[0], dtype=torch.bfloat16)
+        with grad, autocast:
+            yield
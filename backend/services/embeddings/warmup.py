@@ -0,0 +1,63 @@
+"""Off-request-path encoder loading for readiness reporting."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from PIL import Image
+
+from backend.services.embeddings.base import ImageEncoder
+
+logger = logging.getLogger(__name__)
+
+
+class EncoderWarmup:
+    """Load an encoder and run one dummy forward pass, tracking readiness.
+
+    ``state`` moves from ``pending`` through ``warming`` to ``ready`` (or
+    ``failed``). ``skip()`` marks the process ready without loading, for
+    deployments that keep the old lazy first-request behaviour.
+    """
+
+    def __init__(self, factory: Callable[[], ImageEncoder]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.state = "pending"
+        self.error: str | None = None
+        self.elapsed_ms: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state in {"ready", "skipped"}
+
+    def skip(self) -> None:
+        with self._lock:
+            if self.state == "pending":
+                self.state = "skipped"
+
+    def run(self) -> None:
+        with self._lock:
+            if self.state != "pending":
+                return
+            self.state = "warming"
+
+        started = time.perf_counter()
+        try:
+            encoder = self._factory()
+            side = encoder.input_size
+            encoder.embed_batch([Image.new("RGB", (side, side))])
+        except Exception as exc:
+            logger.exception("Encoder warm-up failed")
+            state, self.error = "failed", str(exc)
+        else:
+            state = "ready"
+        self.elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info("Encoder warm-up %s after %.0f ms", state, self.elapsed_ms)
+        self.state = state
+
+    def status(self) -> dict[str, Any]:
+        return {"status": self.state, "error": self.error, "elapsed_ms": self.elapsed_ms}
@@ -0,0 +1,5 @@
+"""Image decoding helpers shared by hashing and embedding."""
+
+from backend.services.imaging.decoded_image import DecodedImage, content_digest
+
+__all__ = ["DecodedImage", "content_digest"]
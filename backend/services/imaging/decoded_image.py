@@ -0,0 +1,98 @@
+"""Decode-once image wrapper with cached derived views."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+
+from PIL import Image
+
+# Largest view any stage needs (PDQ works on 512px); decoding stops here.
+DEFAULT_DECODE_SIDE = 512
+PDQ_SIDE = 512
+PHASH_SIDE = 32
+# Bump whenever decoding or view resampling changes; cached embeddings are
+# keyed on it.
+DECODE_VERSION = 1
+
+
+def content_digest(payload: bytes) -> str:
+    """Return the BLAKE2b-256 hex digest identifying byte-identical uploads."""
+
+    return hashlib.blake2b(payload, digest_size=32).hexdigest()
+
+
+class DecodedImage:
+    """Decode an upload once and hand out cached, downscaled views.
+
+    JPEG sources use ``draft()`` so libjpeg's DCT scaling yields an image no
+    smaller than ``decode_side`` instead of decoding a 12–48MP original at full
+    resolution; other formats are shrunk with ``reduce()`` right after decoding.
+    Every view is derived from that single decode and cached on the instance.
+    """
+
+    def __init__(self, payload: bytes, decode_side: int = DEFAULT_DECODE_SIDE) -> None:
+        self.payload = payload
+        self.decode_side = decode_side
+        self.source_size: tuple[int, int] | None = None
+        self._rgb: Image.Image | None = None
+        self._views: dict[tuple[str, int], Image.Image] = {}
+        self._digest: str | None = None
+
+    @property
+    def digest(self) -> str:
+        """Content digest of the raw payload; computing it never decodes pixels."""
+
+        if self._digest is None:
+            self._digest = content_digest(self.payload)
+        return self._digest
+
+    def rgb(self) -> Image.Image:
+        """Return the decoded RGB image, downscaled to roughly ``decode_side``."""
+
+        if self._rgb is None:
+            with Image.open(io.BytesIO(self.payload)) as pil_image:
+                self.source_size = pil_image.size
+                if pil_image.format == "JPEG":
+                    pil_image.draft("RGB", (self.decode_side, self.decode_side))
+                img: Image.Image = pil_image.convert("RGB")
+
+            factor = min(img.size) // self.decode_side
+            if factor >= 2:
+                img = img.reduce(factor)
+            self._rgb = img
+        return self._rgb
+
+    def square(self, side: int) -> Image.Image:
+        """Return an RGB ``side`` x ``side`` view (the encoder's resize, done once)."""
+
+        key = ("square", side)
+        if key not in self._views:
+            self._views[key] = self.rgb().resize((side, side), Image.Resampling.BICUBIC)
+        return self._views[key]
+
+    def encoder_input(self, side: int = 224) -> Image.Image:
+        return self.square(side)
+
+    def pdq_input(self) -> Image.Image:
+        """Return an RGB view whose longer side is at most 512px, as PDQ expects."""
+
+        key = ("pdq", PDQ_SIDE)
+        if key not in self._views:
+            img = self.rgb()
+            scale = PDQ_SIDE / max(img.size)
+            if scale < 1:
+                size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                img = img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+            self._views[key] = img
+        return self._views[key]
+
+    def phash_input(self) -> Image.Image:
+        """Return the 32px grayscale view ``imagehash.phash`` operates on."""
+
+        key = ("phash", PHASH_SIDE)
+        if key not in self._views:
+            self._views[key] = (
+                self.rgb().convert("L").resize((PHASH_SIDE, PHASH_SIDE), Image.Resampling.LANCZOS)
+            )
+        return self._views[key]
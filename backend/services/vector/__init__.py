@@ -1,5 +1,7 @@
 """Vector store utilities."""
 
-from backend.services.vector.pgvector_store import VectorStore
+from backend.services.vector.matrix_index import EmbeddingMatrixRegistry
+from backend.services.vector.pgvector_store import EmbeddingRecord, VectorStore
+from backend.services.vector.projection import PCAProjection
 
-__all__ = ["VectorStore"]
+__all__ = ["EmbeddingMatrixRegistry", "EmbeddingRecord", "PCAProjection", "VectorStore"]
@@ -0,0 +1,178 @@
+"""Measure per-user search latency and recall across tenant sizes.
+
+Run ``python -m backend.services.vector.benchmark`` (or ``make bench-vector``)
+against a PostgreSQL database with the migrations applied. It inserts
+synthetic users of each size next to the existing rows, times
+:meth:`VectorStore.search` under each strategy and deletes the synthetic rows
+again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import Table, delete, insert, text
+from sqlmodel import Session
+
+from backend.models.media_item import MediaItem
+from backend.services.vector.pgvector_store import VectorStore
+
+# Synthetic users get ids far above real ones so they never collide.
+BENCHMARK_USER_BASE = 2_000_000_000
+_INSERT_BATCH = 5000
+
+
+@dataclass(frozen=True)
+class TenantResult:
+    strategy: str
+    tenant_size: int
+    p50_ms: float
+    p95_ms: float
+    # Share of the exact top-K that the strategy returned.
+    recall: float
+
+
+def _clustered_vectors(count: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    centres = rng.normal(size=(max(count // 50, 1), dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, len(centres), count)]
+    return vectors + rng.normal(scale=0.3, size=(count, dim)).astype(np.float32)
+
+
+def seed_tenants(
+    session_factory: Callable[[], Session],
+    sizes: Sequence[int],
+    dim: int,
+    rng: np.random.Generator,
+) -> dict[int, np.ndarray]:
+    """Insert one synthetic user per size; returns ``{user_id: embeddings}``."""
+
+    table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+    tenants: dict[int, np.ndarray] = {}
+    for offset, size in enumerate(sizes):
+        user_id = BENCHMARK_USER_BASE + offset
+        vectors = _clustered_vectors(size, dim, rng)
+        with session_factory() as session:
+            for start in range(0, size, _INSERT_BATCH):
+                session.execute(
+                    insert(table),
+                    [
+                        {
+                            "user_id": user_id,
+                            "google_media_item_id": f"bench-{user_id}-{index}",
+                            "embedding": vectors[index],
+                        }
+                        for index in range(start, min(start + _INSERT_BATCH, size))
+                    ],
+                )
+            session.commit()
+        tenants[user_id] = vectors
+    with session_factory() as session:
+        session.execute(text("ANALYZE media_items"))
+        session.commit()
+    return tenants
+
+
+def drop_tenants(session_factory: Callable[[], Session], user_ids: Sequence[int]) -> None:
+    table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+    with session_factory() as session:
+        session.execute(delete(table).where(table.c.user_id.in_(list(user_ids))))
+        session.commit()
+
+
+def benchmark_tenants(
+    stores: dict[str, VectorStore],
+    tenants: dict[int, np.ndarray],
+    *,
+    queries: int = 50,
+    top_k: int = 50,
+    seed: int = 0,
+) -> list[TenantResult]:
+    """Time ``search`` for every strategy and tenant, scoring recall against ``exact``."""
+
+    rng = np.random.default_rng(seed)
+    results: list[TenantResult] = []
+    for user_id, vectors in tenants.items():
+        picks = rng.integers(0, len(vectors), queries)
+        probes = vectors[picks] + rng.normal(scale=0.05, size=(queries, vectors.shape[1]))
+        truth = [
+            {row["id"] for row in stores["exact"].search(probe, user_id=user_id, top_k=top_k)}
+            for probe in probes
+        ]
+        for strategy, store in stores.items():
+            timings: list[float] = []
+            recalls: list[float] = []
+            for probe, expected in zip(probes, truth, strict=True):
+                start = time.perf_counter()
+                found = store.search(probe, user_id=user_id, top_k=top_k)
+                timings.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(expected & {row["id"] for row in found}) / max(len(expected), 1))
+            timings.sort()
+            results.append(
+                TenantResult(
+                    strategy=strategy,
+                    tenant_size=len(vectors),
+                    p50_ms=statistics.median(timings),
+                    p95_ms=timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                    recall=statistics.fmean(recalls),
+                )
+            )
+    return results
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Benchmark per-user vector search strategies across tenant sizes."""
+
+    from backend.config.settings import settings
+    from backend.db.session import SessionLocal
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic rows in place")
+    args = parser.parse_args(argv)
+
+    def store(
+        exact_search_max_rows: int = settings.VECTOR_EXACT_SEARCH_MAX_ROWS,
+        iterative_scan: str = settings.VECTOR_ITERATIVE_SCAN,
+    ) -> VectorStore:
+        return VectorStore(
+            session_factory=SessionLocal,
+            ef_search=settings.VECTOR_HNSW_EF_SEARCH,
+            probes=settings.VECTOR_IVFFLAT_PROBES,
+            exact_search_max_rows=exact_search_max_rows,
+            iterative_scan=iterative_scan,
+        )
+
+    stores = {
+        "exact": store(exact_search_max_rows=sys.maxsize),
+        "auto": store(),
+        "index": store(exact_search_max_rows=-1),
+        "index-no-iterative": store(exact_search_max_rows=-1, iterative_scan="off"),
+    }
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    tenants = seed_tenants(SessionLocal, sizes, args.dim, np.random.default_rng(0))
+    try:
+        results = benchmark_tenants(stores, tenants, queries=args.queries, top_k=args.top_k)
+    finally:
+        if not args.keep:
+            drop_tenants(SessionLocal, list(tenants))
+
+    print(f"{'strategy':<20} {'rows':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for result in results:
+        print(
+            f"{result.strategy:<20} {result.tenant_size:>8} {result.p50_ms:>8.2f} "
+            f"{result.p95_ms:>8.2f} {result.recall:>7.3f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual benchmark entry point
+    sys.exit(main())
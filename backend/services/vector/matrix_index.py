@@ -0,0 +1,563 @@
+"""In-process cosine search over per-user embedding matrices."""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from backend.services.caching import ByteBudgetLRU
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_BYTES = 256 * 1024 * 1024
+# Bumped whenever the on-disk layout written by ``EmbeddingMatrix.save`` changes.
+_FORMAT_VERSION = 2
+_ASSIGN_CHUNK = 8192
+# Per-row arrays saved by ``EmbeddingMatrix.save``, all ``size`` long.
+_ROW_ARRAYS = ("ids", "matrix", "versions", "revisions")
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length in place; zero rows stay zero (similarity 0)."""
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _signature_key(signature: Any) -> dict[str | None, list[int]]:
+    """``{version: [count, ...]}``, so signatures compare regardless of row order."""
+
+    # Round-trip through JSON so tuples, numpy integers and the database's
+    # decimal sums all compare as stored lists of ints.
+    rows = json.loads(json.dumps(signature, default=int))
+    return {version: totals for version, *totals in rows}
+
+
+def _nearest(centroids: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = vectors[start : start + _ASSIGN_CHUNK]
+        labels[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+class _InvertedLists:
+    """Spherical k-means partition of a matrix's rows (an IVF coarse quantiser)."""
+
+    def __init__(self, centroids: np.ndarray, labels: np.ndarray) -> None:
+        self.centroids = centroids
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.trained_size = len(labels)
+        self._members: list[list[int]] = [[] for _ in range(len(centroids))]
+        for row, label in enumerate(self.labels.tolist()):
+            self._members[label].append(row)
+        self._arrays: dict[int, np.ndarray] = {}
+
+    @classmethod
+    def train(cls, matrix: np.ndarray, *, iterations: int = 8, seed: int = 0) -> _InvertedLists:
+        lists = min(4096, len(matrix), max(16, int(math.sqrt(len(matrix)))))
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), min(len(matrix), lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(centroids, sample)
+            order = np.argsort(labels, kind="stable")
+            present, starts = np.unique(labels[order], return_index=True)
+            # Lists that lost every sample keep their previous centroid.
+            centroids[present] = np.add.reduceat(sample[order], starts, axis=0)
+            _normalise(centroids)
+        return cls(centroids, _nearest(centroids, matrix))
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.labels.nbytes + 8 * len(self.labels)
+
+    def add(self, vectors: np.ndarray) -> None:
+        """Assign rows appended after the last ``add`` to their nearest list."""
+
+        first = len(self.labels)
+        labels = _nearest(self.centroids, vectors)
+        self.labels = np.concatenate([self.labels, labels])
+        for offset, label in enumerate(labels.tolist()):
+            self._members[label].append(first + offset)
+            self._arrays.pop(label, None)
+
+    def move(self, row: int, vector: np.ndarray) -> None:
+        label = int(_nearest(self.centroids, vector[None, :])[0])
+        previous = int(self.labels[row])
+        if label == previous:
+            return
+        self._members[previous].remove(row)
+        self._members[label].append(row)
+        self.labels[row] = label
+        self._arrays.pop(previous, None)
+        self._arrays.pop(label, None)
+
+    def candidates(self, unit: np.ndarray, nprobe: int) -> np.ndarray:
+        """Rows in the ``nprobe`` lists whose centroids are closest to ``unit``."""
+
+        scores = self.centroids @ unit
+        nprobe = min(nprobe, len(scores))
+        probed = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        arrays = []
+        for label in probed.tolist():
+            array = self._arrays.get(label)
+            if array is None:
+                array = self._arrays[label] = np.asarray(self._members[label], dtype=np.int64)
+            arrays.append(array)
+        return np.concatenate(arrays)
+
+
+class EmbeddingMatrix:
+    """Unit-normalised float32 embeddings of one user, searched with one mat-vec.
+
+    Rows are kept in a growable ``(capacity, dim)`` block with parallel id,
+    version-code and revision arrays. An upsert of a known id overwrites its
+    row in place.
+
+    Once a matrix reaches ``ivf_min_rows`` rows it is also partitioned into
+    roughly ``sqrt(rows)`` k-means lists. A search then scores only the rows
+    in the ``nprobe`` lists closest to the query, probing more lists whenever
+    filters leave fewer than ``top_k`` rows, so results become approximate.
+    The partition is retrained once the matrix has doubled in size.
+    """
+
+    def __init__(self, dim: int, ivf_min_rows: int | None = None, nprobe: int = 8) -> None:
+        if ivf_min_rows is not None and ivf_min_rows < 1:
+            raise ValueError("ivf_min_rows must be at least 1")
+        self.dim = dim
+        self.size = 0
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, dim), dtype=np.float32)
+        self.versions = np.zeros(0, dtype=np.int32)
+        self.revisions = np.zeros(0, dtype=np.int64)
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.dirty = False
+        self._ivf: _InvertedLists | None = None
+        self._rows: dict[int, int] = {}
+        self._version_codes: dict[str | None, int] = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[tuple[int, np.ndarray, str | None, int]],
+        ivf_min_rows: int | None = None,
+        nprobe: int = 8,
+    ) -> EmbeddingMatrix:
+        """Build from ``(id, vector, version, revision)`` entries."""
+
+        ids: list[int] = []
+        vectors: list[np.ndarray] = []
+        versions: list[str | None] = []
+        revisions: list[int] = []
+        for item_id, vector, version, revision in entries:
+            ids.append(item_id)
+            vectors.append(vector)
+            versions.append(version)
+            revisions.append(revision)
+
+        index = cls(dim=len(vectors[0]) if vectors else 0, ivf_min_rows=ivf_min_rows, nprobe=nprobe)
+        if vectors:
+            index._append(np.asarray(ids, dtype=np.int64), np.stack(vectors), versions, revisions)
+        index.dirty = False
+        return index
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        # Roughly 64 bytes per entry of the id -> row dict on top of the arrays.
+        ivf = self._ivf.nbytes if self._ivf is not None else 0
+        arrays = self.ids.nbytes + self.matrix.nbytes + self.versions.nbytes + self.revisions.nbytes
+        return arrays + ivf + 64 * len(self._rows)
+
+    def signature(self) -> list[list[Any]]:
+        """Per-version row totals, as :meth:`VectorStore.embedding_signature`."""
+
+        with self._lock:
+            names = {code: version for version, code in self._version_codes.items()}
+            versions = self.versions[: self.size]
+            signature = []
+            for code in np.unique(versions).tolist():
+                rows = versions == code
+                ids = self.ids[: self.size][rows]
+                revisions = self.revisions[: self.size][rows]
+                signature.append(
+                    [
+                        names[code],
+                        len(ids),
+                        int(ids.max()),
+                        int(ids.sum()),
+                        int(revisions.sum()),
+                    ]
+                )
+            return signature
+
+    def _code(self, version: str | None) -> int:
+        return self._version_codes.setdefault(version, len(self._version_codes))
+
+    def _append(
+        self,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        versions: Sequence[str | None],
+        revisions: Sequence[int],
+    ) -> None:
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 64)
+            self.ids = np.resize(self.ids, capacity)
+            self.matrix = np.resize(self.matrix, (capacity, self.dim))
+            self.versions = np.resize(self.versions, capacity)
+            self.revisions = np.resize(self.revisions, capacity)
+        block = self.matrix[self.size : needed]
+        block[:] = vectors
+        _normalise(block)
+        self.ids[self.size : needed] = ids
+        self.versions[self.size : needed] = [self._code(version) for version in versions]
+        self.revisions[self.size : needed] = revisions
+        for offset, item_id in enumerate(ids.tolist()):
+            self._rows[item_id] = self.size + offset
+        self.size = needed
+        self.dirty = True
+
+        if self._ivf is not None and needed <= 2 * self._ivf.trained_size:
+            self._ivf.add(block)
+        elif self._ivf is not None or (
+            self.ivf_min_rows is not None and needed >= self.ivf_min_rows
+        ):
+            self._ivf = _InvertedLists.train(self.matrix[:needed])
+
+    def upsert(self, item_id: int, vector: np.ndarray, version: str | None, revision: int) -> None:
+        with self._lock:
+            if self.dim == 0:
+                self.dim = len(vector)
+                self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+            row = self._rows.get(item_id)
+            if row is None:
+                self._append(
+                    np.asarray([item_id], dtype=np.int64), vector[None, :], [version], [revision]
+                )
+                return
+            self.matrix[row] = vector
+            _normalise(self.matrix[row : row + 1])
+            self.revisions[row] = revision
+            # Like the database upsert, a missing version keeps the stored one.
+            if version is not None:
+                self.versions[row] = self._code(version)
+            if self._ivf is not None:
+                self._ivf.move(row, self.matrix[row])
+            self.dirty = True
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        item_ids: Sequence[int] | None = None,
+        embedding_version: str | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(ids, similarities)`` of the ``top_k`` nearest rows, best first."""
+
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        with self._lock:
+            if not self.size or top_k <= 0:
+                return empty
+            unit = _normalise(np.array(query, dtype=np.float32, ndmin=2))[0]
+            code = self._version_codes.get(embedding_version, -1)
+            if item_ids is not None:
+                rows = np.fromiter(
+                    (self._rows[item_id] for item_id in item_ids if item_id in self._rows),
+                    dtype=np.int64,
+                )
+                scores = self.matrix[rows] @ unit
+                ids, versions = self.ids[rows], self.versions[rows]
+            elif self._ivf is not None:
+                rows = self._probe(unit, top_k, code if embedding_version is not None else None)
+                scores = self.matrix[rows] @ unit
+                ids, versions = self.ids[rows], self.versions[rows]
+            else:
+                scores = self.matrix[: self.size] @ unit
+                ids = self.ids[: self.size]
+                versions = self.versions[: self.size]
+            if embedding_version is not None:
+                keep = versions == code
+                scores, ids = scores[keep], ids[keep]
+
+        if len(scores) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            ids, scores = ids[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+    def _probe(self, unit: np.ndarray, top_k: int, code: int | None) -> np.ndarray:
+        assert self._ivf is not None
+        nprobe = self.nprobe
+        while True:
+            rows = self._ivf.candidates(unit, nprobe)
+            found = len(rows) if code is None else int((self.versions[rows] == code).sum())
+            if found >= top_k or nprobe >= len(self._ivf.centroids):
+                return rows
+            nprobe *= 2
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        embedding_version: str | None = None,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """:meth:`search` for each row of ``queries`` with one matrix-matrix product.
+
+        Partitioned matrices are probed query by query instead.
+        """
+
+        units = _normalise(np.array(queries, dtype=np.float32, ndmin=2))
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        with self._lock:
+            # Checked under the lock: an append may train or retrain the lists.
+            if self._ivf is not None:
+                return [
+                    self.search(unit, top_k, embedding_version=embedding_version) for unit in units
+                ]
+            if not self.size or top_k <= 0:
+                return [empty for _ in units]
+            ids = self.ids[: self.size]
+            scores = units @ self.matrix[: self.size].T
+            if embedding_version is not None:
+                keep = self.versions[: self.size] == self._version_codes.get(embedding_version, -1)
+                ids, scores = ids[keep], scores[:, keep]
+
+        if scores.shape[1] > top_k:
+            top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        else:
+            top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [(ids[row], row_scores) for row, row_scores in zip(top, top_scores, strict=True)]
+
+    def save(self, directory: Path) -> None:
+        """Write the matrix to ``directory`` along with its :meth:`signature`.
+
+        Arrays are written to temporary files and renamed into place, and
+        ``meta.json`` goes last, so a reader never pairs new arrays with old
+        metadata unless the sizes also match.
+        """
+
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            arrays: dict[str, np.ndarray] = {
+                "ids": self.ids[: self.size],
+                "matrix": self.matrix[: self.size],
+                "versions": self.versions[: self.size],
+                "revisions": self.revisions[: self.size],
+            }
+            if self._ivf is not None:
+                arrays["centroids"] = self._ivf.centroids
+                arrays["labels"] = self._ivf.labels
+            meta = {
+                "format": _FORMAT_VERSION,
+                "dim": self.dim,
+                "size": self.size,
+                "versions": list(self._version_codes.items()),
+                "ivf": self._ivf is not None,
+                "signature": self.signature(),
+            }
+            for name, array in arrays.items():
+                scratch = directory / f".{name}.{os.getpid()}.npy"
+                np.save(scratch, array)
+                os.replace(scratch, directory / f"{name}.npy")
+            scratch = directory / f".meta.{os.getpid()}.json"
+            scratch.write_text(json.dumps(meta))
+            os.replace(scratch, directory / "meta.json")
+            self.dirty = False
+
+    @classmethod
+    def open(
+        cls,
+        directory: Path,
+        signature: Any,
+        ivf_min_rows: int | None = None,
+        nprobe: int = 8,
+    ) -> EmbeddingMatrix | None:
+        """Memory-map a matrix saved by :meth:`save` if it still matches ``signature``.
+
+        The arrays are mapped copy-on-write: pages come from the shared page
+        cache, and in-place upserts never touch the files.
+        """
+
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+            if meta["format"] != _FORMAT_VERSION:
+                return None
+            if _signature_key(meta["signature"]) != _signature_key(signature):
+                return None
+            arrays: dict[str, np.ndarray] = {
+                name: np.load(directory / f"{name}.npy", mmap_mode="c")
+                for name in (*_ROW_ARRAYS, *(("centroids", "labels") * meta["ivf"]))
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+        if any(len(arrays[name]) != meta["size"] for name in _ROW_ARRAYS):
+            return None
+
+        index = cls(dim=meta["dim"], ivf_min_rows=ivf_min_rows, nprobe=nprobe)
+        index.size = meta["size"]
+        index.ids, index.matrix, index.versions, index.revisions = (
+            arrays[name] for name in _ROW_ARRAYS
+        )
+        index._rows = {item_id: row for row, item_id in enumerate(index.ids.tolist())}
+        index._version_codes = {version: code for version, code in meta["versions"]}
+        if meta["ivf"]:
+            index._ivf = _InvertedLists(np.asarray(arrays["centroids"]), arrays["labels"])
+        return index
+
+
+class EmbeddingMatrixRegistry:
+    """Lazily built per-user :class:`EmbeddingMatrix` instances evicted by LRU.
+
+    The database stays the source of truth. When :meth:`get` is given the
+    user's ``signature`` (per-version row count, highest id, id sum and
+    embedding revision sum), a loaded matrix is checked against it at most
+    every ``refresh_interval`` seconds. It is rebuilt if another process has
+    added, deleted or re-embedded rows.
+
+    With a ``directory``, every matrix built from the database is also saved
+    under ``<directory>/<user_id>/``. A later process memory-maps it instead of
+    reloading every embedding, as long as the signature still matches.
+    :meth:`flush` re-saves matrices changed by upserts, e.g. at shutdown.
+
+    Loads and writes are serialised per user, so a cold load only delays
+    other requests for the same user.
+    """
+
+    def __init__(
+        self,
+        memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_BYTES,
+        directory: str | Path | None = None,
+        ivf_min_rows: int | None = None,
+        nprobe: int = 8,
+        refresh_interval: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if ivf_min_rows is not None and ivf_min_rows < 1:
+            raise ValueError("ivf_min_rows must be at least 1")
+        self._matrices = ByteBudgetLRU(memory_budget_bytes, sizeof=lambda index: index.nbytes)
+        self._lock = threading.Lock()
+        self._user_locks: dict[int, threading.Lock] = {}
+        self._checked: dict[int, float] = {}
+        self.directory = Path(directory) if directory is not None else None
+        self.ivf_min_rows = ivf_min_rows
+        self.nprobe = nprobe
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self.disk_loads = 0
+
+    def _user_lock(self, user_id: int) -> threading.Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def get(
+        self,
+        user_id: int,
+        loader: Callable[[], Iterable[tuple[int, np.ndarray, str | None, int]]],
+        signature: Callable[[], Any] | None = None,
+    ) -> EmbeddingMatrix:
+        """Return the matrix for ``user_id``, building it from ``loader`` on a miss.
+
+        ``signature`` summarises the user's rows in the database. It is needed
+        to reuse saved matrices and to notice writes made by other processes.
+        """
+
+        with self._user_lock(user_id):
+            index: EmbeddingMatrix | None = self._matrices.get(user_id)
+            if index is not None and signature is not None and self._check_due(user_id):
+                current = signature()
+                if _signature_key(index.signature()) != _signature_key(current):
+                    index = self._load(user_id, loader, current)
+                    self._matrices.put(user_id, index)
+            if index is None:
+                index = self._load(user_id, loader, signature() if signature else None)
+                self._matrices.put(user_id, index)
+            return index
+
+    def _check_due(self, user_id: int) -> bool:
+        now = self._clock()
+        if now - self._checked.get(user_id, -math.inf) < self.refresh_interval:
+            return False
+        self._checked[user_id] = now
+        return True
+
+    def _load(
+        self,
+        user_id: int,
+        loader: Callable[[], Iterable[tuple[int, np.ndarray, str | None, int]]],
+        current: Any | None,
+    ) -> EmbeddingMatrix:
+        self._checked[user_id] = self._clock()
+        if self.directory is None or current is None:
+            return EmbeddingMatrix.build(loader(), self.ivf_min_rows, self.nprobe)
+
+        directory = self.directory / str(user_id)
+        index = EmbeddingMatrix.open(directory, current, self.ivf_min_rows, self.nprobe)
+        if index is not None:
+            self.disk_loads += 1
+            return index
+        index = EmbeddingMatrix.build(loader(), self.ivf_min_rows, self.nprobe)
+        try:
+            index.save(directory)
+        except OSError:
+            logger.warning("Could not persist the embedding matrix of user %s", user_id)
+        return index
+
+    def upsert(
+        self, user_id: int, item_id: int, vector: np.ndarray, version: str | None, revision: int
+    ) -> None:
+        """Apply a write to an already-loaded matrix; unloaded users rebuild lazily."""
+
+        with self._user_lock(user_id):
+            index = self._matrices.peek(user_id)
+            if index is None:
+                return
+            index.upsert(item_id, vector, version, revision)
+            self._matrices.refresh(user_id)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._user_lock(user_id):
+            self._matrices.pop(user_id)
+
+    def flush(self) -> int:
+        """Save every loaded matrix changed since it was loaded; returns how many."""
+
+        if self.directory is None:
+            return 0
+        with self._lock:
+            user_ids = list(self._user_locks)
+        saved = 0
+        for user_id in user_ids:
+            with self._user_lock(user_id):
+                index = self._matrices.peek(user_id)
+                if index is None or not index.dirty:
+                    continue
+                try:
+                    index.save(self.directory / str(user_id))
+                except OSError:
+                    logger.warning("Could not persist the embedding matrix of user %s", user_id)
+                saved += 1
+        return saved
+
+    def stats(self) -> dict[str, int]:
+        return {**self._matrices.stats(), "disk_loads": self.disk_loads}
@@ -2,74 +2,351 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable, Sequence
-from math import sqrt
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import ColumnElement, Table, func, select, text
+import numpy as np
+from sqlalchemy import (
+    ColumnElement,
+    Float,
+    Integer,
+    Select,
+    Table,
+    bindparam,
+    case,
+    cast,
+    column,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects import postgresql
 from sqlmodel import Session
 
-from backend.models.media_item import MediaItem
+from backend.models.duplicate_group import DuplicateGroup
+from backend.models.media_item import MediaItem, PDQHash, as_embedding
+from backend.models.user import User
+from backend.services.dedupe.pdq_index import PDQIndexRegistry, pdq_segment_keys
+from backend.services.embeddings.base import Embedding
+from backend.services.vector.matrix_index import EmbeddingMatrix, EmbeddingMatrixRegistry
+from backend.services.vector.projection import PCAProjection
+
+logger = logging.getLogger(__name__)
+
+PDQ_SEARCH_BACKENDS = {"auto", "database", "memory"}
+VECTOR_SEARCH_BACKENDS = {"auto", "database", "memory"}
+
+# pgvector's default ``hnsw.ef_search``; an HNSW scan returns at most this many rows.
+HNSW_DEFAULT_EF_SEARCH = 40
+# ``hnsw.iterative_scan`` modes; ``off`` leaves the setting alone.
+ITERATIVE_SCAN_MODES = {"off", "strict_order", "relaxed_order"}
+# First pgvector release that knows ``hnsw.iterative_scan``.
+ITERATIVE_SCAN_MIN_VERSION = (0, 8)
+# Columns an upsert leaves untouched when the incoming value is NULL.
+_KEEP_IF_NULL = ("embedding_version", "pdq_hash", "pdq_segments", "content_digest")
+
+
+@dataclass(frozen=True)
+class EmbeddingRecord:
+    """One row for :meth:`VectorStore.upsert_embeddings`.
+
+    ``pdq_hash``, ``content_digest`` and ``embedding_version`` keep their
+    stored value when ``None``.
+    """
+
+    media_item_id: int
+    embedding: Embedding | Sequence[float]
+    pdq_hash: str | None = None
+    content_digest: str | None = None
+    embedding_version: str | None = None
 
 
 class VectorStore:
-    """Persist and query embeddings stored in PostgreSQL/pgvector."""
+    """Persist and query embeddings stored in PostgreSQL/pgvector.
+
+    With a ``projection``, every upsert also stores a compact half-precision
+    copy of the embedding. :meth:`search` then draws ``top_k * rerank_factor``
+    candidates from the compact vectors and reranks them by the full
+    embedding; rows not yet backfilled are always scored in full.
 
-    def __init__(self, session_factory: Callable[[], Session]):
+    :meth:`upsert_embeddings` writes ``upsert_batch_size`` rows per statement
+    and transaction.
+
+    ``ef_search`` and ``probes`` set the default breadth of HNSW and ivfflat
+    index scans; :meth:`search` can override them per call.
+
+    The ANN indexes are global, so the ``user_id`` filter is applied to what
+    the index scan yields. Users with at most ``exact_search_max_rows``
+    embeddings (counts cached for ``tenant_size_ttl`` seconds) are therefore
+    searched exactly through the ``user_id`` index. Larger users go through
+    the ANN index with ``hnsw.iterative_scan`` set, so the scan continues
+    until ``top_k`` of their rows are found. The setting needs pgvector 0.8;
+    the installed version is checked once and older ones skip it.
+
+    On databases without pgvector, or with ``vector_search_backend`` forced
+    to ``memory``, searches run against per-user embedding matrices cached in
+    ``matrix_index``; writes through this store update loaded matrices in
+    place. The database stays the source of truth: a registry that persists
+    matrices reuses them only while :meth:`embedding_signature` is unchanged.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        pdq_index: PDQIndexRegistry | None = None,
+        pdq_search_backend: str = "auto",
+        projection: PCAProjection | None = None,
+        rerank_factor: int = 4,
+        upsert_batch_size: int = 500,
+        matrix_index: EmbeddingMatrixRegistry | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        exact_search_max_rows: int = 10_000,
+        iterative_scan: str = "strict_order",
+        tenant_size_ttl: float = 300.0,
+        vector_search_backend: str = "auto",
+    ):
+        if pdq_search_backend not in PDQ_SEARCH_BACKENDS:
+            raise ValueError(f"Unknown PDQ search backend: {pdq_search_backend}")
+        if vector_search_backend not in VECTOR_SEARCH_BACKENDS:
+            raise ValueError(f"Unknown vector search backend: {vector_search_backend}")
+        if rerank_factor < 1:
+            raise ValueError("rerank_factor must be at least 1")
+        if upsert_batch_size < 1:
+            raise ValueError("upsert_batch_size must be at least 1")
+        if iterative_scan not in ITERATIVE_SCAN_MODES:
+            raise ValueError(f"Unknown iterative scan mode: {iterative_scan}")
         self._session_factory = session_factory
+        self.pdq_index = pdq_index or PDQIndexRegistry()
+        self.pdq_search_backend = pdq_search_backend
+        self.projection = projection
+        self.rerank_factor = rerank_factor
+        self.upsert_batch_size = upsert_batch_size
+        self.matrix_index = matrix_index or EmbeddingMatrixRegistry()
+        self.ef_search = ef_search
+        self.probes = probes
+        self.exact_search_max_rows = exact_search_max_rows
+        self.iterative_scan = iterative_scan
+        self.tenant_size_ttl = tenant_size_ttl
+        self.vector_search_backend = vector_search_backend
+        self._tenant_sizes: dict[int, tuple[float, int]] = {}
+        self._tenant_sizes_lock = threading.Lock()
+        self._iterative_scan_supported: bool | None = None
 
     def upsert_embedding(
         self,
         media_item_id: int,
-        embedding: Sequence[float],
+        embedding: Embedding | Sequence[float],
         pdq_hash: str | None = None,
+        content_digest: str | None = None,
+        embedding_version: str | None = None,
     ) -> None:
-        with self._session_factory() as session:
-            item = session.get(MediaItem, media_item_id)
-            if item is None:
-                raise ValueError(f"MediaItem {media_item_id} not found")
+        self.upsert_embeddings(
+            [
+                EmbeddingRecord(
+                    media_item_id=media_item_id,
+                    embedding=embedding,
+                    pdq_hash=pdq_hash,
+                    content_digest=content_digest,
+                    embedding_version=embedding_version,
+                )
+            ]
+        )
+
+    def upsert_embeddings(
+        self, records: Iterable[EmbeddingRecord], batch_size: int | None = None
+    ) -> int:
+        """Write embeddings for existing media items, ``batch_size`` rows per statement.
 
-            item.embedding = list(map(float, embedding))  # type: ignore[assignment]
-            if pdq_hash is not None:
-                item.pdq_hash = pdq_hash
+        Each batch is one ``UPDATE ... FROM (VALUES ...)`` on PostgreSQL (one
+        executemany elsewhere) in its own transaction. A batch naming a missing
+        media item is rolled back and raises ``ValueError``; earlier batches
+        stay committed. Returns the number of rows written.
+        """
 
-            session.add(item)
+        size = batch_size or self.upsert_batch_size
+        batch: list[EmbeddingRecord] = []
+        written = 0
+        for record in records:
+            batch.append(record)
+            if len(batch) >= size:
+                written += self._upsert_batch(batch)
+                batch = []
+        if batch:
+            written += self._upsert_batch(batch)
+        return written
+
+    def _upsert_batch(self, batch: list[EmbeddingRecord]) -> int:
+        vectors = np.stack([as_embedding(record.embedding) for record in batch])
+        compact = self.projection.project(vectors) if self.projection is not None else None
+        rows = [
+            {
+                "id": record.media_item_id,
+                "embedding": vector,
+                "embedding_compact": compact[index] if compact is not None else None,
+                "embedding_version": record.embedding_version,
+                "pdq_hash": record.pdq_hash,
+                "pdq_segments": (
+                    pdq_segment_keys(record.pdq_hash) if record.pdq_hash is not None else None
+                ),
+                "content_digest": record.content_digest,
+            }
+            for index, (record, vector) in enumerate(zip(batch, vectors, strict=True))
+        ]
+        # The last write to an id wins, as with repeated single upserts.
+        rows = list({row["id"]: row for row in rows}.values())
+        requested = {row["id"] for row in rows}
+
+        with self._session_factory() as session:
+            bind = session.get_bind()
+            if bind is not None and bind.dialect.name == "postgresql":
+                owners = self._update_from_values(session, rows)
+            else:
+                owners = self._update_many(session, rows)
+            missing = requested - owners.keys()
+            if missing:
+                session.rollback()
+                raise ValueError(f"MediaItem {min(missing)} not found")
             session.commit()
 
+        for row in rows:
+            user_id, revision = owners[row["id"]]
+            self.matrix_index.upsert(
+                user_id, row["id"], row["embedding"], row["embedding_version"], revision
+            )
+            if row["pdq_hash"] is not None:
+                self.pdq_index.upsert(user_id, row["id"], row["pdq_hash"])
+        return len(rows)
+
+    def _upsert_columns(self) -> list[str]:
+        names = ["embedding", "embedding_version", "pdq_hash", "pdq_segments", "content_digest"]
+        if self.projection is not None:
+            names.insert(1, "embedding_compact")
+        return names
+
+    def _update_from_values(
+        self, session: Session, rows: list[dict[str, Any]]
+    ) -> dict[int, tuple[int, int]]:
+        """Update every row with one statement.
+
+        Returns ``{id: (user_id, embedding_revision)}`` of the updated rows.
+        """
+
+        statement = self._values_update_statement(rows)
+        return {row.id: (row.user_id, row.embedding_revision) for row in session.execute(statement)}
+
+    def _values_update_statement(self, rows: list[dict[str, Any]]) -> Any:
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        names = self._upsert_columns()
+        batch = (
+            values(
+                column("id", Integer),
+                *(column(name, table.c[name].type) for name in names),
+                name="batch",
+            )
+            .data([tuple(row[key] for key in ("id", *names)) for row in rows])
+            .alias("batch")
+        )
+
+        def incoming(name: str) -> ColumnElement[Any]:
+            # VALUES columns arrive untyped over psycopg2's text protocol.
+            return cast(batch.c[name], table.c[name].type)
+
+        assignments: dict[str, Any] = {name: incoming(name) for name in names}
+        for name in _KEEP_IF_NULL:
+            assignments[name] = func.coalesce(incoming(name), table.c[name])
+        assignments["embedding_revision"] = table.c.embedding_revision + 1
+
+        return (
+            update(table)
+            .where(table.c.id == batch.c.id)
+            .values(assignments)
+            .returning(table.c.id, table.c.user_id, table.c.embedding_revision)
+        )
+
+    def _update_many(
+        self, session: Session, rows: list[dict[str, Any]]
+    ) -> dict[int, tuple[int, int]]:
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        owners = {
+            row.id: (row.user_id, row.embedding_revision + 1)
+            for row in session.execute(
+                select(table.c.id, table.c.user_id, table.c.embedding_revision).where(
+                    table.c.id.in_([row["id"] for row in rows])
+                )
+            )
+        }
+        if owners.keys() != {row["id"] for row in rows}:
+            return owners
+
+        names = self._upsert_columns()
+        assignments: dict[str, Any] = {
+            name: bindparam(f"new_{name}", type_=table.c[name].type) for name in names
+        }
+        for name in _KEEP_IF_NULL:
+            assignments[name] = func.coalesce(assignments[name], table.c[name])
+        assignments["embedding_revision"] = table.c.embedding_revision + 1
+        session.execute(
+            update(table).where(table.c.id == bindparam("row_id")).values(assignments),
+            [{"row_id": row["id"], **{f"new_{name}": row[name] for name in names}} for row in rows],
+        )
+        return owners
+
     def search(
         self,
-        embedding: Sequence[float],
+        embedding: Embedding | Sequence[float],
         user_id: int,
         top_k: int = 50,
+        item_ids: Sequence[int] | None = None,
+        embedding_version: str | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
     ) -> list[dict[str, Any]]:
-        vector = list(map(float, embedding))
+        """Return the ``top_k`` most similar items, optionally only among ``item_ids``.
+
+        With ``embedding_version`` (the query encoder's), rows embedded by any
+        other encoder version are ignored, so a half-finished re-embed never
+        compares vectors from different models.
+
+        ``ef_search`` / ``probes`` override the store's index scan breadth for
+        this call. They are applied with ``SET LOCAL`` and so only last for the
+        search's own transaction.
+        """
+
+        vector = as_embedding(embedding)
         with self._session_factory() as session:
-            bind = session.get_bind()
-            if bind is not None and bind.dialect.name != "postgresql":
+            if self._search_in_memory(session):
                 return self._search_python(
                     session=session,
                     vector=vector,
                     user_id=user_id,
                     top_k=top_k,
+                    item_ids=item_ids,
+                    embedding_version=embedding_version,
                 )
 
-            table: Table = MediaItem.__table__  # type: ignore[attr-defined]
-            embedding_col: ColumnElement[Any] = table.c.embedding
-
-            query = (
-                select(
-                    table.c.id,
-                    table.c.filename,
-                    table.c.base_url,
-                    table.c.mime_type,
-                    table.c.creation_time,
-                    (1 - func.cosine_distance(embedding_col, vector)).label("similarity"),
-                )
-                .where(table.c.user_id == user_id)
-                .where(embedding_col.isnot(None))
-                .order_by(text("similarity DESC"))
-                .limit(top_k)
+            # Reranks of a known candidate set and small users are searched exactly.
+            exact = item_ids is not None or (
+                self.tenant_size(user_id, session=session) <= self.exact_search_max_rows
+            )
+            query = self._search_statement(
+                vector, user_id, top_k, item_ids, embedding_version, exact=exact
             )
+            if not exact:
+                compact = self.projection is not None
+                scanned = top_k * self.rerank_factor if compact else top_k
+                self._tune_index_scan(session, scanned, ef_search, probes)
 
             rows = session.execute(query).all()
 
@@ -88,82 +365,735 @@ class VectorStore:
             )
         return results
 
+    def _search_statement(
+        self,
+        vector: Embedding,
+        user_id: int,
+        top_k: int,
+        item_ids: Sequence[int] | None,
+        embedding_version: str | None,
+        *,
+        exact: bool,
+    ) -> Select[Any]:
+        """The PostgreSQL query behind :meth:`search`.
+
+        Non-exact searches with a projection only rank the ``top_k *
+        rerank_factor`` nearest compact vectors (plus rows without one) by the
+        full embedding.
+        """
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        embedding_col: ColumnElement[Any] = table.c.embedding
+        query_embedding = bindparam("query_embedding", vector, type_=embedding_col.type)
+
+        # Only the ``<=>`` operator can be served by an ANN index; exact
+        # searches and compact reranks use the function form.
+        compact = self.projection is not None and not exact
+        distance: ColumnElement[Any]
+        if not exact and not compact:
+            distance = embedding_col.op("<=>", return_type=Float)(query_embedding)
+        else:
+            distance = func.cosine_distance(embedding_col, query_embedding)
+        query = (
+            select(
+                table.c.id,
+                table.c.filename,
+                table.c.base_url,
+                table.c.mime_type,
+                table.c.creation_time,
+                (1 - distance).label("similarity"),
+            )
+            .where(table.c.user_id == user_id)
+            .where(embedding_col.isnot(None))
+            .order_by(distance)
+            .limit(top_k)
+        )
+        if item_ids is not None:
+            query = query.where(table.c.id.in_(list(item_ids)))
+        if embedding_version is not None:
+            query = query.where(table.c.embedding_version == embedding_version)
+        if compact:
+            candidates = self._compact_candidates(vector, user_id, top_k, embedding_version)
+            query = query.where(
+                or_(table.c.id.in_(candidates), table.c.embedding_compact.is_(None))
+            )
+        return query
+
+    def search_many(
+        self,
+        embeddings: Embedding | Sequence[Embedding | Sequence[float]],
+        user_id: int,
+        top_k: int = 50,
+        embedding_version: str | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+    ) -> list[list[dict[str, Any]]]:
+        """:meth:`search` for several query embeddings in one round trip.
+
+        Returns one result list per query, in query order. On PostgreSQL the
+        queries are a ``VALUES`` list joined ``LATERAL`` to the per-query
+        top-K, using the same exact/index choice as :meth:`search` (without
+        the compact-vector stage). Elsewhere every query is scored against
+        the user's cached matrix in one matrix-matrix product.
+        """
+
+        rows = [as_embedding(embedding) for embedding in embeddings]
+        if not rows:
+            return []
+        vectors = np.stack(rows)
+        with self._session_factory() as session:
+            if self._search_in_memory(session):
+                hits = self._user_matrix(user_id).search_many(
+                    vectors, top_k, embedding_version=embedding_version
+                )
+                details = self._item_details(
+                    session, {int(item_id) for ids, _ in hits for item_id in ids}
+                )
+                return [
+                    [
+                        {**details[item_id], "similarity": float(similarity)}
+                        for item_id, similarity in zip(ids.tolist(), scores, strict=True)
+                        if item_id in details
+                    ]
+                    for ids, scores in hits
+                ]
+
+            exact = self.tenant_size(user_id, session=session) <= self.exact_search_max_rows
+            if not exact:
+                self._tune_index_scan(session, top_k, ef_search, probes)
+            statement = self._search_many_statement(
+                vectors, user_id, top_k, embedding_version, exact=exact
+            )
+            results: list[list[dict[str, Any]]] = [[] for _ in vectors]
+            for row in session.execute(statement):
+                record = dict(row._mapping)
+                results[record.pop("query_index")].append(record)
+        return results
+
+    def _search_many_statement(
+        self,
+        vectors: Embedding,
+        user_id: int,
+        top_k: int,
+        embedding_version: str | None,
+        *,
+        exact: bool,
+    ) -> Any:
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        embedding_col: ColumnElement[Any] = table.c.embedding
+        queries = (
+            values(
+                column("query_index", Integer),
+                column("query_embedding", embedding_col.type),
+                name="queries",
+            )
+            .data([(index, vector) for index, vector in enumerate(vectors)])
+            .alias("queries")
+        )
+        query_embedding = cast(queries.c.query_embedding, embedding_col.type)
+        distance: ColumnElement[Any]
+        if exact:
+            distance = func.cosine_distance(embedding_col, query_embedding)
+        else:
+            distance = embedding_col.op("<=>", return_type=Float)(query_embedding)
+
+        hits = (
+            select(
+                table.c.id,
+                table.c.filename,
+                table.c.base_url,
+                table.c.mime_type,
+                table.c.creation_time,
+                (1 - distance).label("similarity"),
+            )
+            .where(table.c.user_id == user_id)
+            .where(embedding_col.isnot(None))
+            .order_by(distance)
+            .limit(top_k)
+        )
+        if embedding_version is not None:
+            hits = hits.where(table.c.embedding_version == embedding_version)
+        lateral_hits = hits.lateral("hits")
+        return (
+            select(queries.c.query_index, *lateral_hits.c)
+            .select_from(queries)
+            .join(lateral_hits, true())
+            .order_by(queries.c.query_index, lateral_hits.c.similarity.desc())
+        )
+
+    def _tune_index_scan(
+        self, session: Session, limit: int, ef_search: int | None, probes: int | None
+    ) -> None:
+        """``SET LOCAL`` the ANN scan breadth for the current transaction.
+
+        ``hnsw.ef_search`` is raised to at least ``limit``: an HNSW scan
+        returns at most ``ef_search`` rows, so a smaller value would silently
+        truncate the result.
+        """
+
+        ef_search = ef_search or self.ef_search
+        probes = probes or self.probes
+        if limit > HNSW_DEFAULT_EF_SEARCH or ef_search:
+            ef_search = max(ef_search or HNSW_DEFAULT_EF_SEARCH, limit)
+            session.execute(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+        if probes:
+            session.execute(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+        if self.iterative_scan != "off" and self._supports_iterative_scan(session):
+            session.execute(text(f"SET LOCAL hnsw.iterative_scan = {self.iterative_scan}"))
+
+    def _supports_iterative_scan(self, session: Session) -> bool:
+        """Whether the installed pgvector knows ``hnsw.iterative_scan``; checked once."""
+
+        if self._iterative_scan_supported is None:
+            version = session.scalar(
+                text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            )
+            parts = tuple(
+                int(part) for part in str(version or "0").split(".")[:2] if part.isdigit()
+            )
+            self._iterative_scan_supported = parts >= ITERATIVE_SCAN_MIN_VERSION
+            if not self._iterative_scan_supported:
+                logger.warning(
+                    "pgvector %s predates hnsw.iterative_scan; large users may get fewer"
+                    " than top_k results",
+                    version,
+                )
+        return self._iterative_scan_supported
+
+    def tenant_size(self, user_id: int, session: Session | None = None) -> int:
+        """Number of embedded items of ``user_id``, cached for ``tenant_size_ttl`` seconds."""
+
+        now = time.monotonic()
+        with self._tenant_sizes_lock:
+            cached = self._tenant_sizes.get(user_id)
+        if cached is not None and now - cached[0] < self.tenant_size_ttl:
+            return cached[1]
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        query = (
+            select(func.count())
+            .select_from(table)
+            .where(table.c.user_id == user_id)
+            .where(table.c.embedding.isnot(None))
+        )
+        if session is not None:
+            size = int(session.execute(query).scalar_one())
+        else:
+            with self._session_factory() as own_session:
+                size = int(own_session.execute(query).scalar_one())
+        with self._tenant_sizes_lock:
+            self._tenant_sizes[user_id] = (now, size)
+        return size
+
+    def _compact_candidates(
+        self,
+        vector: Embedding,
+        user_id: int,
+        top_k: int,
+        embedding_version: str | None = None,
+    ) -> Any:
+        assert self.projection is not None
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        compact_col: ColumnElement[Any] = table.c.embedding_compact
+        query_compact = bindparam(
+            "query_compact", self.projection.project_one(vector), type_=compact_col.type
+        )
+
+        candidates = (
+            select(table.c.id)
+            .where(table.c.user_id == user_id)
+            .where(compact_col.isnot(None))
+            .order_by(compact_col.op("<=>", return_type=Float)(query_compact))
+            .limit(top_k * self.rerank_factor)
+        )
+        if embedding_version is not None:
+            candidates = candidates.where(table.c.embedding_version == embedding_version)
+        return candidates.scalar_subquery()
+
+    def _search_in_memory(self, session: Session) -> bool:
+        if self.vector_search_backend != "auto":
+            return self.vector_search_backend == "memory"
+        bind = session.get_bind()
+        return bind is not None and bind.dialect.name != "postgresql"
+
+    def _user_matrix(self, user_id: int) -> EmbeddingMatrix:
+        return self.matrix_index.get(
+            user_id,
+            lambda: self.fetch_embeddings(user_id),
+            signature=lambda: self.embedding_signature(user_id),
+        )
+
     def _search_python(
         self,
         *,
         session: Session,
-        vector: Sequence[float],
+        vector: Embedding,
         user_id: int,
         top_k: int,
+        item_ids: Sequence[int] | None = None,
+        embedding_version: str | None = None,
     ) -> list[dict[str, Any]]:
+        """Search the user's cached matrix (one mat-vec plus a top-K partition)."""
+
+        ids, similarities = self._user_matrix(user_id).search(
+            vector, top_k, item_ids=item_ids, embedding_version=embedding_version
+        )
+        if not len(ids):
+            return []
+
+        details = self._item_details(session, ids.tolist())
+        return [
+            {**details[item_id], "similarity": float(similarity)}
+            for item_id, similarity in zip(ids.tolist(), similarities, strict=True)
+            if item_id in details
+        ]
+
+    @staticmethod
+    def _item_details(session: Session, ids: Iterable[int]) -> dict[int, dict[str, Any]]:
         table: Table = MediaItem.__table__  # type: ignore[attr-defined]
-        embedding_col: ColumnElement[Any] = table.c.embedding
 
-        query = select(MediaItem).where(table.c.user_id == user_id).where(embedding_col.isnot(None))
-        items = session.execute(query).scalars().all()
+        wanted = list(ids)
+        if not wanted:
+            return {}
+        query = select(
+            table.c.id,
+            table.c.filename,
+            table.c.base_url,
+            table.c.mime_type,
+            table.c.creation_time,
+        ).where(table.c.id.in_(wanted))
+        return {row.id: dict(row._mapping) for row in session.execute(query)}
 
-        scored: list[dict[str, Any]] = []
-        for item in items:
-            stored = item.embedding or []
-            if not stored:
-                continue
-            similarity = self._cosine_similarity(vector, stored)
-            scored.append(
-                {
-                    "id": item.id,
-                    "filename": item.filename,
-                    "base_url": item.base_url,
-                    "mime_type": item.mime_type,
-                    "creation_time": item.creation_time,
-                    "similarity": similarity,
-                }
+    def fetch_embeddings(self, user_id: int) -> list[tuple[int, Embedding, str | None, int]]:
+        """Return ``(id, embedding, embedding_version, embedding_revision)`` of a user's items."""
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            query = (
+                select(
+                    table.c.id,
+                    table.c.embedding,
+                    table.c.embedding_version,
+                    table.c.embedding_revision,
+                )
+                .where(table.c.user_id == user_id)
+                .where(table.c.embedding.isnot(None))
+                .order_by(table.c.id)
             )
+            return [
+                (row.id, row.embedding, row.embedding_version, row.embedding_revision)
+                for row in session.execute(query)
+            ]
 
-        scored.sort(key=lambda entry: entry["similarity"] or -1.0, reverse=True)
-        return scored[:top_k]
+    def embedding_signature(self, user_id: int) -> list[list[Any]]:
+        """Summarise a user's embedded rows per version.
 
-    @staticmethod
-    def _cosine_similarity(
-        vec_a: Sequence[float],
-        vec_b: Sequence[float],
-    ) -> float | None:
-        if not vec_a or not vec_b:
-            return None
+        Each entry is ``[version, count, max id, sum of ids, sum of revisions]``.
+        Inserts, deletes and every re-embed (the write bumps the row's
+        ``embedding_revision``) change it; it is what a cached
+        :class:`EmbeddingMatrix` is checked against.
+        """
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            query = (
+                select(
+                    table.c.embedding_version,
+                    func.count(),
+                    func.max(table.c.id),
+                    func.sum(table.c.id),
+                    func.sum(table.c.embedding_revision),
+                )
+                .where(table.c.user_id == user_id)
+                .where(table.c.embedding.isnot(None))
+                .group_by(table.c.embedding_version)
+                .order_by(table.c.embedding_version)
+            )
+            return [list(row) for row in session.execute(query)]
+
+    def sample_embeddings(self, limit: int) -> Embedding:
+        """Return up to ``limit`` stored embeddings, e.g. to fit a :class:`PCAProjection`."""
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            query = (
+                select(table.c.embedding)
+                .where(table.c.embedding.isnot(None))
+                .order_by(func.random())
+                .limit(limit)
+            )
+            rows = [row.embedding for row in session.execute(query)]
+        return np.stack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+    def backfill_compact_embeddings(self, batch_size: int = 1000) -> int:
+        """Recompute ``embedding_compact`` for every row with the current projection.
+
+        Run after fitting a new projection: compact vectors from an older one
+        are not comparable with queries projected by the new one.
+        """
+
+        if self.projection is None:
+            raise ValueError("backfill_compact_embeddings needs a projection")
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        updated = 0
+        last_id = 0
+        while True:
+            with self._session_factory() as session:
+                query = (
+                    select(table.c.id, table.c.embedding)
+                    .where(table.c.embedding.isnot(None))
+                    .where(table.c.id > last_id)
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                )
+                rows = session.execute(query).all()
+                if not rows:
+                    return updated
+                compact = self.projection.project(np.stack([row.embedding for row in rows]))
+                session.execute(
+                    update(table).where(table.c.id == bindparam("row_id")),
+                    [
+                        {"row_id": row.id, "embedding_compact": vector}
+                        for row, vector in zip(rows, compact, strict=True)
+                    ],
+                )
+                session.commit()
+            updated += len(rows)
+            last_id = rows[-1].id
 
-        dot = sum(a * b for a, b in zip(vec_a, vec_b, strict=True))
-        norm_a = sqrt(sum(a * a for a in vec_a))
-        norm_b = sqrt(sum(b * b for b in vec_b))
-        if norm_a == 0 or norm_b == 0:
-            return None
-        return dot / (norm_a * norm_b)
+    def stale_embedding_users(self, embedding_version: str) -> list[int]:
+        """Users with embeddings from another encoder version, most recently active first."""
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        users: Table = User.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            stale = (
+                select(table.c.user_id)
+                .where(table.c.embedding.isnot(None))
+                .where(table.c.embedding_version.is_distinct_from(embedding_version))
+                .distinct()
+                .subquery()
+            )
+            query = (
+                select(stale.c.user_id)
+                .outerjoin(users, users.c.id == stale.c.user_id)
+                .order_by(users.c.updated_at.desc().nulls_last(), stale.c.user_id)
+            )
+            return [row.user_id for row in session.execute(query)]
+
+    def fetch_stale_embeddings(
+        self,
+        user_id: int,
+        embedding_version: str,
+        *,
+        after_id: int = 0,
+        limit: int = 100,
+    ) -> list[dict[str, Any]]:
+        """The user's next ``limit`` rows (by id, after ``after_id``) needing a re-embed."""
 
-    def fetch_pdq_candidates(self, user_id: int, limit: int = 200) -> list[dict[str, Any]]:
         table: Table = MediaItem.__table__  # type: ignore[attr-defined]
 
         with self._session_factory() as session:
             query = (
                 select(
                     table.c.id,
-                    table.c.filename,
+                    table.c.user_id,
                     table.c.base_url,
-                    table.c.pdq_hash,
-                    table.c.creation_time,
+                    table.c.mime_type,
+                    table.c.content_digest,
                 )
                 .where(table.c.user_id == user_id)
-                .where(table.c.pdq_hash.isnot(None))
-                .order_by(table.c.creation_time.desc())
+                .where(table.c.id > after_id)
+                .where(table.c.embedding.isnot(None))
+                .where(table.c.embedding_version.is_distinct_from(embedding_version))
+                .order_by(table.c.id)
                 .limit(limit)
             )
+            return [dict(row._mapping) for row in session.execute(query)]
 
-            rows = session.execute(query).all()
+    def iter_embeddings(
+        self,
+        user_id: int,
+        embedding_version: str | None = None,
+        chunk_size: int = 256,
+    ) -> Iterator[tuple[list[int], Embedding]]:
+        """Yield the user's ``(ids, embeddings)`` in id order, ``chunk_size`` rows at a time.
 
-        return [
+        Each chunk is its own keyset-paginated query, so memory stays bounded
+        by the chunk however large the library is.
+        """
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        after_id = 0
+        while True:
+            with self._session_factory() as session:
+                query = (
+                    select(table.c.id, table.c.embedding)
+                    .where(table.c.user_id == user_id)
+                    .where(table.c.id > after_id)
+                    .where(table.c.embedding.isnot(None))
+                    .order_by(table.c.id)
+                    .limit(chunk_size)
+                )
+                if embedding_version is not None:
+                    query = query.where(table.c.embedding_version == embedding_version)
+                rows = session.execute(query).all()
+            if not rows:
+                return
+            after_id = rows[-1].id
+            yield [row.id for row in rows], np.stack([row.embedding for row in rows])
+
+    def replace_duplicate_groups(
+        self, user_id: int, groups: Iterable[Sequence[int]], batch_size: int = 1000
+    ) -> int:
+        """Swap the user's stored duplicate groups for ``groups`` in one transaction."""
+
+        table: Table = DuplicateGroup.__table__  # type: ignore[attr-defined]
+
+        stored = 0
+        created_at = datetime.now(UTC)
+        with self._session_factory() as session:
+            session.execute(delete(table).where(table.c.user_id == user_id))
+            batch: list[dict[str, Any]] = []
+            for group in groups:
+                ids = sorted(int(item_id) for item_id in group)
+                batch.append(
+                    {
+                        "user_id": user_id,
+                        "size": len(ids),
+                        "media_item_ids": ids,
+                        "created_at": created_at,
+                    }
+                )
+                if len(batch) >= batch_size:
+                    stored += self._insert_groups(session, batch)
+            stored += self._insert_groups(session, batch)
+            session.commit()
+        return stored
+
+    @staticmethod
+    def _insert_groups(session: Session, batch: list[dict[str, Any]]) -> int:
+        if not batch:
+            return 0
+        table: Table = DuplicateGroup.__table__  # type: ignore[attr-defined]
+        session.execute(insert(table), batch)
+        count = len(batch)
+        batch.clear()
+        return count
+
+    def duplicate_groups(
+        self, user_id: int, *, limit: int = 50, offset: int = 0
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """Return ``(total, page)`` of the user's stored groups, largest first.
+
+        Each group lists its members with the same fields as :meth:`search`
+        results; members deleted since the clustering run are left out.
+        """
+
+        groups: Table = DuplicateGroup.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            total = session.execute(
+                select(func.count()).select_from(groups).where(groups.c.user_id == user_id)
+            ).scalar_one()
+            query = (
+                select(groups.c.id, groups.c.size, groups.c.media_item_ids, groups.c.created_at)
+                .where(groups.c.user_id == user_id)
+                .order_by(groups.c.size.desc(), groups.c.id)
+                .limit(limit)
+                .offset(offset)
+            )
+            page = [dict(row._mapping) for row in session.execute(query)]
+            details = self._item_details(
+                session, {item_id for group in page for item_id in group["media_item_ids"]}
+            )
+
+        return int(total), [
             {
-                "id": row.id,
-                "filename": row.filename,
-                "base_url": row.base_url,
-                "pdq_hash": row.pdq_hash,
-                "creation_time": row.creation_time,
+                "id": group["id"],
+                "size": group["size"],
+                "created_at": group["created_at"],
+                "items": [
+                    details[item_id] for item_id in group["media_item_ids"] if item_id in details
+                ],
             }
-            for row in rows
+            for group in page
+        ]
+
+    def count_items(self, user_id: int) -> int:
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            query = select(func.count()).select_from(table).where(table.c.user_id == user_id)
+            return int(session.execute(query).scalar_one())
+
+    def find_by_digest(
+        self,
+        user_id: int,
+        content_digest: str,
+        *,
+        include_embedding: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Return the user's items whose uploaded bytes hash to ``content_digest``."""
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        columns = [
+            table.c.id,
+            table.c.filename,
+            table.c.base_url,
+            table.c.mime_type,
+            table.c.creation_time,
+            table.c.pdq_hash,
         ]
+        if include_embedding:
+            columns.extend((table.c.embedding, table.c.embedding_version))
+
+        with self._session_factory() as session:
+            query = (
+                select(*columns)
+                .where(table.c.user_id == user_id)
+                .where(table.c.content_digest == content_digest)
+                .order_by(table.c.id)
+            )
+            rows = session.execute(query).all()
+
+        return [dict(row._mapping) for row in rows]
+
+    def fetch_pdq_hashes(self, user_id: int) -> list[tuple[int, str]]:
+        """Return every ``(media_item_id, pdq_hash)`` pair stored for ``user_id``."""
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+
+        with self._session_factory() as session:
+            query = (
+                select(table.c.id, table.c.pdq_hash)
+                .where(table.c.user_id == user_id)
+                .where(table.c.pdq_hash.isnot(None))
+            )
+            return [(row.id, row.pdq_hash) for row in session.execute(query)]
+
+    def search_pdq(
+        self,
+        pdq_hash: str | Sequence[str],
+        user_id: int,
+        max_distance: int,
+    ) -> list[dict[str, Any]]:
+        """Return items whose hash lies within ``max_distance`` bits of ``pdq_hash``.
+
+        ``pdq_hash`` may also be a sequence of query hashes (for example the
+        eight dihedral variants of one image); each row then reports its
+        smallest distance to any of them.
+
+        On PostgreSQL the Hamming filter runs in the database (``bit_count`` over
+        ``bit varying`` hashes, pre-filtered through the GIN-indexed
+        ``pdq_segments`` keys). Elsewhere, or when the backend is forced to
+        ``memory``, matching runs against the user's in-memory
+        :class:`PDQIndex`. Both cover the whole library rather than only the most
+        recent rows.
+        """
+
+        hashes = [pdq_hash] if isinstance(pdq_hash, str) else list(pdq_hash)
+
+        with self._session_factory() as session:
+            bind = session.get_bind()
+            in_database = self.pdq_search_backend == "database" or (
+                self.pdq_search_backend == "auto"
+                and bind is not None
+                and bind.dialect.name == "postgresql"
+            )
+            if in_database:
+                query = self._pdq_search_query(hashes, user_id, max_distance)
+                return [self._pdq_record(row, row.pdq_distance) for row in session.execute(query)]
+
+        index = self.pdq_index.get(user_id, lambda: self.fetch_pdq_hashes(user_id))
+        distances: dict[int, int] = {}
+        for query_hash in hashes:
+            for item_id, distance in index.query(query_hash, max_distance):
+                distances[item_id] = min(distance, distances.get(item_id, distance))
+        if not distances:
+            return []
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        matches = sorted(distances.items(), key=lambda match: (match[1], match[0]))
+
+        with self._session_factory() as session:
+            query = select(
+                table.c.id,
+                table.c.filename,
+                table.c.base_url,
+                table.c.pdq_hash,
+                table.c.creation_time,
+            ).where(table.c.id.in_(list(distances)))
+            by_id = {row.id: row for row in session.execute(query)}
+
+        return [
+            self._pdq_record(row, distance)
+            for item_id, distance in matches
+            if (row := by_id.get(item_id)) is not None
+        ]
+
+    @staticmethod
+    def _pdq_search_query(
+        pdq_hashes: Sequence[str],
+        user_id: int,
+        max_distance: int,
+    ) -> Select[Any]:
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        hash_col: ColumnElement[Any] = table.c.pdq_hash
+
+        # ``#`` (bitwise XOR) rejects operands of different widths, so pHash and
+        # PDQ rows are only compared with queries of their own length.
+        distances = [
+            func.bit_count(
+                hash_col.op("#")(bindparam(f"query_pdq_hash_{i}", value, type_=PDQHash())),
+                type_=Integer,
+            )
+            for i, value in enumerate(pdq_hashes)
+        ]
+        distance = case(
+            (
+                func.length(hash_col) == len(pdq_hashes[0]) * 4,
+                distances[0] if len(distances) == 1 else func.least(*distances),
+            ),
+            else_=None,
+        )
+
+        query = (
+            select(
+                table.c.id,
+                table.c.filename,
+                table.c.base_url,
+                hash_col,
+                table.c.creation_time,
+                distance.label("pdq_distance"),
+            )
+            .where(table.c.user_id == user_id)
+            .where(hash_col.isnot(None))
+        )
+
+        keys = sorted(
+            {key for value in pdq_hashes for key in pdq_segment_keys(value, max_distance)}
+        )
+        if keys:
+            query = query.where(
+                table.c.pdq_segments.op("&&")(postgresql.array(keys, type_=Integer))
+            )
+
+        return query.where(distance <= max_distance).order_by(distance, table.c.id)
+
+    @staticmethod
+    def _pdq_record(row: Any, distance: int) -> dict[str, Any]:
+        return {
+            "id": row.id,
+            "filename": row.filename,
+            "base_url": row.base_url,
+            "pdq_hash": row.pdq_hash,
+            "creation_time": row.creation_time,
+            "pdq_distance": distance,
+        }
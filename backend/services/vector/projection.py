@@ -0,0 +1,105 @@
+"""PCA projection that turns full embeddings into compact candidate vectors."""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from backend.models.media_item import COMPACT_EMBEDDING_DIM
+
+
+class PCAProjection:
+    """Centre, rotate onto the top principal components and re-normalise.
+
+    ``components`` holds one principal axis per row, so projecting a batch is
+    a single ``(x - mean) @ components.T``.
+    """
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray) -> None:
+        if components.shape[0] > COMPACT_EMBEDDING_DIM:
+            raise ValueError(
+                f"Projection has {components.shape[0]} dims; at most "
+                f"{COMPACT_EMBEDDING_DIM} fit the compact column"
+            )
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.ascontiguousarray(components, dtype=np.float32)
+
+    @property
+    def input_dim(self) -> int:
+        return int(self.components.shape[1])
+
+    @property
+    def output_dim(self) -> int:
+        return int(self.components.shape[0])
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray | Sequence[Sequence[float]], dim: int) -> PCAProjection:
+        data = np.asarray(vectors, dtype=np.float32)
+        if data.ndim != 2 or len(data) < 2:
+            raise ValueError("Fitting a projection needs a 2-D sample of at least two vectors")
+        dim = min(dim, *data.shape)
+        mean = data.mean(axis=0)
+        # Right singular vectors of the centred sample are the principal axes.
+        _, _, vt = np.linalg.svd(data - mean, full_matrices=False)
+        return cls(mean, vt[:dim])
+
+    def project(self, vectors: np.ndarray | Sequence[Sequence[float]]) -> np.ndarray:
+        """Project a ``(n, input_dim)`` batch to unit ``(n, COMPACT_EMBEDDING_DIM)`` rows."""
+
+        data = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        out = np.zeros((len(data), COMPACT_EMBEDDING_DIM), dtype=np.float32)
+        reduced = out[:, : self.output_dim]
+        np.matmul(data - self.mean, self.components.T, out=reduced)
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        np.divide(reduced, norms, out=reduced, where=norms > 0)
+        return out
+
+    def project_one(self, vector: np.ndarray | Sequence[float]) -> np.ndarray:
+        return self.project(np.asarray(vector))[0]
+
+    def save(self, path: str | Path) -> Path:
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with target.open("wb") as handle:
+            np.savez(handle, mean=self.mean, components=self.components)
+        return target
+
+    @classmethod
+    def load(cls, path: str | Path) -> PCAProjection:
+        with np.load(Path(path)) as data:
+            return cls(data["mean"], data["components"])
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Fit a projection on stored embeddings and backfill ``embedding_compact``."""
+
+    from backend.db.session import SessionLocal
+    from backend.services.vector.pgvector_store import VectorStore
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("path", help="projection .npz to write (or read with --backfill-only)")
+    parser.add_argument("--dim", type=int, default=COMPACT_EMBEDDING_DIM)
+    parser.add_argument("--sample", type=int, default=50_000, help="embeddings to fit on")
+    parser.add_argument("--backfill-only", action="store_true", help="reuse an existing file")
+    args = parser.parse_args(argv)
+
+    store = VectorStore(session_factory=SessionLocal)
+    if args.backfill_only:
+        projection = PCAProjection.load(args.path)
+    else:
+        sample = store.sample_embeddings(args.sample)
+        projection = PCAProjection.fit(sample, args.dim)
+        projection.save(args.path)
+        print(f"fitted {projection.output_dim}-d projection on {len(sample)} embeddings")
+
+    store.projection = projection
+    print(f"backfilled {store.backfill_compact_embeddings()} rows")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - manual maintenance entry point
+    sys.exit(main())
@@ -1,10 +1,22 @@
+import base64
+import logging
+from dataclasses import asdict
+from functools import lru_cache
+from typing import Any
+
+import httpx
 import numpy as np
 from sqlmodel import Session
 
+from backend.config.settings import settings
 from backend.db.session import engine
 from backend.models.embedding import ImageEmbedding
+from backend.models.user import User
+from backend.services.dedupe.hash_executor import HashingExecutor
 from backend.services.worker.celery_app import celery_app
 
+logger = logging.getLogger(__name__)
+
 
 @celery_app.task
 def generate_embedding(image_id: int, session_override: Session | None = None) -> None:
@@ -28,3 +40,95 @@ def generate_embedding(image_id: int, session_override: Session | None = None) -
     finally:
         if owns_session:
             session.close()
+
+
+@lru_cache
+def _hash_executor() -> HashingExecutor:
+    # Prefork children are daemonic and hash inline; solo/thread pools fan out.
+    return HashingExecutor(max_workers=settings.HASH_WORKERS, method="auto")
+
+
+@celery_app.task
+def compute_image_hashes(images_b64: list[str], dihedral: bool = False) -> list[Any]:
+    """Hash a batch of base64-encoded images on the shared hashing executor."""
+
+    images = [base64.b64decode(image) for image in images_b64]
+    executor = _hash_executor()
+    if dihedral:
+        return executor.compute_dihedral_hashes_batch(images)
+    return executor.compute_hashes(images)
+
+
+def _download_images(user_id: int, rows: list[dict[str, Any]]) -> dict[int, bytes]:
+    """Fetch originals through each row's Google Photos ``base_url``.
+
+    Base URLs expire about an hour after the listing that produced them, so
+    rows not re-listed recently fail here and stay stale until the next sync.
+    """
+
+    with Session(engine) as session:
+        user = session.get(User, user_id)
+        token = user.get_google_access_token() if user is not None else None
+    if token is None:
+        return {}
+
+    payloads: dict[int, bytes] = {}
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(timeout=30.0, headers=headers) as client:
+        for row in rows:
+            if not row.get("base_url"):
+                continue
+            try:
+                response = client.get(f"{row['base_url']}=d")
+                response.raise_for_status()
+            except httpx.HTTPError as exc:
+                logger.info("Skipping media item %s: %s", row["id"], exc)
+                continue
+            payloads[row["id"]] = response.content
+    return payloads
+
+
+@celery_app.task
+def reembed_stale_embeddings(max_items: int | None = None) -> dict[str, Any]:
+    """Re-embed up to ``max_items`` rows from an older encoder version.
+
+    Re-enqueues itself while stale rows remain and the last run made progress.
+    """
+
+    from backend.api.routes import get_embedding_model, get_vector_store
+    from backend.services.embeddings.reembed import ReembedJob
+
+    priority = [
+        int(user_id) for user_id in settings.REEMBED_PRIORITY_USERS.split(",") if user_id.strip()
+    ]
+    job = ReembedJob(
+        get_vector_store(),
+        get_embedding_model(),
+        _download_images,
+        batch_size=settings.REEMBED_BATCH_SIZE,
+        max_items_per_second=settings.REEMBED_MAX_ITEMS_PER_SECOND,
+        priority_user_ids=priority,
+    )
+    report = job.run(max_items=max_items or settings.REEMBED_ITEMS_PER_RUN)
+    if not report.complete and report.embedded:
+        reembed_stale_embeddings.delay(max_items)
+    return asdict(report)
+
+
+@celery_app.task
+def cluster_duplicates(user_id: int) -> dict[str, Any]:
+    """Recompute the user's duplicate groups read by ``GET /dedupe/groups/{user_id}``."""
+
+    from backend.api.routes import get_embedding_version, get_vector_store
+    from backend.services.dedupe import DuplicateClusterer
+
+    clusterer = DuplicateClusterer(
+        get_vector_store(),
+        pdq_threshold=settings.CLUSTER_PDQ_THRESHOLD,
+        embedding_threshold=settings.CLUSTER_EMBEDDING_THRESHOLD,
+        neighbours=settings.CLUSTER_NEIGHBOURS,
+        chunk_size=settings.CLUSTER_CHUNK_SIZE,
+        embedding_version=get_embedding_version(),
+        ef_search=settings.DEDUPE_EMBEDDING_EF_SEARCH,
+    )
+    return asdict(clusterer.run(user_id))
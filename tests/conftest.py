@@ -31,6 +31,7 @@ _DEFAULT_ENV = {
     "GOOGLE_CLIENT_ID": "client-id",
     "GOOGLE_CLIENT_SECRET": "client-secret",  # pragma: allowlist secret
     "GOOGLE_REDIRECT_URI": "http://localhost:8000/callback",
+    "EMBEDDING_WARMUP": "false",
 }
 
 for key, value in _DEFAULT_ENV.items():
@@ -90,3 +90,11 @@ async def test_ingest_dev_user_not_found(app_client: AsyncClient) -> None:
 
     assert response.status_code == 404
     assert response.json() == {"detail": "User not found"}
+
+
+@pytest.mark.asyncio
+async def test_dedupe_groups_user_not_found(app_client: AsyncClient) -> None:
+    response = await app_client.get("/api/dedupe/groups/9999")
+
+    assert response.status_code == 404
+    assert response.json() == {"detail": "User not found"}
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.models.media_item import MediaItem
+from backend.services.dedupe import DuplicateClusterer
+from backend.services.dedupe.clustering import UnionFind
+from backend.services.vector import VectorStore
+
+
+def test_union_find_groups_connected_items() -> None:
+    links = UnionFind()
+    assert links.union(1, 2) and links.union(3, 4) and links.union(2, 4)
+    assert not links.union(1, 3)
+    links.union(10, 11)
+    links.find(99)  # a lone item never forms a group
+    assert links.groups() == [[1, 2, 3, 4], [10, 11]]
+
+
+def _vector(axis: int, noise: float = 0.0) -> np.ndarray:
+    vector = np.zeros(768, dtype=np.float32)
+    vector[axis] = 1.0
+    vector[767] = noise
+    return vector
+
+
+def test_clusterer_merges_pdq_and_embedding_links_and_replaces_groups() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    store = VectorStore(
+        session_factory=sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    )
+    base = "f" * 64
+    near = "c" + "f" * 63  # two bits away from ``base``
+    rows = [
+        # (user, pdq hash, embedding, version)
+        (1, base, _vector(0), "v1"),  # 1: PDQ twin of 2
+        (1, near, _vector(1), "v1"),  # 2: and embedding twin of 3
+        (1, None, _vector(1, 0.05), "v1"),  # 3
+        (1, "0" * 64, _vector(2), "v1"),  # 4: unrelated
+        (1, None, _vector(2, 0.01), "v0"),  # 5: an older encoder's vector
+        (2, base, _vector(0), "v1"),  # 6: another user's copy
+        (1, None, _vector(3), "v1"),  # 7 and 8: a second pair
+        (1, None, _vector(3, 0.02), "v1"),
+    ]
+    with store._session_factory() as session:
+        for index, (user_id, pdq_hash, embedding, version) in enumerate(rows):
+            session.add(
+                MediaItem(
+                    user_id=user_id,
+                    google_media_item_id=f"item-{index}",
+                    filename=f"{index + 1}.jpg",
+                    pdq_hash=pdq_hash,
+                    embedding=embedding,
+                    embedding_version=version,
+                )
+            )
+        session.commit()
+
+    # A registry index cached before the rows existed must not hide the PDQ twins.
+    store.pdq_index.get(1, lambda: [])
+    clusterer = DuplicateClusterer(
+        store, neighbours=2, chunk_size=3, embedding_version="v1", embedding_threshold=0.99
+    )
+    report = clusterer.run(1)
+    assert (report.hashed, report.embedded) == (3, 6)
+    assert (report.pdq_links, report.embedding_links) == (1, 2)
+    assert (report.groups, report.grouped_items) == (2, 5)
+
+    total, page = store.duplicate_groups(1, limit=1)
+    assert total == 2
+    assert [item["id"] for item in page[0]["items"]] == [1, 2, 3]
+    _, page = store.duplicate_groups(1, limit=1, offset=1)
+    assert [item["filename"] for item in page[0]["items"]] == ["7.jpg", "8.jpg"]
+
+    # A rerun replaces the stored groups rather than adding to them.
+    DuplicateClusterer(store, embedding_threshold=None).run(1)
+    total, page = store.duplicate_groups(1)
+    assert total == 1 and page[0]["size"] == 2
+    assert store.duplicate_groups(2) == (0, [])
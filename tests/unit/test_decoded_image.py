@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import io
+
+from PIL import Image
+
+from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.imaging import DecodedImage
+
+
+def _jpeg_bytes(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color="green").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_decoded_image_uses_reduced_jpeg_decode() -> None:
+    image = DecodedImage(_jpeg_bytes((4000, 3000)))
+
+    rgb = image.rgb()
+
+    assert image.source_size == (4000, 3000)
+    assert min(rgb.size) >= 512
+    assert max(rgb.size) < 4000
+    assert max(image.pdq_input().size) == 512
+    assert image.encoder_input(224).size == (224, 224)
+    assert image.phash_input().size == (32, 32)
+    assert image.phash_input().mode == "L"
+
+
+def test_decoded_image_views_are_cached_and_shared() -> None:
+    image = DecodedImage(_jpeg_bytes((64, 48)))
+
+    assert image.rgb() is image.rgb()
+    assert image.encoder_input() is image.encoder_input()
+
+    hash_from_image = PDQFilter(method="phash").compute_hash(image)
+    hash_from_bytes = PDQFilter(method="phash").compute_hash(image.payload)
+    assert hash_from_image == hash_from_bytes
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import io
+from typing import Any
+
+from PIL import Image
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.models.media_item import MediaItem
+from backend.services.dedupe.cascade import StageConfig
+from backend.services.dedupe.pipeline import DedupePipeline
+from backend.services.imaging import DecodedImage, content_digest
+from backend.services.vector.pgvector_store import VectorStore
+
+
+class ExplodingEncoder:
+    def embed_image(self, image: DecodedImage) -> list[float]:
+        raise AssertionError("encoder should not run for exact duplicates")
+
+
+class StubEncoder:
+    embedding_version = "stub"
+
+    def embed_image(self, image: DecodedImage) -> list[float]:
+        return [1.0, 0.0]
+
+
+class StubVectorStore:
+    def __init__(self) -> None:
+        self.searched_ids: list[int] | None = None
+
+    def find_by_digest(self, user_id: int, content_digest: str) -> list[dict[str, Any]]:
+        return []
+
+    def search_pdq(self, pdq_hash: Any, user_id: int, max_distance: int) -> list[dict[str, Any]]:
+        return [{"id": item_id, "pdq_distance": 20} for item_id in (1, 2, 3)]
+
+    def search(
+        self,
+        embedding: list[float],
+        user_id: int,
+        top_k: int,
+        item_ids: list[int] | None = None,
+        embedding_version: str | None = None,
+        ef_search: int | None = None,
+    ) -> list[dict[str, Any]]:
+        assert embedding_version == "stub"
+        self.searched_ids = item_ids
+        return [{"id": 2, "similarity": 0.97}, {"id": 3, "similarity": 0.4}]
+
+
+def _png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color="purple").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _store() -> VectorStore:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    return VectorStore(
+        session_factory=sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    )
+
+
+def test_exact_duplicate_short_circuits_before_decoding() -> None:
+    store = _store()
+    payload = _png_bytes()
+    with store._session_factory() as session:
+        session.add(
+            MediaItem(
+                user_id=7,
+                google_media_item_id="dup",
+                content_digest=content_digest(payload),
+            )
+        )
+        session.commit()
+
+    image = DecodedImage(payload)
+    encoder: Any = ExplodingEncoder()
+    matches = DedupePipeline(vector_store=store, encoder=encoder).find_candidates(image, user_id=7)
+
+    assert [match["match_type"] for match in matches] == ["exact"]
+    assert matches[0]["similarity"] == 1.0
+    assert image.source_size is None
+
+
+def test_cascade_reranks_pdq_candidates_and_reports_pruning() -> None:
+    store = StubVectorStore()
+    encoder: Any = StubEncoder()
+    stages = [
+        StageConfig(name="digest"),
+        StageConfig(name="pdq", threshold=24, early_exit=False),
+        StageConfig(name="embedding", threshold=0.9, budget=10),
+    ]
+    vector_store: Any = store
+    pipeline = DedupePipeline(vector_store=vector_store, encoder=encoder, stages=stages)
+
+    result = pipeline.run(_png_bytes(), user_id=1)
+
+    assert [match["id"] for match in result.matches] == [2]
+    assert store.searched_ids == [1, 2, 3]
+    assert [(r.name, r.candidates_in, r.pruned) for r in result.stages] == [
+        ("digest", None, None),
+        ("pdq", None, None),
+        ("embedding", 3, 2),
+    ]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.embeddings import EmbeddingBatcher
+from backend.services.embeddings.base import EncoderBase
+
+
+class RecordingEncoder(EncoderBase):
+    input_size = 4
+    output_dim = 1
+    model_id = weights_id = "stub"
+
+    def __init__(self) -> None:
+        self.batch_sizes: list[int] = []
+        self.release = threading.Event()
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> np.ndarray:
+        self.release.wait(timeout=5)
+        self.batch_sizes.append(len(images))
+        return np.asarray([[float(img.width)] for img in images], dtype=np.float32)
+
+
+def test_concurrent_requests_share_forward_passes() -> None:
+    encoder = RecordingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=8, max_wait_ms=50)
+    images = [Image.new("RGB", (width, 1)) for width in range(1, 17)]
+
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            futures = [pool.submit(batcher.embed_pil, img) for img in images]
+            time.sleep(0.1)
+            encoder.release.set()
+            results = [future.result() for future in futures]
+    finally:
+        batcher.close()
+
+    assert [result.tolist() for result in results] == [[float(width)] for width in range(1, 17)]
+    assert max(encoder.batch_sizes) > 1
+    assert all(size <= 8 for size in encoder.batch_sizes)
+
+    stats = batcher.stats()
+    assert stats["requests"] == 16
+    assert stats["batches"] == len(encoder.batch_sizes)
+    assert stats["latency_ms_p95"] is not None
+
+
+def test_encoder_errors_reach_every_caller() -> None:
+    class FailingEncoder(RecordingEncoder):
+        def embed_batch(self, images: Sequence[Image.Image]) -> np.ndarray:
+            raise RuntimeError("boom")
+
+    batcher = EmbeddingBatcher(FailingEncoder(), max_batch_size=4, max_wait_ms=0)
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            batcher.embed_batch([Image.new("RGB", (2, 2))] * 3)
+    finally:
+        batcher.close()
+    assert batcher.stats()["errors"] == 3
+
+
+def test_malformed_encoder_output_fails_the_batch_but_not_the_worker() -> None:
+    class ShortEncoder(RecordingEncoder):
+        def embed_batch(self, images: Sequence[Image.Image]) -> np.ndarray:
+            rows = 1 if len(images) > 1 else len(images)
+            return np.ones((rows, 1), dtype=np.float32)
+
+    batcher = EmbeddingBatcher(ShortEncoder(), max_batch_size=4, max_wait_ms=50)
+    try:
+        with pytest.raises(ValueError, match="1 embeddings for 3 images"):
+            batcher.embed_batch([Image.new("RGB", (2, 2))] * 3)
+        assert batcher.embed_pil(Image.new("RGB", (2, 2))).tolist() == [1.0]
+    finally:
+        batcher.close()
+    assert batcher.stats()["errors"] == 3
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import io
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from backend.services.embeddings import EmbeddingBatcher, EmbeddingCache
+from backend.services.embeddings.base import EncoderBase
+
+
+class CountingEncoder(EncoderBase):
+    input_size = 8
+    output_dim = 4
+    model_id = "stub"
+
+    def __init__(self, cache: EmbeddingCache | None = None) -> None:
+        self.cache = cache
+        self.calls = 0
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> np.ndarray:
+        self.calls += len(images)
+        return np.full((len(images), 4), 0.5, dtype=np.float32)
+
+
+def _png(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_encoders_consult_the_cache_before_inference() -> None:
+    cache = EmbeddingCache()
+    encoder = CountingEncoder(cache=cache)
+    batcher = EmbeddingBatcher(encoder, max_wait_ms=0)
+
+    try:
+        first = encoder.embed_bytes(_png("red"))
+        cached = batcher.embed_bytes(_png("red"))
+        np.testing.assert_array_equal(cached, first)
+        assert cached.dtype == np.float32 and not cached.flags.writeable
+        batcher.embed_bytes(_png("blue"))
+    finally:
+        batcher.close()
+
+    assert encoder.calls == 2
+    assert cache.stats()["memory"]["hits"] == 1
+
+    other_model = CountingEncoder(cache=cache)
+    other_model.model_id = "other"
+    other_model.embed_bytes(_png("red"))
+    assert other_model.calls == 1
+
+
+def test_disk_tier_survives_restarts_and_evicts_by_budget(tmp_path: Path) -> None:
+    dim = 8
+    slot_bytes = dim * 4 + 40
+    cache = EmbeddingCache(
+        memory_budget_bytes=0, directory=tmp_path, disk_budget_bytes=3 * slot_bytes
+    )
+    vectors = {f"digest-{i}": np.full(dim, i, dtype=np.float32) for i in range(4)}
+    for digest, vector in vectors.items():
+        cache.put(digest, "model", vector)
+    cache.flush()
+
+    stats = cache.stats()["disk"]
+    assert stats["entries"] == 3
+    assert stats["evictions"] == 1
+
+    reopened = EmbeddingCache(
+        memory_budget_bytes=0, directory=tmp_path, disk_budget_bytes=3 * slot_bytes
+    )
+    assert reopened.get("digest-0", "model") is None
+    np.testing.assert_array_equal(reopened.get("digest-3", "model"), vectors["digest-3"])
+    assert reopened.get("digest-1", "other-model") is None
+    assert reopened.stats()["disk"]["hits"] == 1
+    assert reopened.stats()["disk"]["misses"] == 2
+
+
+def test_disk_tier_sees_entries_written_by_another_process(tmp_path: Path) -> None:
+    first = EmbeddingCache(memory_budget_bytes=0, directory=tmp_path, disk_budget_bytes=1 << 20)
+    second = EmbeddingCache(memory_budget_bytes=0, directory=tmp_path, disk_budget_bytes=1 << 20)
+    vector = np.arange(8, dtype=np.float32)
+
+    # The first write creates the shard, which ``second`` attaches on a miss;
+    # later writes land in files ``second`` already has mapped.
+    first.put("warm", "model", vector)
+    assert second.get("warm", "model") is not None
+    first.put("digest", "model", vector)
+    np.testing.assert_array_equal(second.get("digest", "model"), vector)
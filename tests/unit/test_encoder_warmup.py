@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from collections.abc import Sequence
+
+import pytest
+from PIL import Image
+
+from backend.api.routes import get_embedding_version
+from backend.config.settings import settings
+from backend.services.embeddings import EncoderWarmup
+
+
+class StubEncoder:
+    input_size = 8
+    output_dim = 2
+
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> list[list[float]]:
+        self.batches.append(len(images))
+        return [[1.0, 0.0] for _ in images]
+
+
+def test_warmup_runs_one_forward_pass_before_reporting_ready() -> None:
+    encoder = StubEncoder()
+    warmup = EncoderWarmup(lambda: encoder)  # type: ignore[arg-type, return-value]
+
+    assert not warmup.ready
+    warmup.run()
+    warmup.run()
+
+    assert warmup.ready
+    assert encoder.batches == [1]
+    assert warmup.status()["status"] == "ready"
+
+
+def test_failed_warmup_is_not_ready() -> None:
+    def explode() -> StubEncoder:
+        raise RuntimeError("no weights")
+
+    warmup = EncoderWarmup(explode)  # type: ignore[arg-type]
+    warmup.run()
+
+    assert not warmup.ready
+    assert warmup.status() == {
+        "status": "failed",
+        "error": "no weights",
+        "elapsed_ms": warmup.elapsed_ms,
+    }
+
+
+def test_importing_routes_does_not_import_torch() -> None:
+    code = "import sys, backend.api.routes; sys.exit('torch' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], env=dict(os.environ), check=False)
+    assert result.returncode == 0
+
+
+def test_embedding_version_is_read_without_loading_the_encoder() -> None:
+    code = (
+        "import sys; from backend.api.routes import get_embedding_version as v; "
+        "sys.exit(not v() or 'torch' in sys.modules or 'onnxruntime' in sys.modules)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], env=dict(os.environ), check=False)
+    assert result.returncode == 0
+
+
+def test_embedding_version_prefers_the_configured_label(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "EMBEDDING_MODEL_NAME", "google/siglip-large")
+    monkeypatch.setattr(settings, "EMBEDDING_VERSION", None)
+    assert get_embedding_version() == "google/siglip-large"
+
+    monkeypatch.setattr(settings, "EMBEDDING_VERSION", "siglip-2026-10")
+    assert get_embedding_version() == "siglip-2026-10"
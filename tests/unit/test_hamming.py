@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import numpy as np
+
+from backend.services.dedupe.hamming import hamming_within, pack_hash, pack_hashes
+from backend.services.dedupe.pdq_filter import PDQFilter
+
+
+def test_pack_hashes_uses_four_words_for_pdq() -> None:
+    pdq_hash = "f" * 64
+    packed = pack_hashes([pdq_hash, "0" * 64])
+
+    assert packed.shape == (2, 4)
+    assert packed.dtype == np.uint64
+    assert pack_hashes(["ff0f"]).shape == (1, 1)
+
+
+def test_hamming_within_matches_scalar_distance() -> None:
+    rng = np.random.default_rng(0)
+    hashes = [bytes(rng.integers(0, 256, 32, dtype=np.uint8)).hex() for _ in range(64)]
+    query = hashes[0]
+
+    distances, mask = hamming_within(pack_hash(query), pack_hashes(hashes), max_distance=120)
+
+    expected = [PDQFilter.hamming_distance(query, value) for value in hashes]
+    assert distances.tolist() == expected
+    assert mask.tolist() == [value <= 120 for value in expected]
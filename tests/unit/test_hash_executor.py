@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import io
+
+from PIL import Image
+
+from backend.services.dedupe import HashingExecutor, PDQFilter
+from backend.services.imaging import DecodedImage
+
+
+def _png(color: str, size: int = 64) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (size, size), color=color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_process_pool_matches_inline_hashes() -> None:
+    payloads = [_png(color) for color in ("red", "green", "blue", "white", "black")]
+    expected = [PDQFilter(method="auto").compute_hash(payload) for payload in payloads]
+
+    executor = HashingExecutor(max_workers=2)
+    try:
+        assert executor.compute_hashes(payloads) == expected
+        hashes, _, _ = executor.compute_dihedral_hashes(payloads[0])
+        assert len(hashes) == 8
+    finally:
+        executor.shutdown()
+
+
+def test_zero_workers_hash_inline_without_a_pool() -> None:
+    executor = HashingExecutor(max_workers=0)
+    image = DecodedImage(_png("red"))
+
+    assert executor.compute_hashes([]) == []
+    assert executor.compute_hash(image) == PDQFilter(method="auto").compute_hash(image)
+    assert executor._pool is None
+
+
+def test_pool_is_opt_in_and_skipped_for_a_single_decoded_image() -> None:
+    assert HashingExecutor().max_workers == 0
+
+    executor = HashingExecutor(max_workers=2)
+    image = DecodedImage(_png("blue"))
+    try:
+        assert executor.compute_hash(image) == PDQFilter(method="auto").compute_hash(image)
+        assert executor._pool is None
+    finally:
+        executor.shutdown()
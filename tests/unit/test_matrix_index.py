@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from backend.services.vector.matrix_index import EmbeddingMatrix, EmbeddingMatrixRegistry
+
+Row = tuple[int, np.ndarray, str | None, int]
+
+
+def test_matrix_search_matches_brute_force_cosine() -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 64)).astype(np.float32)
+    vectors[7] = 0.0
+    versions = ["v1" if i % 3 else "v2" for i in range(500)]
+    index = EmbeddingMatrix.build(
+        (item_id + 1000, vector, version, 1)
+        for item_id, (vector, version) in enumerate(zip(vectors, versions, strict=True))
+    )
+    query = rng.normal(size=64).astype(np.float32)
+
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    expected = np.divide(vectors @ query, norms, out=np.zeros(500, np.float32), where=norms > 0)
+
+    ids, scores = index.search(query, top_k=10)
+    assert ids.tolist() == (np.argsort(-expected)[:10] + 1000).tolist()
+    np.testing.assert_allclose(scores, np.sort(expected)[::-1][:10], rtol=1e-5)
+
+    ids, _ = index.search(query, top_k=500, embedding_version="v2")
+    assert sorted(ids.tolist()) == [i + 1000 for i in range(0, 500, 3)]
+    ids, _ = index.search(query, top_k=5, item_ids=[1007, 1001, 99])
+    assert sorted(ids.tolist()) == [1001, 1007]
+    assert len(index.search(query, top_k=5, embedding_version="v3")[0]) == 0
+
+
+def test_registry_updates_loaded_matrices_and_evicts_by_budget() -> None:
+    registry = EmbeddingMatrixRegistry(memory_budget_bytes=64 * 1024)
+    loads: list[int] = []
+
+    def loader(user_id: int) -> list[tuple[int, np.ndarray, str | None, int]]:
+        loads.append(user_id)
+        return [(user_id * 100 + i, np.eye(32, dtype=np.float32)[i], "v1", 1) for i in range(32)]
+
+    matrix = registry.get(1, lambda: loader(1))
+    registry.upsert(1, 100, np.eye(32, dtype=np.float32)[5], "v2", 2)
+    registry.upsert(2, 200, np.ones(32, dtype=np.float32), "v1", 2)  # not loaded: ignored
+    ids, scores = matrix.search(np.eye(32, dtype=np.float32)[5], top_k=2, embedding_version="v2")
+    assert ids.tolist() == [100] and scores[0] == 1.0
+    registry.upsert(1, 999, np.ones(32, dtype=np.float32), "v1", 1)
+    assert len(matrix) == 33
+
+    for user_id in range(2, 12):
+        registry.get(user_id, partial(loader, user_id))
+    assert registry.stats()["evictions"] > 0
+    registry.get(1, lambda: loader(1))
+    assert loads.count(1) == 2
+
+
+def test_ivf_search_recalls_exact_neighbours_and_tracks_upserts() -> None:
+    rng = np.random.default_rng(1)
+    centres = rng.normal(size=(40, 32)).astype(np.float32)
+    vectors = centres[rng.integers(0, 40, 4000)] + rng.normal(scale=0.2, size=(4000, 32))
+    entries = [(i, vector.astype(np.float32), "v1", 1) for i, vector in enumerate(vectors)]
+    exact = EmbeddingMatrix.build(entries)
+    ivf = EmbeddingMatrix.build(entries, ivf_min_rows=1000, nprobe=8)
+
+    recalls = []
+    for query in vectors[:20] + rng.normal(scale=0.05, size=(20, 32)):
+        expected = set(exact.search(query, top_k=10)[0].tolist())
+        recalls.append(len(expected & set(ivf.search(query, top_k=10)[0].tolist())) / 10)
+    assert np.mean(recalls) >= 0.9
+
+    ivf.upsert(99_999, centres[3], "v2", 1)
+    ids, _ = ivf.search(centres[3], top_k=1, embedding_version="v2")
+    assert ids.tolist() == [99_999]
+    assert len(ivf.search_many(vectors[:3], top_k=5)) == 3
+
+
+def _database_signature(rows: list[Row]) -> list[list[Any]]:
+    """What ``VectorStore.embedding_signature`` reports for ``rows``."""
+
+    return EmbeddingMatrix.build(rows).signature()
+
+
+def test_registry_persists_matrices_and_rebuilds_on_signature_change(tmp_path: Path) -> None:
+    rows: list[Row] = [(100 + i, np.eye(32, dtype=np.float32)[i], "v1", 1) for i in range(32)]
+    loads: list[int] = []
+
+    def loader() -> list[Row]:
+        loads.append(1)
+        return list(rows)
+
+    def registry() -> EmbeddingMatrixRegistry:
+        return EmbeddingMatrixRegistry(directory=tmp_path, ivf_min_rows=16, nprobe=2)
+
+    def get(target: EmbeddingMatrixRegistry) -> EmbeddingMatrix:
+        return target.get(1, loader, signature=lambda: _database_signature(rows))
+
+    first = registry()
+    get(first)
+    first.upsert(1, 500, np.eye(32, dtype=np.float32)[3], "v1", 1)
+    rows.append((500, np.eye(32, dtype=np.float32)[3], "v1", 1))
+    assert first.flush() == 1
+
+    reopened = registry()
+    matrix = get(reopened)
+    assert (len(loads), reopened.stats()["disk_loads"], len(matrix)) == (1, 1, 33)
+    assert isinstance(matrix.matrix, np.memmap)
+    ids, _ = matrix.search(np.eye(32, dtype=np.float32)[3], top_k=2)
+    assert sorted(ids.tolist()) == [103, 500]
+
+    # Re-embedded in place by another process: same version, count and ids.
+    rows[0] = (100, np.eye(32, dtype=np.float32)[7], "v1", 2)
+    rebuilt = get(registry())
+    assert len(loads) == 2
+    ids, _ = rebuilt.search(np.eye(32, dtype=np.float32)[7], top_k=2)
+    assert sorted(ids.tolist()) == [100, 107]
+
+
+def test_registry_rechecks_loaded_matrices_against_the_database() -> None:
+    now = [0.0]
+    rows: list[Row] = [(100 + i, np.eye(32, dtype=np.float32)[i], "v1", 1) for i in range(4)]
+    registry = EmbeddingMatrixRegistry(refresh_interval=30.0, clock=lambda: now[0])
+
+    def get() -> EmbeddingMatrix:
+        return registry.get(1, lambda: list(rows), signature=lambda: _database_signature(rows))
+
+    first = get()
+    # Another process embeds two more rows, one under a new version.
+    rows.append((104, np.eye(32, dtype=np.float32)[4], "v1", 1))
+    rows.append((105, np.eye(32, dtype=np.float32)[5], None, 1))
+    now[0] = 10.0
+    assert get() is first
+    now[0] = 31.0
+    second = get()
+    assert second is not first and len(second) == 6
+
+    # A deleted embedding replaced by one of a lower id keeps count and max id.
+    del rows[2]
+    rows.append((99, np.eye(32, dtype=np.float32)[9], "v1", 1))
+    now[0] = 62.0
+    third = get()
+    assert third is not second and 99 in third.ids.tolist()
+    now[0] = 70.0
+    assert get() is third
+
+
+def test_small_matrices_can_be_partitioned() -> None:
+    entries = [(i, np.eye(8, dtype=np.float32)[i], "v1", 1) for i in range(5)]
+
+    index = EmbeddingMatrix.build(entries, ivf_min_rows=1, nprobe=2)
+
+    assert index.search(np.eye(8, dtype=np.float32)[3], top_k=1)[0].tolist() == [3]
+    with pytest.raises(ValueError, match="ivf_min_rows"):
+        EmbeddingMatrix(dim=8, ivf_min_rows=0)
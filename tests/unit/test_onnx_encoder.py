@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("torch")
+import torch
+from PIL import Image
+
+from backend.services.embeddings.onnx_encoder import (
+    ONNXImageEncoder,
+    check_parity,
+    export_onnx,
+    quantized_path,
+)
+from backend.services.embeddings.siglip2_encoder import SigLIP2Encoder
+
+SIDE = 32
+
+
+class TinyVisionModel(torch.nn.Module):
+    def __init__(self) -> None:
+        super().__init__()
+        torch.manual_seed(0)
+        self.config = SimpleNamespace(projection_dim=16)
+        self.conv = torch.nn.Conv2d(3, 8, kernel_size=4, stride=4)
+        self.proj = torch.nn.Linear(8 * (SIDE // 4) ** 2, 16)
+
+    def get_image_features(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.proj(torch.relu(self.conv(pixel_values)).flatten(1))
+
+    def forward(self, pixel_values: torch.Tensor) -> SimpleNamespace:
+        return SimpleNamespace(image_embeds=self.get_image_features(pixel_values))
+
+
+class NumpyProcessor:
+    """Mimics the SigLIP processor: rescale to [0, 1], normalise with 0.5/0.5."""
+
+    def __call__(self, *, images: list[Image.Image], return_tensors: str) -> dict[str, object]:
+        pixels = np.stack([np.asarray(img.convert("RGB"), dtype=np.float32) for img in images])
+        pixels = ((pixels / 255 - 0.5) / 0.5).astype(np.float32)
+        return {"pixel_values": torch.from_numpy(pixels.transpose(0, 3, 1, 2).copy())}
+
+
+def _images() -> list[Image.Image]:
+    rng = np.random.default_rng(1)
+    return [
+        Image.fromarray(rng.integers(0, 256, (SIDE, SIDE, 3), dtype=np.uint8)) for _ in range(6)
+    ]
+
+
+def test_onnx_export_matches_torch_embeddings(tmp_path: Path) -> None:
+    model = TinyVisionModel().eval()
+    reference = SigLIP2Encoder(processor=NumpyProcessor(), model=model, device="cpu")
+    path = export_onnx(model, tmp_path / "tiny.onnx", input_size=SIDE)
+
+    candidate = ONNXImageEncoder(path)
+    assert candidate.input_size == SIDE
+    assert candidate.output_dim == 16
+
+    report = check_parity(reference, candidate, _images())
+    assert report.passed
+    assert report.min_cosine > 0.9999
+
+
+def test_quantized_model_is_created_on_first_load(tmp_path: Path) -> None:
+    path = export_onnx(TinyVisionModel().eval(), tmp_path / "tiny.onnx", input_size=SIDE)
+
+    encoder = ONNXImageEncoder.from_path(path, quantize=True)
+
+    assert quantized_path(path).exists()
+    vectors = np.asarray(encoder.embed_batch(_images()))
+    assert vectors.shape == (6, 16)
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-5)
+
+
+def test_onnx_encoder_stores_the_source_checkpoint_version(tmp_path: Path) -> None:
+    reference = SigLIP2Encoder(processor=NumpyProcessor(), model=TinyVisionModel(), device="cpu")
+    path = export_onnx(
+        reference.model, tmp_path / "tiny.onnx", input_size=SIDE, weights_id=reference.weights_id
+    )
+
+    plain = ONNXImageEncoder(path)
+    quantized = ONNXImageEncoder.from_path(path, quantize=True)
+
+    assert plain.embedding_version == reference.embedding_version
+    assert quantized.embedding_version == reference.embedding_version
+    assert len({reference.cache_namespace, plain.cache_namespace, quantized.cache_namespace}) == 3
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import io
+from types import SimpleNamespace
+from typing import Any
 
+import imagehash
+import numpy as np
+import pytest
 from PIL import Image
 
+from backend.services.dedupe import pdq_filter
 from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.imaging import DecodedImage
 
 
 def test_pdq_hash_returns_hex_string() -> None:
@@ -24,3 +31,95 @@ def test_pdq_hash_returns_hex_string() -> None:
 def test_hamming_distance_is_zero_for_identical_hashes() -> None:
     hash_hex = "ff0f"
     assert PDQFilter.hamming_distance(hash_hex, hash_hex) == 0
+
+
+def test_pdq_hash_passes_decoded_pixels_to_binding(monkeypatch: pytest.MonkeyPatch) -> None:
+    received: list[Any] = []
+
+    def compute(image: Any) -> tuple[np.ndarray, int]:
+        received.append(image)
+        return np.ones(256, dtype=bool), 90
+
+    monkeypatch.setattr(pdq_filter, "pdqhash", SimpleNamespace(compute=compute))
+    monkeypatch.setattr(pdq_filter, "HAS_PDQ", True)
+    monkeypatch.setattr(pdq_filter, "_pdq_accepts_pixels", None)
+
+    hash_hex, quality = PDQFilter()._pdq_hash(Image.new("RGB", (8, 6), color="red"))
+
+    assert hash_hex == "f" * 64
+    assert quality == 90
+    assert isinstance(received[-1], np.ndarray)
+    assert received[-1].shape == (6, 8, 3)
+
+
+def test_bad_image_data_does_not_switch_bindings_to_bytes(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def compute(image: Any) -> tuple[np.ndarray, int]:
+        if image.shape[0] < 8:
+            raise ValueError("image too small")
+        return np.ones(256, dtype=bool), 90
+
+    monkeypatch.setattr(pdq_filter, "pdqhash", SimpleNamespace(compute=compute))
+    monkeypatch.setattr(pdq_filter, "HAS_PDQ", True)
+    monkeypatch.setattr(pdq_filter, "_pdq_accepts_pixels", None)
+
+    with pytest.raises(ValueError, match="too small"):
+        PDQFilter()._pdq_hash(Image.new("RGB", (4, 4)))
+    assert pdq_filter._pdq_accepts_pixels is True
+    assert PDQFilter()._pdq_hash(Image.new("RGB", (8, 8)))[1] == 90
+
+
+def test_pdq_hash_falls_back_to_bytes_for_legacy_bindings(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def compute(payload: Any) -> tuple[str, int]:
+        if not isinstance(payload, bytes):
+            raise TypeError("expected encoded image bytes")
+        return "ab" * 32, 70
+
+    monkeypatch.setattr(pdq_filter, "pdqhash", SimpleNamespace(compute=compute))
+    monkeypatch.setattr(pdq_filter, "HAS_PDQ", True)
+    monkeypatch.setattr(pdq_filter, "_pdq_accepts_pixels", None)
+
+    assert PDQFilter()._pdq_hash(Image.new("RGB", (8, 8))) == ("ab" * 32, 70)
+    assert pdq_filter._pdq_accepts_pixels is False
+
+
+def test_phash_dihedral_hashes_match_transformed_images() -> None:
+    gradient = np.add.outer(np.arange(48), 3 * np.arange(64)).astype(np.uint8)
+    img = Image.fromarray(gradient, mode="L").convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+
+    filter_ = PDQFilter(method="phash")
+    hashes, quality, method = filter_.compute_dihedral_hashes(buffer.getvalue())
+
+    view = DecodedImage(buffer.getvalue()).phash_input()
+    expected = [
+        str(imagehash.phash(view if transform is None else view.transpose(transform)))
+        for transform in pdq_filter.DIHEDRAL_TRANSFORMS
+    ]
+    assert (method, quality) == ("phash", None)
+    assert hashes == expected
+    assert hashes[0] == filter_.compute_hash(buffer.getvalue())[0]
+
+
+def test_pdq_dihedral_hashes_use_the_bindings_return_shape(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    def compute_dihedral(image: Any) -> tuple[list[np.ndarray], int]:
+        # pdqhash returns eight bit vectors and one scalar quality.
+        return [np.eye(256, dtype=bool)[i] for i in range(8)], 87
+
+    monkeypatch.setattr(pdq_filter, "pdqhash", SimpleNamespace(compute_dihedral=compute_dihedral))
+    monkeypatch.setattr(pdq_filter, "HAS_PDQ", True)
+    monkeypatch.setattr(pdq_filter, "_pdq_accepts_pixels", None)
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color="blue").save(buffer, format="PNG")
+
+    hashes, quality, method = PDQFilter().compute_dihedral_hashes(buffer.getvalue())
+
+    assert (method, quality) == ("pdq", 87)
+    assert hashes[0] == "80" + "0" * 62
+    assert hashes[7] == "01" + "0" * 62
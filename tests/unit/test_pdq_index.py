@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+
+from backend.services.dedupe.pdq_filter import PDQFilter
+from backend.services.dedupe.pdq_index import PDQIndex, PDQIndexRegistry
+
+
+def _random_hashes(count: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    return [bytes(row).hex() for row in rng.integers(0, 256, (count, 32), dtype=np.uint8)]
+
+
+def _flip_bits(hash_hex: str, bits: list[int]) -> str:
+    value = int(hash_hex, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f"{value:064x}"
+
+
+def test_pdq_index_radius_query_matches_brute_force() -> None:
+    hashes = _random_hashes(6000)
+    query = _flip_bits(hashes[42], [0, 17, 63, 64, 130, 200, 255])
+    hashes[4321] = _flip_bits(query, [5, 70, 140])
+
+    index = PDQIndex.build(enumerate(hashes))
+    matches = index.query(query, max_distance=8)
+
+    expected = sorted(
+        (item_id, PDQFilter.hamming_distance(query, value))
+        for item_id, value in enumerate(hashes)
+        if PDQFilter.hamming_distance(query, value) <= 8
+    )
+    assert sorted(matches) == expected
+    assert [item_id for item_id, _ in matches] == [4321, 42]
+
+
+def test_pdq_index_upsert_replaces_existing_hash() -> None:
+    first, second = _random_hashes(2, seed=1)
+    index = PDQIndex.build([(1, first)])
+
+    index.upsert(1, second)
+
+    assert index.query(first, max_distance=8) == []
+    assert index.query(second, max_distance=8) == [(1, 0)]
+    assert len(index) == 1
+
+
+def test_pdq_index_reclaims_rows_of_repeated_upserts() -> None:
+    hashes = _random_hashes(3000, seed=2)
+    index = PDQIndex.build(enumerate(hashes[:100]))
+
+    for round_ in range(30):
+        for item_id in range(100):
+            index.upsert(item_id, hashes[(item_id + round_ * 100) % 3000])
+
+    table = next(iter(index._tables.values()))
+    assert len(index) == 100
+    assert table.size <= 1024 + 100 + 1
+    assert index.query(hashes[2950], max_distance=0) == [(50, 0)]
+
+
+def test_registry_evicts_least_recently_used_index() -> None:
+    registry = PDQIndexRegistry(memory_budget_bytes=1)
+    loads: list[int] = []
+
+    def loader(user_id: int) -> list[tuple[int, str]]:
+        loads.append(user_id)
+        return [(user_id, _random_hashes(1, seed=user_id)[0])]
+
+    registry.get(1, lambda: loader(1))
+    registry.get(2, lambda: loader(2))
+    registry.get(1, lambda: loader(1))
+
+    assert loads == [1, 2, 1]
+    assert registry.stats()["evictions"] == 2
+
+
+def test_registry_cold_load_does_not_block_other_users() -> None:
+    registry = PDQIndexRegistry()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader() -> list[tuple[int, str]]:
+        started.set()
+        release.wait(timeout=5)
+        return [(1, _random_hashes(1, seed=1)[0])]
+
+    loading = threading.Thread(target=registry.get, args=(1, slow_loader))
+    loading.start()
+    assert started.wait(timeout=5)
+    # User 2 loads while user 1's loader is still running.
+    assert len(registry.get(2, lambda: [(2, _random_hashes(1, seed=2)[0])])) == 1
+    release.set()
+    loading.join(timeout=5)
+    assert len(registry.get(1, slow_loader)) == 1
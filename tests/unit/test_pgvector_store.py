@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta
+from typing import Any
+
+import numpy as np
 import pytest
+from sqlalchemy import Table, select
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import sessionmaker
 from sqlmodel import Session, SQLModel, create_engine
 
-from backend.models.media_item import MediaItem
-from backend.services.vector.pgvector_store import VectorStore
+from backend.models.media_item import EmbeddingVector, MediaItem, PDQHash
+from backend.services.vector import EmbeddingRecord, PCAProjection, VectorStore
 
 
 def _build_embedding(value: float = 1.0) -> list[float]:
@@ -15,6 +21,14 @@ def _build_embedding(value: float = 1.0) -> list[float]:
     return vec
 
 
+def _item_ids(items: list[MediaItem]) -> list[int]:
+    ids: list[int] = []
+    for item in items:
+        assert item.id is not None
+        ids.append(item.id)
+    return ids
+
+
 def test_vector_store_round_trip() -> None:
     engine = create_engine("sqlite:///:memory:", echo=False)
     SQLModel.metadata.create_all(engine)
@@ -41,6 +55,300 @@ def test_vector_store_round_trip() -> None:
     assert results[0]["id"] == media_id
     assert results[0]["similarity"] == pytest.approx(1.0, rel=1e-6)
 
-    candidates = store.fetch_pdq_candidates(user_id=1, limit=5)
-    assert candidates
-    assert candidates[0]["pdq_hash"] == "abcd"
+    assert store.fetch_pdq_hashes(user_id=1) == [(media_id, "abcd")]
+
+
+def test_vector_store_pdq_search_covers_whole_library() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+    with SessionLocal() as session:
+        for index in range(250):
+            session.add(
+                MediaItem(
+                    user_id=1,
+                    google_media_item_id=f"item-{index}",
+                    pdq_hash=f"{index:064x}",
+                    creation_time=datetime(2020, 1, 1) + timedelta(days=index),
+                )
+            )
+        session.commit()
+
+    store = VectorStore(session_factory=SessionLocal)
+    oldest_hash = f"{0:064x}"
+
+    matches = store.search_pdq(pdq_hash=oldest_hash, user_id=1, max_distance=0)
+
+    assert [match["pdq_hash"] for match in matches] == [oldest_hash]
+    assert matches[0]["pdq_distance"] == 0
+
+    variants = ["f" * 64, oldest_hash]
+    assert store.search_pdq(pdq_hash=variants, user_id=1, max_distance=0) == matches
+
+
+def test_pdq_search_query_filters_hamming_distance_in_postgres() -> None:
+    query = VectorStore._pdq_search_query(["ab" * 32], user_id=1, max_distance=8)
+    sql = str(query.compile(dialect=postgresql.dialect()))
+
+    assert "bit_count(media_items.pdq_hash # " in sql
+    assert "media_items.pdq_segments && ARRAY[" in sql
+
+    hash_type = PDQHash()
+    dialect = postgresql.dialect()
+    stored = hash_type.process_bind_param("00ff", dialect)
+    assert stored == "0000000011111111"
+    assert hash_type.process_result_value(stored, dialect) == "00ff"
+
+
+def test_bulk_upsert_writes_batches_atomically() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    with SessionLocal() as session:
+        items = [
+            MediaItem(user_id=3, google_media_item_id=f"item-{i}", content_digest="old")
+            for i in range(5)
+        ]
+        session.add_all(items)
+        session.commit()
+        ids = _item_ids(items)
+
+    store = VectorStore(session_factory=SessionLocal, upsert_batch_size=2)
+    records = [
+        EmbeddingRecord(ids[0], _build_embedding(1.0), pdq_hash="ab" * 32),
+        *(EmbeddingRecord(item_id, _build_embedding(0.5)) for item_id in ids[1:]),
+    ]
+    assert store.upsert_embeddings(records) == 5
+    with SessionLocal() as session:
+        first = session.get(MediaItem, ids[0])
+        assert first is not None and first.pdq_segments is not None
+        assert first.pdq_hash == "ab" * 32 and first.content_digest == "old"
+    assert store.search_pdq("ab" * 32, user_id=3, max_distance=0)[0]["id"] == ids[0]
+
+    store.upsert_embeddings([EmbeddingRecord(ids[0], _build_embedding(), embedding_version="v1")])
+    store.upsert_embeddings([EmbeddingRecord(ids[0], _build_embedding(0.5))])
+    with SessionLocal() as session:
+        first = session.get(MediaItem, ids[0])
+        assert first is not None and first.embedding_version == "v1"
+
+    with pytest.raises(ValueError, match="not found"):
+        store.upsert_embeddings(
+            [EmbeddingRecord(ids[1], _build_embedding(-1.0)), EmbeddingRecord(999, [0.0] * 768)]
+        )
+    results = store.search(_build_embedding(-1.0), user_id=3, top_k=5)
+    assert all(row["similarity"] < 0 for row in results)
+
+    rows = [
+        {
+            "id": item_id,
+            "embedding": _build_embedding(),
+            "embedding_version": None,
+            "pdq_hash": None,
+            "pdq_segments": None,
+            "content_digest": None,
+        }
+        for item_id in ids
+    ]
+    sql = str(store._values_update_statement(rows).compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE media_items SET")
+    assert "FROM (VALUES (" in sql and "CAST(batch.embedding AS VECTOR(768))" in sql
+    assert "coalesce(CAST(batch.embedding_version AS VARCHAR(255))" in sql
+    assert "RETURNING media_items.id, media_items.user_id" in sql
+
+
+def test_compact_candidates_are_reranked_with_full_embeddings() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(8, 768))
+    vectors = centres[rng.integers(0, 8, 200)] + rng.normal(scale=0.3, size=(200, 768))
+    with SessionLocal() as session:
+        items = [MediaItem(user_id=1, google_media_item_id=f"item-{i}") for i in range(200)]
+        session.add_all(items)
+        session.commit()
+        ids = _item_ids(items)
+
+    plain = VectorStore(session_factory=SessionLocal)
+    plain.upsert_embeddings(
+        EmbeddingRecord(media_item_id=item_id, embedding=vector)
+        for item_id, vector in zip(ids, vectors, strict=True)
+    )
+
+    projection = PCAProjection.fit(vectors, dim=128)
+    compact = VectorStore(session_factory=SessionLocal, projection=projection, rerank_factor=4)
+    assert compact.backfill_compact_embeddings(batch_size=64) == 200
+    with SessionLocal() as session:
+        stored = session.get(MediaItem, ids[0])
+        assert stored is not None and stored.embedding_compact is not None
+        assert stored.embedding_compact.shape == (256,)
+        assert stored.embedding_compact.dtype == np.float32
+
+        table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+        stored_compact = {
+            row.id: row.embedding_compact
+            for row in session.execute(select(table.c.id, table.c.embedding_compact))
+        }
+
+    # The PostgreSQL statement keeps the top_k * rerank_factor nearest compact
+    # vectors (plus rows without one) and orders them by the full embedding.
+    statement = compact._search_statement(
+        vectors[0].astype(np.float32), 1, 10, None, None, exact=False
+    ).compile(dialect=postgresql.dialect())
+    sql = str(statement)
+    assert "ORDER BY media_items.embedding_compact <=> " in sql
+    assert "media_items.embedding_compact IS NULL" in sql
+    assert "ORDER BY cosine_distance(media_items.embedding, " in sql
+    limits = sorted(v for k, v in statement.params.items() if k.startswith("param"))
+    assert 10 in limits and 40 in limits
+    exact_sql = str(
+        compact._search_statement(vectors[0], 1, 10, None, None, exact=True).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "embedding_compact" not in exact_sql
+
+    # Replaying that selection on the stored compact vectors finds the exact top 10.
+    compact_matrix = np.stack([stored_compact[item_id] for item_id in ids])
+    full = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query in vectors[:10]:
+        projected = projection.project_one(query)
+        compact_scores = (
+            compact_matrix
+            @ projected
+            / (np.linalg.norm(compact_matrix, axis=1) * np.linalg.norm(projected))
+        )
+        shortlist = np.argsort(-compact_scores)[: 10 * compact.rerank_factor]
+        full_scores = full @ (query / np.linalg.norm(query))
+        reranked = shortlist[np.argsort(-full_scores[shortlist])][:10]
+        assert reranked.tolist() == np.argsort(-full_scores)[:10].tolist()
+
+
+def test_embedding_columns_exchange_float32_arrays() -> None:
+    from sqlalchemy.dialects.postgresql import psycopg, psycopg2
+
+    vector = np.array([0.25, -0.5, 1.0], dtype=np.float32)
+    for dialect in (psycopg2.dialect(), psycopg.dialect()):
+        column_type = EmbeddingVector(3).dialect_impl(dialect)
+        bind = column_type.bind_processor(dialect)
+        result = column_type.result_processor(dialect, None)
+        assert bind is not None and result is not None
+        bound = bind(vector)
+        if dialect.driver == "psycopg2":
+            assert bound == "[0.25,-0.5,1.0]"
+        else:
+            assert bound.to_binary()[4:] == vector.astype(">f4").tobytes()
+        loaded = result(bound)
+        assert loaded is not None and loaded.dtype == np.float32
+        np.testing.assert_array_equal(loaded, vector)
+
+
+def test_index_scan_breadth_is_set_locally_per_search() -> None:
+    executed: list[str] = []
+
+    class RecordingSession:
+        def __init__(self, pgvector_version: str) -> None:
+            self.pgvector_version = pgvector_version
+
+        def execute(self, statement: Any) -> None:
+            executed.append(str(statement))
+
+        def scalar(self, statement: Any) -> str:
+            executed.append(str(statement))
+            return self.pgvector_version
+
+    session: Any = RecordingSession("0.8.0")
+    legacy: Any = RecordingSession("0.7.4")
+    store = VectorStore(session_factory=Session, ef_search=64, probes=10, iterative_scan="off")
+
+    store._tune_index_scan(session, limit=20, ef_search=None, probes=None)
+    store._tune_index_scan(session, limit=200, ef_search=100, probes=None)
+    iterative = VectorStore(session_factory=Session)
+    iterative._tune_index_scan(session, limit=20, ef_search=None, probes=None)
+    iterative._tune_index_scan(session, limit=20, ef_search=None, probes=None)
+    VectorStore(session_factory=Session)._tune_index_scan(
+        legacy, limit=20, ef_search=None, probes=None
+    )
+
+    version_query = "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+    assert executed == [
+        "SET LOCAL hnsw.ef_search = 64",
+        "SET LOCAL ivfflat.probes = 10",
+        "SET LOCAL hnsw.ef_search = 200",
+        "SET LOCAL ivfflat.probes = 10",
+        version_query,
+        "SET LOCAL hnsw.iterative_scan = strict_order",
+        "SET LOCAL hnsw.iterative_scan = strict_order",
+        version_query,
+    ]
+
+
+def test_tenant_size_is_cached_until_the_ttl_expires() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    with SessionLocal() as session:
+        session.add(MediaItem(user_id=4, google_media_item_id="a", embedding=_build_embedding()))
+        session.add(MediaItem(user_id=4, google_media_item_id="b"))
+        session.commit()
+
+    cached = VectorStore(session_factory=SessionLocal)
+    uncached = VectorStore(session_factory=SessionLocal, tenant_size_ttl=0)
+    assert cached.tenant_size(4) == uncached.tenant_size(4) == 1
+
+    with SessionLocal() as session:
+        session.add(MediaItem(user_id=4, google_media_item_id="c", embedding=_build_embedding()))
+        session.commit()
+    assert (cached.tenant_size(4), uncached.tenant_size(4)) == (1, 2)
+
+
+def test_search_many_matches_single_searches() -> None:
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(120, 768)).astype(np.float32)
+    with SessionLocal() as session:
+        items = [MediaItem(user_id=5, google_media_item_id=f"item-{i}") for i in range(120)]
+        session.add_all(items)
+        session.commit()
+        ids = _item_ids(items)
+    store = VectorStore(session_factory=SessionLocal)
+    store.upsert_embeddings(
+        EmbeddingRecord(item_id, vector, embedding_version="v1" if item_id % 2 else "v2")
+        for item_id, vector in zip(ids, vectors, strict=True)
+    )
+
+    queries = vectors[:4] + rng.normal(scale=0.1, size=(4, 768)).astype(np.float32)
+    assert store.search_many([], user_id=5) == []
+    batched = store.search_many(queries, user_id=5, top_k=7, embedding_version="v1")
+    assert len(batched) == 4
+    for query, results in zip(queries, batched, strict=True):
+        single = store.search(query, user_id=5, top_k=7, embedding_version="v1")
+        assert [row["id"] for row in results] == [row["id"] for row in single]
+        assert results[0]["similarity"] == pytest.approx(single[0]["similarity"])
+
+    # In-process writes keep the cached matrix's signature equal to the database's.
+    store.upsert_embeddings([EmbeddingRecord(ids[1], vectors[0], embedding_version="v1")])
+    database = sorted(store.embedding_signature(5), key=str)
+    assert database == sorted(store._user_matrix(5).signature(), key=str)
+    assert [row[4] for row in database] == [62, 59]
+
+    sql = str(
+        store._search_many_statement(queries, 5, 7, None, exact=False).compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "FROM (VALUES (" in sql and "JOIN LATERAL (SELECT media_items.id" in sql
+    assert "ORDER BY media_items.embedding <=> CAST(queries.query_embedding" in sql
+
+
+def test_model_declares_the_migrated_lookup_indexes() -> None:
+    table: Table = MediaItem.__table__  # type: ignore[attr-defined]
+    indexes = {
+        str(index.name): [column.name for column in index.columns] for index in table.indexes
+    }
+    assert indexes["ix_media_items_user_id_content_digest"] == ["user_id", "content_digest"]
+    assert indexes["ix_media_items_user_id_embedding_version"] == ["user_id", "embedding_version"]
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.embeddings.preprocess import BatchPreprocessor, PreprocessConfig
+
+
+def _images() -> list[Image.Image]:
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (224, 224, 3), dtype=np.uint8)),
+        Image.fromarray(rng.integers(0, 256, (300, 313, 3), dtype=np.uint8)),
+        Image.fromarray(rng.integers(0, 256, (90, 120), dtype=np.uint8), mode="L"),
+    ]
+
+
+def test_batch_preprocessor_matches_siglip_processor() -> None:
+    transformers = pytest.importorskip("transformers")
+    processor = transformers.SiglipImageProcessor()
+    config = PreprocessConfig.from_processor(processor)
+    assert config is not None
+
+    expected = processor(images=_images(), return_tensors="np")["pixel_values"]
+    actual = BatchPreprocessor(config)(_images())
+
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-6)
+
+
+def test_buffers_are_reused_across_calls() -> None:
+    config = PreprocessConfig(size=16, image_mean=(0.5, 0.5, 0.5), image_std=(0.5, 0.5, 0.5))
+    preprocess = BatchPreprocessor(config)
+    white = Image.new("RGB", (16, 16), color="white")
+
+    first = preprocess([white, white])
+    second = preprocess([white])
+
+    assert np.shares_memory(first, second)
+    assert second.shape == (1, 3, 16, 16)
+    assert second.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(second, 1.0)
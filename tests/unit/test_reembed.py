@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import io
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+from PIL import Image
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.models.media_item import MediaItem
+from backend.services.embeddings.base import EncoderBase
+from backend.services.embeddings.reembed import ReembedJob
+from backend.services.vector import VectorStore
+
+
+class VersionedEncoder(EncoderBase):
+    input_size = 16
+    output_dim = 768
+    model_id = weights_id = "v2"
+
+    def __init__(self) -> None:
+        self.batches: list[int] = []
+
+    def embed_batch(self, images: Sequence[Image.Image]) -> np.ndarray:
+        self.batches.append(len(images))
+        vectors = np.zeros((len(images), 768), dtype=np.float32)
+        vectors[:, 1] = 1.0
+        return vectors
+
+
+def _png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color="teal").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _store_with_items(items: dict[int, int]) -> VectorStore:
+    """Create ``count`` v1-embedded items per ``user_id`` in ``items``."""
+
+    engine = create_engine("sqlite:///:memory:", echo=False)
+    SQLModel.metadata.create_all(engine)
+    store = VectorStore(
+        session_factory=sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+    )
+    old = np.zeros(768, dtype=np.float32)
+    old[0] = 1.0
+    with store._session_factory() as session:
+        for user_id, count in items.items():
+            for index in range(count):
+                session.add(
+                    MediaItem(
+                        user_id=user_id,
+                        google_media_item_id=f"{user_id}-{index}",
+                        base_url=f"https://photos.example/{user_id}/{index}",
+                        embedding=old,
+                        embedding_version="v1",
+                    )
+                )
+        session.commit()
+    return store
+
+
+def test_reembed_visits_priority_users_first_and_resumes() -> None:
+    store = _store_with_items({1: 3, 2: 2})
+    encoder = VersionedEncoder()
+    loaded: list[tuple[int, list[int]]] = []
+
+    def load_images(user_id: int, rows: list[dict[str, Any]]) -> dict[int, bytes]:
+        loaded.append((user_id, [row["id"] for row in rows]))
+        return {row["id"]: _png_bytes() for row in rows}
+
+    job = ReembedJob(store, encoder, load_images, batch_size=2, priority_user_ids=[2])
+
+    first = job.run(max_items=3)
+    assert (first.embedded, first.complete) == (3, False)
+    assert [user_id for user_id, _ in loaded] == [2, 1]
+
+    # Stale rows are excluded from searches until they are re-embedded.
+    query = np.zeros(768, dtype=np.float32)
+    query[1] = 1.0
+    assert len(store.search(query, user_id=1, top_k=10, embedding_version="v2")) == 1
+
+    second = job.run()
+    assert (second.embedded, second.complete) == (2, True)
+    assert job.run().embedded == 0
+    assert len(store.search(query, user_id=1, top_k=10, embedding_version="v2")) == 3
+
+
+def test_reembed_skips_unloadable_rows_and_throttles() -> None:
+    store = _store_with_items({1: 4})
+    encoder = VersionedEncoder()
+    now = [0.0]
+    sleeps: list[float] = []
+
+    def load_images(user_id: int, rows: list[dict[str, Any]]) -> dict[int, bytes]:
+        # Item 1's base URL has expired and item 2 is not an image.
+        payloads = {row["id"]: _png_bytes() for row in rows if row["id"] != 1}
+        if 2 in payloads:
+            payloads[2] = b"not an image"
+        return payloads
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    job = ReembedJob(
+        store,
+        encoder,  # type: ignore[arg-type]
+        load_images,
+        batch_size=2,
+        max_items_per_second=2.0,
+        clock=lambda: now[0],
+        sleep=sleep,
+    )
+    report = job.run()
+
+    assert (report.embedded, report.failed, report.batches) == (2, 2, 2)
+    assert encoder.batches == [2]
+    assert sleeps == [1.0, 1.0]
+    assert [row["id"] for row in store.fetch_stale_embeddings(1, "v2")] == [1, 2]
@@ -57,3 +57,27 @@ def test_siglip2_encoder_with_injected_stubs() -> None:
     assert len(vector) == encoder.output_dim == 3
     norm = sum(value * value for value in vector)
     assert norm == pytest.approx(1.0, rel=1e-6)
+
+
+def test_embed_batch_runs_one_forward_pass() -> None:
+    calls: list[int] = []
+
+    class BatchProcessor:
+        def __call__(self, *, images: list[Image.Image], return_tensors: str) -> dict[str, object]:
+            calls.append(len(images))
+            return {"pixel_values": torch.ones((len(images), 3, 4, 4))}
+
+    class BatchModel(DummyModel):
+        def __call__(self, **kwargs: object) -> DummyOutputs:
+            pixels = kwargs["pixel_values"]
+            assert isinstance(pixels, torch.Tensor)
+            outputs = DummyOutputs()
+            outputs.image_embeds = torch.arange(1, pixels.shape[0] + 1.0)[:, None] * torch.ones(3)
+            return outputs
+
+    encoder = SigLIP2Encoder(processor=BatchProcessor(), model=BatchModel())
+    vectors = encoder.embed_batch([Image.new("RGB", (8, 8))] * 4)
+
+    assert calls == [4]
+    assert len(vectors) == 4
+    assert all(sum(v * v for v in vector) == pytest.approx(1.0, rel=1e-6) for vector in vectors)
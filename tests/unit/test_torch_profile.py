@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+import torch
+from PIL import Image
+
+from backend.services.embeddings import SigLIP2Encoder, TorchInferenceProfile
+from backend.services.embeddings.benchmark import benchmark_profiles
+
+SIDE = 32
+
+
+class TinyVisionModel(torch.nn.Module):
+    def __init__(self) -> None:
+        super().__init__()
+        torch.manual_seed(0)
+        self.config = SimpleNamespace(projection_dim=16)
+        self.conv = torch.nn.Conv2d(3, 8, kernel_size=4, stride=4)
+        self.proj = torch.nn.Linear(8 * (SIDE // 4) ** 2, 16)
+
+    def forward(self, pixel_values: torch.Tensor) -> SimpleNamespace:
+        assert not torch.is_grad_enabled()
+        return SimpleNamespace(
+            image_embeds=self.proj(torch.relu(self.conv(pixel_values)).flatten(1))
+        )
+
+
+class NumpyProcessor:
+    size = {"height": SIDE, "width": SIDE}
+
+    def __call__(self, *, images: list[Image.Image], return_tensors: str) -> dict[str, object]:
+        pixels = np.stack([np.asarray(img.convert("RGB"), dtype=np.float32) for img in images])
+        return {"pixel_values": torch.from_numpy((pixels / 127.5 - 1).transpose(0, 3, 1, 2).copy())}
+
+
+def _images() -> list[Image.Image]:
+    rng = np.random.default_rng(0)
+    return [
+        Image.fromarray(rng.integers(0, 256, (SIDE, SIDE, 3), dtype=np.uint8)) for _ in range(4)
+    ]
+
+
+def test_benchmark_reports_each_profile_against_the_baseline() -> None:
+    profiles = [
+        TorchInferenceProfile(),
+        TorchInferenceProfile(inference_mode=True),
+        TorchInferenceProfile(inference_mode=True, channels_last=True, intra_op_threads=1),
+    ]
+    threads = torch.get_num_threads()
+
+    results = benchmark_profiles(
+        NumpyProcessor(), TinyVisionModel(), profiles, _images(), batch_size=4, repeats=2
+    )
+
+    assert [result.profile for result in results] == profiles
+    assert results[0].speedup == 1.0
+    assert all(result.images_per_second > 0 for result in results)
+    assert min(result.min_cosine for result in results) > 0.9999
+    assert torch.get_num_threads() == threads
+
+
+def test_bf16_embeddings_use_their_own_cache_namespace_but_share_the_version() -> None:
+    profile = TorchInferenceProfile(bf16_autocast=True)
+    encoder = SigLIP2Encoder(
+        processor=NumpyProcessor(), model=TinyVisionModel(), device="cpu", profile=profile
+    )
+    baseline = SigLIP2Encoder(processor=NumpyProcessor(), model=TinyVisionModel(), device="cpu")
+    assert encoder.embedding_version == baseline.embedding_version
+
+    if profile.use_bf16(torch, "cpu"):
+        assert encoder.cache_namespace != baseline.cache_namespace
+        cosine = np.sum(
+            np.asarray(encoder.embed_batch(_images()))
+            * np.asarray(baseline.embed_batch(_images())),
+            axis=1,
+        )
+        assert cosine.min() > 0.99
+    else:
+        assert encoder.cache_namespace == baseline.cache_namespace